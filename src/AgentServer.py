@@ -0,0 +1,684 @@
+"""
+This module is responsible for letting bots outside of the process play the game over a local socket.
+
+A bot connects and opens any number of games, then steps them by sending a direction for each game it wants to step.
+Every request is answered with a compact observation of every game it touched, in the order the requests were sent.
+Requests can be pipelined, sending several before reading any answer, and a single step request can step many games,
+so the cost of a round trip is spread over many steps.
+
+Every message is a little-endian uint32 length followed by the message itself, which starts with a type byte:
+
+- b"O" opens games: uint16 games, uint16 cols, uint16 rows and uint32 seed, a size of 0 for the server's default. It is
+  answered with uint16 games, uint16 cols and uint16 rows, a byte per cell set for walls, then an observation of
+  every game. Opening games again replaces the games of the connection.
+- b"S" steps games: uint16 count, then a uint16 game and a uint8 action for each. Actions index UP, DOWN, LEFT and
+  RIGHT, or are NO_ACTION to keep going. A game that is over is reset before it is stepped. It is answered with
+  uint16 count and an observation of each game stepped.
+- b"R" resets games: uint16 count, then a uint16 game for each. It is answered like a step.
+- b"E" is only ever sent by the server, with a UTF-8 message, before it hangs up on a malformed request.
+
+An observation is uint16 game, uint32 tick, uint32 score, uint8 status, int8 reward, int16 head x and y, int16 food x
+and y (-1 if there is no food), uint16 body length and the cells of the body, starting with the head.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import os
+import random
+import selectors
+import socket
+import struct
+import threading
+
+import Keys
+from Autopilot import DIRECTIONS, DOWN, LEFT, RIGHT, UP
+from BoardSnapshot import Cell
+from Component import PlayerControllerComponent, TransformComponent
+from GameObject import Food, GameObject
+from GameStateManager import SCORE, STATUS
+from Level import Level
+from Simulation import Simulation
+from Spectator import CELL, LENGTH, STATUS_CODES, listen, unpack_cell
+
+CELL_SIZE = 32
+DEFAULT_SIZE = (28, 18)
+
+OPEN = struct.Struct("<cHHHI")
+OPENED = struct.Struct("<cHHH")
+REQUEST = struct.Struct("<cH")
+STEP = struct.Struct("<HB")
+RESET = struct.Struct("<H")
+OBSERVATION = struct.Struct("<HIIBbhhhhH")
+
+# Keeps the snake going the way it is heading
+NO_ACTION = 255
+
+# The key the player controller is given for every action, no key keeps the snake going
+DIRECTION_KEYS = {UP: Keys.K_w, DOWN: Keys.K_s, LEFT: Keys.K_a, RIGHT: Keys.K_d}
+KEYS = [-1] * 256
+for _action, _direction in enumerate(DIRECTIONS):
+    KEYS[_action] = DIRECTION_KEYS[_direction]
+
+# The reward for eating a piece of food, and for being defeated
+FOOD_REWARD = 1
+DEFEAT_REWARD = -1
+
+# The most games a connection may open
+MAX_GAMES = 4096
+
+
+class AgentGame:
+    """
+    The agent game is responsible for a single game played by a bot, steered through the player controller as if its
+    directions were key presses.
+    """
+
+    def __init__(self, index: int, cols: int, rows: int, level: Optional[Level], rng: random.Random) -> None:
+        """
+        Create a new agent game.
+
+        :param index: The number of the game on its connection.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param level: The level to lay the walls out from, defaults to walls around the perimeter of the board.
+        :param rng: The random number generator food is placed with.
+        """
+        self._index = index
+        self._simulation = Simulation(cols * CELL_SIZE, rows * CELL_SIZE, CELL_SIZE, level=level, fused_pipeline=True, rng=rng)
+        self._world = self._simulation.get_world()
+        self._state = self._simulation.get_state()
+        self._cell_size = self._simulation.get_grid().get_cell_size()
+
+        # The food is followed as it comes and goes, rather than looked for among the walls every observation
+        self._food: Optional[Food] = None
+        self._world.subscribe("added", self._on_added)
+        self._world.subscribe("removed", self._on_removed)
+
+    def _on_added(self, game_object: GameObject) -> None:
+        """
+        Follow food added to the world.
+
+        :param game_object: The game object added.
+        """
+        if isinstance(game_object, Food):
+            self._food = game_object
+
+    def _on_removed(self, game_object: GameObject) -> None:
+        """
+        Stop following food removed from the world.
+
+        :param game_object: The game object removed.
+        """
+        if game_object is self._food:
+            self._food = None
+
+    def reset(self) -> None:
+        """
+        Start the game over.
+        """
+        self._world.reset()
+
+    def step(self, action: int) -> int:
+        """
+        Steer the snake and advance the game by a single tick, starting it over first if it is over.
+
+        :param action: The index of the direction to steer in, or NO_ACTION to keep going.
+        :return: The reward for the tick.
+        """
+        if self._state.get_state(STATUS) != "in-game":
+            self.reset()
+
+        controller = self._world.get_player().get_component(PlayerControllerComponent)
+
+        if controller:
+            controller.key = KEYS[action]
+
+        score = self._state.get_state(SCORE)
+        self._simulation.step()
+
+        reward = (self._state.get_state(SCORE) - score) * FOOD_REWARD
+
+        if self._state.get_state(STATUS) != "in-game":
+            reward += DEFEAT_REWARD
+
+        return reward
+
+    def observe(self, out: bytearray, reward: int) -> None:
+        """
+        Append an observation of the game.
+
+        :param out: The buffer to append to.
+        :param reward: The reward for the last tick.
+        """
+        cell_size = self._cell_size
+        food_x, food_y = -1, -1
+        body = bytearray()
+
+        if self._state.get_state(STATUS) == "in-game":
+            food_transform = self._food.get_component(TransformComponent) if self._food else None
+
+            if food_transform:
+                food_x, food_y = food_transform.x // cell_size, food_transform.y // cell_size
+
+            for segment in self._world.get_player().get_segments():
+                transform = segment.get_component(TransformComponent)
+
+                if transform:
+                    body += CELL.pack(transform.x // cell_size, transform.y // cell_size)
+
+        head_x, head_y = CELL.unpack_from(body, 0) if body else (-1, -1)
+        status = STATUS_CODES.get(self._state.get_state(STATUS), 0)
+
+        out += OBSERVATION.pack(self._index, self._simulation.get_tick(), self._state.get_state(SCORE), status, max(min(reward, 127), -128), head_x, head_y, food_x, food_y, len(body) // CELL.size)
+        out += body
+
+    def get_size(self) -> Tuple[int, int]:
+        """
+        Get the size of the board.
+
+        :return: The number of columns and rows.
+        """
+        grid = self._simulation.get_grid()
+        return grid.get_num_cols(), grid.get_num_rows()
+
+    def get_walls(self) -> bytes:
+        """
+        Get the walls of the board.
+
+        :return: A byte per cell, row-major, 1 for a wall.
+        """
+        return bytes(self._world.get_level().get_walls()).translate(bytes([0] + [1] * 255))
+
+    def close(self) -> None:
+        """
+        Release the simulation of the game.
+        """
+        self._simulation.close()
+
+
+class AgentConnection:
+    """
+    The agent connection is responsible for the games of a single bot and the bytes waiting to be read from and
+    written to it.
+    """
+
+    def __init__(self, connection: socket.socket) -> None:
+        """
+        Create a new agent connection.
+
+        :param connection: The socket of the bot.
+        """
+        self.connection = connection
+        self.games: List[AgentGame] = []
+        self.received = bytearray()
+        self.pending = bytearray()
+
+
+class AgentServer:
+    """
+    The agent server is responsible for accepting bots and playing their games on a background thread.
+
+    Requests are handled in the order they arrive, and every complete request read in one go is answered with a single
+    write. A bot that stops reading its answers is no longer read from until it catches up, rather than being buffered
+    for without limit.
+    """
+
+    def __init__(self, address: str, level: Optional[Level] = None, max_buffer: int = 1 << 20) -> None:
+        """
+        Create a new agent server and start listening.
+
+        :param address: Either "unix:<path>" for a Unix socket or "<host>:<port>" for a TCP socket.
+        :param level: The level every game is laid out from, which also sets the size of every board.
+        :param max_buffer: The number of bytes of answers a bot may leave unread before it is no longer read from.
+        """
+        self._level = level
+        self._max_buffer = max_buffer
+        self._listener, self._unix_path = listen(address)
+        self._connections: Dict[socket.socket, AgentConnection] = {}
+        self._steps = 0
+
+        # Lets close wake the server thread without waiting for its select timeout
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._running = True
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+
+        self._thread = threading.Thread(target=self._run, name="agent-server", daemon=True)
+        self._thread.start()
+
+    def get_address(self) -> str:
+        """
+        Get the address bots can connect to.
+
+        :return: The address of the server.
+        """
+        if self._unix_path is not None:
+            return f"unix:{self._unix_path}"
+
+        host, port = self._listener.getsockname()
+        return f"{host}:{port}"
+
+    def get_num_clients(self) -> int:
+        """
+        Get the number of connected bots.
+
+        :return: The number of connected bots.
+        """
+        return len(self._connections)
+
+    def get_steps(self) -> int:
+        """
+        Get the number of steps played across every game.
+
+        :return: The number of steps.
+        """
+        return self._steps
+
+    def wait(self) -> None:
+        """
+        Wait until the server is closed.
+        """
+        while self._thread.is_alive():
+            self._thread.join(timeout=0.5)
+
+    def close(self) -> None:
+        """
+        Disconnect every bot and stop the server.
+        """
+        self._running = False
+
+        try:
+            self._wake_writer.send(b"\0")
+        except OSError:
+            pass
+
+        self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        """
+        Accept bots and answer their requests until the server is closed.
+        """
+        while self._running:
+            for key, events in self._selector.select(timeout=0.5):
+                connection = key.fileobj
+
+                if connection is self._listener:
+                    self._accept()
+                elif connection is self._wake_reader:
+                    continue
+                elif isinstance(connection, socket.socket):
+                    if events & selectors.EVENT_READ:
+                        self._read(connection)
+                    if events & selectors.EVENT_WRITE and connection in self._connections:
+                        self._flush(connection)
+
+        for connection in list(self._connections):
+            self._disconnect(connection)
+
+        self._selector.close()
+        self._listener.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.unlink(self._unix_path)
+
+    def _accept(self) -> None:
+        """
+        Accept a new bot.
+        """
+        try:
+            connection, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+
+        # Answers are small and a bot waits for each one, so they go out as soon as they are written
+        if connection.family != socket.AF_UNIX:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        connection.setblocking(False)
+        self._connections[connection] = AgentConnection(connection)
+        self._selector.register(connection, selectors.EVENT_READ)
+
+    def _read(self, connection: socket.socket) -> None:
+        """
+        Read from a bot and answer every complete request, disconnecting it once it hangs up.
+
+        :param connection: The bot's socket.
+        """
+        agent = self._connections[connection]
+
+        try:
+            data = connection.recv(1 << 16)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._disconnect(connection)
+            return
+
+        if not data:
+            self._disconnect(connection)
+            return
+
+        received = agent.received
+        received += data
+        offset = 0
+
+        try:
+            while len(received) - offset >= LENGTH.size:
+                (length,) = LENGTH.unpack_from(received, offset)
+
+                if len(received) - offset < LENGTH.size + length:
+                    break
+
+                self._handle(agent, memoryview(received)[offset + LENGTH.size:offset + LENGTH.size + length])
+                offset += LENGTH.size + length
+        except (ValueError, struct.error) as error:
+            message = str(error).encode()
+            agent.pending += LENGTH.pack(1 + len(message)) + b"E" + message
+            self._flush(connection)
+            self._disconnect(connection)
+            return
+
+        del received[:offset]
+        self._flush(connection)
+
+    def _handle(self, agent: AgentConnection, request: memoryview) -> None:
+        """
+        Answer a single request.
+
+        :param agent: The bot that sent the request.
+        :param request: The request, without its length prefix.
+        """
+        request_type = bytes(request[:1])
+        out = bytearray()
+
+        if request_type == b"O":
+            _, games, cols, rows, seed = OPEN.unpack_from(request, 0)
+            self._open(agent, games, cols, rows, seed)
+
+            out += OPENED.pack(b"O", len(agent.games), *(agent.games[0].get_size() if agent.games else (0, 0)))
+            out += agent.games[0].get_walls() if agent.games else b""
+
+            for game in agent.games:
+                game.observe(out, 0)
+        elif request_type in (b"S", b"R"):
+            _, count = REQUEST.unpack_from(request, 0)
+            out += REQUEST.pack(request_type, count)
+            offset = REQUEST.size
+            games = agent.games
+
+            for _ in range(count):
+                if request_type == b"S":
+                    index, action = STEP.unpack_from(request, offset)
+                    offset += STEP.size
+                else:
+                    (index,) = RESET.unpack_from(request, offset)
+                    offset += RESET.size
+
+                if index >= len(games):
+                    raise ValueError(f"There is no game {index}, {len(games)} are open.")
+
+                game = games[index]
+
+                if request_type == b"R":
+                    game.reset()
+                    game.observe(out, 0)
+                elif action < len(DIRECTIONS) or action == NO_ACTION:
+                    game.observe(out, game.step(action))
+                else:
+                    raise ValueError(f"Unknown action {action}.")
+
+            if request_type == b"S":
+                self._steps += count
+        else:
+            raise ValueError(f"Unknown request type {request_type!r}.")
+
+        agent.pending += LENGTH.pack(len(out)) + out
+
+    def _open(self, agent: AgentConnection, games: int, cols: int, rows: int, seed: int) -> None:
+        """
+        Replace the games of a bot.
+
+        :param agent: The bot.
+        :param games: The number of games to open.
+        :param cols: The number of columns on every board, 0 for the default.
+        :param rows: The number of rows on every board, 0 for the default.
+        :param seed: The seed food is placed with, each game seeded apart from the others.
+        """
+        if games > MAX_GAMES:
+            raise ValueError(f"At most {MAX_GAMES} games can be opened, not {games}.")
+
+        level = self._level
+
+        if level:
+            if (cols or level.get_cols(), rows or level.get_rows()) != (level.get_cols(), level.get_rows()):
+                raise ValueError(f"Every board is {level.get_cols()}x{level.get_rows()}, as the level is.")
+
+            cols, rows = level.get_cols(), level.get_rows()
+        else:
+            cols, rows = cols or DEFAULT_SIZE[0], rows or DEFAULT_SIZE[1]
+
+            if cols < 3 or rows < 3:
+                raise ValueError(f"A {cols}x{rows} board has no room inside its walls.")
+
+        for game in agent.games:
+            game.close()
+
+        agent.games = [AgentGame(index, cols, rows, level, random.Random(seed * MAX_GAMES + index)) for index in range(games)]
+
+    def _flush(self, connection: socket.socket) -> None:
+        """
+        Write a bot's pending answers, waiting for the socket to become writable if it is full. A bot with too many
+        unread answers is not read from until they are written.
+
+        :param connection: The bot's socket.
+        """
+        agent = self._connections[connection]
+        pending = agent.pending
+
+        if pending:
+            try:
+                sent = connection.send(pending)
+                del pending[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._disconnect(connection)
+                return
+
+        events = (selectors.EVENT_READ if len(pending) < self._max_buffer else 0) | (selectors.EVENT_WRITE if pending else 0)
+        self._selector.modify(connection, events)
+
+    def _disconnect(self, connection: socket.socket) -> None:
+        """
+        Disconnect a bot and close its games.
+
+        :param connection: The bot's socket.
+        """
+        agent = self._connections.pop(connection, None)
+
+        if agent:
+            for game in agent.games:
+                game.close()
+
+            self._selector.unregister(connection)
+            connection.close()
+
+
+class AgentObservation(NamedTuple):
+    """
+    An observation of a game, as a bot receives it.
+    """
+    game: int
+    tick: int
+    score: int
+    status: int
+    reward: int
+    head: Optional[Cell]
+    food: Optional[Cell]
+    body: Tuple[Cell, ...]
+
+
+class AgentClient:
+    """
+    The agent client is responsible for the bot's end of a connection to an agent server.
+
+    Requests can be sent without waiting for their answers, and the answers received later in the same order.
+    """
+
+    def __init__(self, address: str) -> None:
+        """
+        Connect to an agent server.
+
+        :param address: Either "unix:<path>" for a Unix socket or "<host>:<port>" for a TCP socket.
+        """
+        if address.startswith("unix:"):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address[len("unix:"):])
+        else:
+            host, port = address.rsplit(":", 1)
+            self._socket = socket.create_connection((host, int(port)))
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._received = bytearray()
+        self._walls = b""
+        self._size = (0, 0)
+
+    def open(self, games: int, cols: int = 0, rows: int = 0, seed: int = 0) -> List[AgentObservation]:
+        """
+        Open games, replacing any opened before, and wait for them.
+
+        :param games: The number of games.
+        :param cols: The number of columns on every board, 0 for the server's default.
+        :param rows: The number of rows on every board, 0 for the server's default.
+        :param seed: The seed food is placed with.
+        :return: An observation of every game.
+        """
+        self._send(OPEN.pack(b"O", games, cols, rows, seed))
+        return self.receive()
+
+    def send_step(self, actions: Sequence[Tuple[int, int]]) -> None:
+        """
+        Ask to step games, without waiting for the answer.
+
+        :param actions: The game to step and the action to step it with, for every game to step.
+        """
+        request = bytearray(REQUEST.pack(b"S", len(actions)))
+
+        for game, action in actions:
+            request += STEP.pack(game, action)
+
+        self._send(request)
+
+    def send_reset(self, games: Sequence[int]) -> None:
+        """
+        Ask to reset games, without waiting for the answer.
+
+        :param games: The games to reset.
+        """
+        request = bytearray(REQUEST.pack(b"R", len(games)))
+
+        for game in games:
+            request += RESET.pack(game)
+
+        self._send(request)
+
+    def step(self, actions: Sequence[Tuple[int, int]]) -> List[AgentObservation]:
+        """
+        Step games and wait for them.
+
+        :param actions: The game to step and the action to step it with, for every game to step.
+        :return: An observation of every game stepped.
+        """
+        self.send_step(actions)
+        return self.receive()
+
+    def receive(self) -> List[AgentObservation]:
+        """
+        Wait for the answer to the oldest request not yet received.
+
+        :return: An observation of every game the request touched.
+        """
+        answer = self._receive()
+        answer_type = answer[:1]
+
+        if answer_type == b"E":
+            raise ConnectionError(answer[1:].decode())
+
+        if answer_type == b"O":
+            _, count, cols, rows = OPENED.unpack_from(answer, 0)
+            self._size = (cols, rows)
+            self._walls = answer[OPENED.size:OPENED.size + cols * rows]
+            offset = OPENED.size + cols * rows
+        else:
+            _, count = REQUEST.unpack_from(answer, 0)
+            offset = REQUEST.size
+
+        observations: List[AgentObservation] = []
+
+        for _ in range(count):
+            game, tick, score, status, reward, head_x, head_y, food_x, food_y, length = OBSERVATION.unpack_from(answer, offset)
+            offset += OBSERVATION.size
+
+            body = tuple(unpack_cell(answer, offset + index * CELL.size) for index in range(length))
+            offset += length * CELL.size
+
+            observations.append(AgentObservation(game, tick, score, status, reward, (head_x, head_y) if head_x >= 0 else None, (food_x, food_y) if food_x >= 0 else None, body))
+
+        return observations
+
+    def get_walls(self) -> bytes:
+        """
+        Get the walls of the boards of the games opened.
+
+        :return: A byte per cell, row-major, 1 for a wall.
+        """
+        return self._walls
+
+    def get_size(self) -> Tuple[int, int]:
+        """
+        Get the size of the boards of the games opened.
+
+        :return: The number of columns and rows.
+        """
+        return self._size
+
+    def close(self) -> None:
+        """
+        Disconnect from the server, which closes the games.
+        """
+        self._socket.close()
+
+    def _send(self, request: bytes) -> None:
+        """
+        Send a request.
+
+        :param request: The request, without its length prefix.
+        """
+        self._socket.sendall(LENGTH.pack(len(request)) + request)
+
+    def _receive(self) -> bytes:
+        """
+        Wait for a whole answer.
+
+        :return: The answer, without its length prefix.
+        """
+        received = self._received
+
+        while True:
+            if len(received) >= LENGTH.size:
+                (length,) = LENGTH.unpack_from(received, 0)
+
+                if len(received) >= LENGTH.size + length:
+                    answer = bytes(received[LENGTH.size:LENGTH.size + length])
+                    del received[:LENGTH.size + length]
+                    return answer
+
+            data = self._socket.recv(1 << 16)
+
+            if not data:
+                raise ConnectionError("The agent server hung up.")
+
+            received += data
@@ -0,0 +1,125 @@
+"""
+This module is responsible for finding the code that allocates memory every tick, using tracemalloc.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import tracemalloc
+
+
+class AllocationProfiler:
+    """
+    The allocation profiler is responsible for attributing the memory allocated during each tick to the lines of code
+    that allocated it.
+
+    The traces are cleared at the end of every tick, so the snapshot taken at the end of the next tick holds exactly
+    the blocks allocated during that tick that are still alive. Temporaries freed within the tick are not listed; the
+    blocks that outlive the tick are the ones that fill the young generation and trigger garbage collections.
+    """
+
+    def __init__(self, num_ticks: int, top: int = 10, frames: int = 1, on_done: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Create a new allocation profiler. Tracing starts at the end of the first tick, so the allocations made while
+        setting up the game are not attributed to a tick.
+
+        :param num_ticks: The number of ticks to profile before the report is ready.
+        :param top: The number of allocation sites to list in the report.
+        :param frames: The number of stack frames to keep for each allocation.
+        :param on_done: A handler to call with the formatted report once profiling stops, if any.
+        """
+        self._num_ticks = num_ticks
+        self._top = top
+        self._frames = frames
+        self._on_done = on_done
+        self._ticks = 0
+        self._tracing = False
+        self._stopped = False
+
+        # Per allocation site, the number of blocks and bytes allocated over every profiled tick
+        self._sites: Dict[str, Tuple[int, int]] = {}
+
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+
+    def on_tick(self) -> None:
+        """
+        Attribute the allocations made since the previous tick, until enough ticks have been profiled.
+        """
+        if self._stopped:
+            return
+
+        if not self._tracing:
+            self._tracing = True
+
+            if tracemalloc.is_tracing():
+                tracemalloc.clear_traces()
+            else:
+                tracemalloc.start(self._frames)
+
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+
+        for statistic in snapshot.statistics("lineno"):
+            frame = statistic.traceback[0]
+            site = f"{frame.filename}:{frame.lineno}"
+            count, size = self._sites.get(site, (0, 0))
+            self._sites[site] = (count + statistic.count, size + statistic.size)
+
+        self._ticks += 1
+
+        if self.is_done():
+            self.stop()
+        else:
+            del snapshot
+            tracemalloc.clear_traces()
+
+    def is_done(self) -> bool:
+        """
+        Check if enough ticks have been profiled.
+
+        :return: True if the report is ready, otherwise False.
+        """
+        return self._ticks >= self._num_ticks
+
+    def stop(self) -> None:
+        """
+        Stop tracing allocations and hand the report to the done handler, unless already stopped.
+        """
+        if self._stopped:
+            return
+
+        self._stopped = True
+
+        if self._tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        if self._on_done:
+            self._on_done(self.format())
+
+    def get_sites(self) -> List[Tuple[str, float, float]]:
+        """
+        Get the allocation sites that allocated the most blocks per tick.
+
+        :return: The site, and the number of blocks and bytes it allocated per tick, most blocks first.
+        """
+        ticks = max(self._ticks, 1)
+        sites = sorted(self._sites.items(), key=lambda item: item[1][0], reverse=True)
+
+        return [(site, count / ticks, size / ticks) for site, (count, size) in sites[:self._top]]
+
+    def format(self) -> str:
+        """
+        Format the report.
+
+        :return: A line per allocation site.
+        """
+        lines = [f"Allocations alive at the end of each tick, averaged over {self._ticks} ticks:"]
+
+        for site, count, size in self.get_sites():
+            lines.append(f"  {count:>9.2f} blocks {size:>11.1f} B  {site}")
+
+        if len(lines) == 1:
+            lines.append("  none")
+
+        return "\n".join(lines)
@@ -0,0 +1,995 @@
+"""
+This module is responsible for containing the autopilot policies and the background planner that runs them.
+"""
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from queue import Queue, Empty
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Type, TypeVar
+import importlib
+import os
+import sys
+import threading
+import time
+
+from Bitboard import Bitboard
+from BoardSnapshot import BoardSnapshot, Cell, SNAKE, WALL
+from Level import Level
+
+Direction = Tuple[int, int]
+
+UP: Direction = (0, -1)
+DOWN: Direction = (0, 1)
+LEFT: Direction = (-1, 0)
+RIGHT: Direction = (1, 0)
+DIRECTIONS: Tuple[Direction, ...] = (UP, DOWN, LEFT, RIGHT)
+
+# Maps a cell code to 1 if the cell cannot be moved into, otherwise 0.
+BLOCKED_TABLE = bytes(1 if code >= SNAKE else 0 for code in range(256))
+
+# Maps a cell code to 1 if the cell is a wall, otherwise 0.
+WALL_TABLE = bytes(1 if code == WALL else 0 for code in range(256))
+
+
+def blocked_cells(snapshot: BoardSnapshot) -> bytearray:
+    """
+    Build a row-major mask of the cells the head cannot move into on the next tick.
+
+    The tail is left unblocked since it moves out of the way, unless the snake has just grown and a new segment is
+    still sitting on top of it.
+
+    :param snapshot: The snapshot to build the mask from.
+    :return: A mask with 1 for every blocked cell and 0 for every free cell.
+    """
+    blocked = bytearray(snapshot.get_cells().translate(BLOCKED_TABLE))
+    body = snapshot.get_body()
+
+    if len(body) > 1 and body[-1] != body[-2] and snapshot.in_bounds(*body[-1]):
+        blocked[snapshot.index(*body[-1])] = 0
+
+    return blocked
+
+
+def safe_fallback_direction(snapshot: BoardSnapshot, current: Direction) -> Optional[Direction]:
+    """
+    Pick any direction that does not immediately end the game.
+
+    The current direction is preferred so the snake keeps going straight when it is safe to do so, and the snake is
+    never turned back on itself.
+
+    :param snapshot: The snapshot to pick a direction from.
+    :param current: The direction the snake is currently moving in.
+    :return: A safe direction, or None if every direction is lethal.
+    """
+    head = snapshot.get_head()
+
+    if head is None:
+        return None
+
+    blocked = blocked_cells(snapshot)
+    reverse = (-current[0], -current[1])
+    candidates = (current,) + DIRECTIONS if current != (0, 0) else DIRECTIONS
+
+    for x_dir, y_dir in candidates:
+        if (x_dir, y_dir) == reverse:
+            continue
+
+        x, y = head[0] + x_dir, head[1] + y_dir
+
+        if snapshot.in_bounds(x, y) and not blocked[snapshot.index(x, y)]:
+            return (x_dir, y_dir)
+
+    return None
+
+
+def reachable_areas(snapshot: BoardSnapshot, current: Direction, bitboard: Bitboard, limit: Optional[int] = None) -> Dict[Direction, int]:
+    """
+    Count the free cells the head could still reach after each move that does not immediately end the game, which is
+    how a policy tells whether a move traps the snake.
+
+    The rest of the body is treated as if it stays where it is, so the counts are a lower bound on the room left.
+
+    :param snapshot: The snapshot to count on.
+    :param current: The direction the snake is currently moving in.
+    :param bitboard: The bitboard layout of the board, which must be the size of the snapshot.
+    :param limit: Stop counting at this many cells, which is all a trap check needs.
+    :return: The number of reachable cells after every safe move, up to the limit, the current direction first.
+    """
+    head = snapshot.get_head()
+    areas: Dict[Direction, int] = {}
+
+    if head is None:
+        return areas
+
+    free = bitboard.get_all() & ~bitboard.from_mask(blocked_cells(snapshot))
+    reverse = (-current[0], -current[1])
+    candidates = (current,) + DIRECTIONS if current != (0, 0) else DIRECTIONS
+
+    # Moves into the same region share a flood fill
+    regions: List[Tuple[int, int]] = []
+
+    for x_dir, y_dir in candidates:
+        if (x_dir, y_dir) == reverse or (x_dir, y_dir) in areas:
+            continue
+
+        x, y = head[0] + x_dir, head[1] + y_dir
+
+        if not snapshot.in_bounds(x, y):
+            continue
+
+        cell = bitboard.bit(x, y)
+
+        if not cell & free:
+            continue
+
+        for region, area in regions:
+            if cell & region:
+                break
+        else:
+            region = bitboard.flood(cell, free, limit)
+            area = bitboard.count(region) if limit is None else min(bitboard.count(region), limit)
+            regions.append((region, area))
+
+        areas[(x_dir, y_dir)] = area
+
+    return areas
+
+
+class AutopilotPolicy(ABC):
+    """
+    An autopilot policy is responsible for deciding which direction the snake's head should move in next.
+    """
+
+    @abstractmethod
+    def decide(self, snapshot: BoardSnapshot) -> Optional[Direction]:
+        """
+        Decide the next direction of the snake's head.
+
+        :param snapshot: The board to decide on.
+        :return: The next direction, or None if the policy has no opinion.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Release any resources held by the policy, such as worker processes.
+        """
+        pass
+
+
+PolicyType = TypeVar("PolicyType", bound=Type[AutopilotPolicy])
+
+# Every registered policy by name, along with the number of milliseconds each of its decisions may take by default
+POLICIES: Dict[str, Tuple[Callable[[], AutopilotPolicy], float]] = {}
+
+
+def register_policy(name: str, budget_ms: float) -> Callable[[PolicyType], PolicyType]:
+    """
+    Register a policy class under a name, so it can be selected from the command line and swapped in at runtime.
+
+    :param name: The name to register the policy under.
+    :param budget_ms: The number of milliseconds each decision may take by default.
+    :return: A class decorator that registers the class and returns it unchanged.
+    """
+    def register(policy_class: PolicyType) -> PolicyType:
+        POLICIES[name] = (policy_class, budget_ms)
+        return policy_class
+
+    return register
+
+
+def register_lazy_policy(name: str, module: str, class_name: str, budget_ms: float) -> None:
+    """
+    Register a policy class that lives in a module which is only imported the first time the policy is created, so
+    policies with dependencies that are slow to import only cost something when they are used.
+
+    :param name: The name to register the policy under.
+    :param module: The name of the module the policy class lives in.
+    :param class_name: The name of the policy class.
+    :param budget_ms: The number of milliseconds each decision may take by default.
+    """
+    def create() -> AutopilotPolicy:
+        policy_class: Type[AutopilotPolicy] = getattr(importlib.import_module(module), class_name)
+        return policy_class()
+
+    POLICIES[name] = (create, budget_ms)
+
+
+def get_policy_names() -> List[str]:
+    """
+    Get the names of every registered policy.
+
+    :return: The names, in the order the policies were registered.
+    """
+    return list(POLICIES)
+
+
+def create_policy(name: str, budget_ms: Optional[float] = None) -> 'TimedPolicy':
+    """
+    Create a registered policy, held to a time budget for every decision.
+
+    :param name: The name of the policy.
+    :param budget_ms: The number of milliseconds each decision may take, defaults to the budget it was registered with.
+    :return: The policy.
+    """
+    factory, default_budget_ms = POLICIES[name]
+    return TimedPolicy(name, factory(), default_budget_ms if budget_ms is None else budget_ms)
+
+
+class TimedPolicy(AutopilotPolicy):
+    """
+    The timed policy is responsible for holding another policy to a time budget for every decision.
+
+    Every decision is timed. A decision that takes longer than the budget is discarded, so the autopilot falls back to
+    a safe move as if the decision had never arrived. A policy that overruns several decisions in a row is suspended
+    for a while, so a policy that is too slow for the board does not keep eating into every tick.
+    """
+
+    # The number of overruns in a row that gets a policy suspended.
+    MAX_CONSECUTIVE_OVERRUNS = 3
+
+    # The number of decisions a suspended policy sits out before it is given another chance.
+    SUSPENSION = 50
+
+    def __init__(self, name: str, policy: AutopilotPolicy, budget_ms: float) -> None:
+        """
+        Create a new timed policy.
+
+        :param name: The name of the policy.
+        :param policy: The policy to time.
+        :param budget_ms: The number of milliseconds each decision may take, or 0 for no limit.
+        """
+        self._name = name
+        self._policy = policy
+        self._budget = budget_ms / 1000
+
+        self._decisions = 0
+        self._decision_seconds = 0.0
+        self._slowest = 0.0
+        self._overruns = 0
+        self._consecutive_overruns = 0
+        self._suspended_for = 0
+        self._skipped = 0
+
+    def decide(self, snapshot: BoardSnapshot) -> Optional[Direction]:
+        """
+        Decide the next direction with the timed policy, unless it is suspended or takes too long.
+
+        :param snapshot: The board to decide on.
+        :return: The next direction, or None if the policy is suspended, overran its budget or has no opinion.
+        """
+        if self._suspended_for:
+            self._suspended_for -= 1
+            self._skipped += 1
+            return None
+
+        start = time.perf_counter()
+        direction = self._policy.decide(snapshot)
+        elapsed = time.perf_counter() - start
+
+        self._decisions += 1
+        self._decision_seconds += elapsed
+        self._slowest = max(self._slowest, elapsed)
+
+        if self._budget and elapsed > self._budget:
+            self._overruns += 1
+            self._consecutive_overruns += 1
+
+            if self._consecutive_overruns >= self.MAX_CONSECUTIVE_OVERRUNS:
+                self._consecutive_overruns = 0
+                self._suspended_for = self.SUSPENSION
+
+            return None
+
+        self._consecutive_overruns = 0
+        return direction
+
+    def close(self) -> None:
+        """
+        Release any resources held by the timed policy.
+        """
+        self._policy.close()
+
+    def get_name(self) -> str:
+        """
+        Get the name of the policy.
+
+        :return: The name of the policy.
+        """
+        return self._name
+
+    def get_policy(self) -> AutopilotPolicy:
+        """
+        Get the policy being timed.
+
+        :return: The policy.
+        """
+        return self._policy
+
+    def get_budget_ms(self) -> float:
+        """
+        Get the number of milliseconds each decision may take.
+
+        :return: The budget, or 0 if there is no limit.
+        """
+        return self._budget * 1000
+
+    def get_decisions(self) -> int:
+        """
+        Get the number of decisions the policy has made, including those over budget.
+
+        :return: The number of decisions.
+        """
+        return self._decisions
+
+    def get_decisions_per_second(self) -> float:
+        """
+        Get the number of decisions the policy makes per second of decision time.
+
+        :return: The decision rate, or 0 if no decisions have been made.
+        """
+        return self._decisions / self._decision_seconds if self._decision_seconds else 0.0
+
+    def get_slowest_ms(self) -> float:
+        """
+        Get the time taken by the slowest decision.
+
+        :return: The slowest decision in milliseconds.
+        """
+        return self._slowest * 1000
+
+    def get_overruns(self) -> int:
+        """
+        Get the number of decisions that were discarded for taking longer than the budget.
+
+        :return: The number of overruns.
+        """
+        return self._overruns
+
+    def get_skipped(self) -> int:
+        """
+        Get the number of decisions skipped while the policy was suspended.
+
+        :return: The number of skipped decisions.
+        """
+        return self._skipped
+
+    def format(self) -> str:
+        """
+        Format the decision statistics of the policy.
+
+        :return: The statistics on a single line.
+        """
+        return f"{self._name}: {self._decisions} decisions at {self.get_decisions_per_second():.0f}/s, slowest {self.get_slowest_ms():.2f}ms, {self._overruns} over the {self.get_budget_ms():g}ms budget, {self._skipped} skipped"
+
+
+@register_policy("bfs", budget_ms=5.0)
+class BfsPolicy(AutopilotPolicy):
+    """
+    The BFS policy follows the shortest path to the food, falling back to any safe move if the food is unreachable.
+
+    The search walks the neighbour table of the level, so walls and the edges of the board are never looked at, and
+    food walled off from the head is given up on without searching at all.
+
+    A move that would leave the snake fewer free cells to reach than it is long is only taken if every other move is
+    worse, otherwise the move that leaves the most room is taken instead.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a new BFS policy.
+        """
+        # The level rebuilt from the walls of the last snapshot that did not come with one
+        self._snapshot_level: Optional[Level] = None
+        self._bitboard: Optional[Bitboard] = None
+
+    def _avoid_trap(self, snapshot: BoardSnapshot, current: Direction, preferred: Optional[Direction]) -> Optional[Direction]:
+        """
+        Keep a move unless it leaves the snake less room than its length.
+
+        :param snapshot: The board to decide on.
+        :param current: The direction the snake is currently moving in.
+        :param preferred: The move to keep if it leaves enough room.
+        :return: The preferred move, or the move that leaves the most room, or None if every direction is lethal.
+        """
+        bitboard = self._bitboard
+
+        if bitboard is None or (bitboard.get_cols(), bitboard.get_rows()) != (snapshot.get_cols(), snapshot.get_rows()):
+            bitboard = self._bitboard = Bitboard(snapshot.get_cols(), snapshot.get_rows())
+
+        length = len(snapshot.get_body())
+        areas = reachable_areas(snapshot, current, bitboard, length)
+
+        if preferred is not None and areas.get(preferred, 0) >= length:
+            return preferred
+
+        # The first of the roomiest moves, which prefers the current direction. Every move with enough room counts as
+        # the same, since counting stops at the length of the snake
+        return max(areas, key=areas.__getitem__) if areas else None
+
+    def get_level(self, snapshot: BoardSnapshot) -> Level:
+        """
+        Get the level of a snapshot, rebuilding it from the walls on the board if the snapshot does not know it.
+
+        :param snapshot: The snapshot to get the level of.
+        :return: The level.
+        """
+        level = snapshot.get_level()
+
+        if level is not None:
+            return level
+
+        walls = snapshot.get_cells().translate(WALL_TABLE)
+        level = self._snapshot_level
+
+        if level is None or (level.get_cols(), level.get_rows()) != (snapshot.get_cols(), snapshot.get_rows()) or level.get_walls() != walls:
+            level = self._snapshot_level = Level.from_walls(snapshot.get_cols(), snapshot.get_rows(), walls)
+
+        return level
+
+    def decide(self, snapshot: BoardSnapshot) -> Optional[Direction]:
+        """
+        Decide the first step along the shortest path from the head to the food.
+
+        :param snapshot: The board to decide on.
+        :return: The next direction, or None if every direction is lethal.
+        """
+        head = snapshot.get_head()
+        food = snapshot.get_food()
+
+        if head is None:
+            return None
+
+        body = snapshot.get_body()
+        current = (head[0] - body[1][0], head[1] - body[1][1]) if len(body) > 1 else (0, 0)
+
+        if food is None or not snapshot.in_bounds(*head):
+            return self._avoid_trap(snapshot, current, safe_fallback_direction(snapshot, current))
+
+        cols = snapshot.get_cols()
+        head_index = head[1] * cols + head[0]
+        goal = food[1] * cols + food[0]
+
+        nav = self.get_level(snapshot).get_nav()
+
+        if not nav.is_connected(head_index, goal):
+            return self._avoid_trap(snapshot, current, safe_fallback_direction(snapshot, current))
+
+        neighbours = nav.get_neighbours()
+        blocked = blocked_cells(snapshot)
+
+        # The direction of the first step taken to reach each cell, or -1 if the cell has not been reached
+        first_step = [-1] * len(blocked)
+        frontier: Deque[int] = deque()
+
+        for i, (x_dir, y_dir) in enumerate(DIRECTIONS):
+            # The snake can never turn back on itself
+            if x_dir == -current[0] and y_dir == -current[1] and current != (0, 0):
+                continue
+
+            next_index = neighbours[head_index * 4 + i]
+
+            if next_index != -1 and not blocked[next_index] and first_step[next_index] == -1:
+                first_step[next_index] = i
+                frontier.append(next_index)
+
+        while frontier:
+            index = frontier.popleft()
+            step = first_step[index]
+
+            if index == goal:
+                return self._avoid_trap(snapshot, current, DIRECTIONS[step])
+
+            for next_index in neighbours[index * 4:index * 4 + 4]:
+                if next_index != -1 and not blocked[next_index] and first_step[next_index] == -1:
+                    first_step[next_index] = step
+                    frontier.append(next_index)
+
+        return self._avoid_trap(snapshot, current, safe_fallback_direction(snapshot, current))
+
+
+class HamiltonianCycle:
+    """
+    A Hamiltonian cycle visits every playable cell of the board exactly once before returning to where it started.
+
+    The playable cells are every cell inside the perimeter walls. The cycle is stored as a row-major table mapping
+    every cell to its position along the cycle (-1 for walls), alongside the inverse table, so both lookups are O(1).
+    """
+
+    def __init__(self, cols: int, rows: int, cycle_index: 'array[int]') -> None:
+        """
+        Create a new Hamiltonian cycle from a precomputed cycle table.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param cycle_index: The position along the cycle of every cell, row-major, or -1 for cells off the cycle.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._cycle_index = cycle_index
+        self._order = array("i", [0]) * (len(cycle_index) - cycle_index.count(-1))
+
+        for cell, position in enumerate(cycle_index):
+            if position >= 0:
+                self._order[position] = cell
+
+    @classmethod
+    def build(cls, cols: int, rows: int) -> Optional['HamiltonianCycle']:
+        """
+        Build a cycle over the cells inside the perimeter walls.
+
+        The cycle zig-zags across the playable area, leaving the first playable column (or row) free as the path back
+        to the start, which requires an even number of playable rows (or columns). An odd number of playable cells
+        has no cycle at all, as every step of a cycle alternates between the two colors of a checkerboard.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :return: The cycle, or None if the board has no cycle.
+        """
+        width, height = cols - 2, rows - 2
+        transpose = height % 2 != 0
+
+        if transpose:
+            width, height = height, width
+
+        if width < 2 or height < 2 or height % 2 != 0:
+            return None
+
+        path: List[Cell] = []
+
+        for y in range(height):
+            xs = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+            path.extend((x, y) for x in xs)
+
+        path.extend((0, y) for y in range(height - 1, -1, -1))
+
+        cycle_index = array("i", [-1]) * (cols * rows)
+
+        for position, (x, y) in enumerate(path):
+            if transpose:
+                x, y = y, x
+
+            cycle_index[(y + 1) * cols + (x + 1)] = position
+
+        return cls(cols, rows, cycle_index)
+
+    @classmethod
+    def load_or_build(cls, cols: int, rows: int, cache_dir: str) -> Optional['HamiltonianCycle']:
+        """
+        Load the cycle for a board size from disk, building and caching it if it has not been built before.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param cache_dir: The directory cycle tables are cached in.
+        :return: The cycle, or None if the board has no cycle.
+        """
+        path = os.path.join(cache_dir, f"hamiltonian-{cols}x{rows}.bin")
+
+        if os.path.exists(path):
+            cycle_index = array("i")
+
+            with open(path, "rb") as file:
+                cycle_index.fromfile(file, cols * rows)
+
+            return cls(cols, rows, cycle_index)
+
+        cycle = cls.build(cols, rows)
+
+        if cycle is None:
+            return None
+
+        # Write to a temporary file first so a concurrent reader never sees a partial table
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(temp_path, "wb") as file:
+            cycle._cycle_index.tofile(file)
+
+        os.replace(temp_path, path)
+
+        return cycle
+
+    def __len__(self) -> int:
+        """
+        Get the number of cells on the cycle.
+
+        :return: The length of the cycle.
+        """
+        return len(self._order)
+
+    def index_of(self, x: int, y: int) -> int:
+        """
+        Get the position of a cell along the cycle.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: The position along the cycle, or -1 if the cell is not on the cycle.
+        """
+        if not (0 <= x < self._cols and 0 <= y < self._rows):
+            return -1
+
+        return self._cycle_index[y * self._cols + x]
+
+    def cell_at(self, position: int) -> Cell:
+        """
+        Get the cell at a position along the cycle.
+
+        :param position: The position along the cycle, wrapping around the end of the cycle.
+        :return: The cell.
+        """
+        cell = self._order[position % len(self._order)]
+        return cell % self._cols, cell // self._cols
+
+    def distance(self, start: int, end: int) -> int:
+        """
+        Get the number of steps along the cycle from one position to another.
+
+        :param start: The starting position.
+        :param end: The ending position.
+        :return: The number of steps.
+        """
+        return (end - start) % len(self._order)
+
+
+@register_policy("hamiltonian", budget_ms=5.0)
+class HamiltonianPolicy(AutopilotPolicy):
+    """
+    The Hamiltonian policy follows a precomputed Hamiltonian cycle, which can never trap the snake, and takes
+    shortcuts towards the food when they cannot cut into the snake's body.
+
+    Every decision only looks at the head, tail, food and the four neighbours of the head, so it takes the same time
+    regardless of the size of the board or the length of the snake. Boards without a cycle, such as those with an odd
+    number of playable cells or walls inside the perimeter, are left to the BFS policy instead.
+    """
+
+    # Shortcuts stop once the snake covers this fraction of the cycle, after which it strictly follows the cycle.
+    SHORTCUT_LIMIT = 0.5
+
+    # The number of cells kept free between the head and the tail when taking a shortcut.
+    SHORTCUT_MARGIN = 3
+
+    def __init__(self, cache_dir: Optional[str] = None) -> None:
+        """
+        Create a new Hamiltonian policy.
+
+        :param cache_dir: The directory cycle tables are cached in, defaults to ~/.cache/snake.
+        """
+        self._cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "snake")
+        self._cycle: Optional[HamiltonianCycle] = None
+        self._cycle_size = (0, 0)
+        self._level: Optional[Level] = None
+        self._fallback = BfsPolicy()
+
+    def get_cycle(self, level: Level) -> Optional[HamiltonianCycle]:
+        """
+        Get the cycle for a level, loading it once per board size.
+
+        The cycle is laid out over every cell inside the perimeter, so levels with walls inside it, such as pillars,
+        have no cycle.
+
+        :param level: The level to get the cycle for.
+        :return: The cycle, or None if the level has no cycle.
+        """
+        cols, rows = level.get_cols(), level.get_rows()
+
+        if level.has_interior_walls():
+            if level is not self._level:
+                print(f"The {cols}x{rows} level has walls inside its perimeter, which a Hamiltonian cycle cannot go around. Steering with bfs instead.", file=sys.stderr)
+                self._level = level
+
+            return None
+
+        if self._cycle_size != (cols, rows):
+            self._cycle = HamiltonianCycle.load_or_build(cols, rows, self._cache_dir)
+            self._cycle_size = (cols, rows)
+
+            if self._cycle is None:
+                print(f"A {cols}x{rows} board has no Hamiltonian cycle, it needs at least 2x2 playable cells and an even number of playable rows or columns. Steering with bfs instead.", file=sys.stderr)
+
+        return self._cycle
+
+    def decide(self, snapshot: BoardSnapshot) -> Optional[Direction]:
+        """
+        Decide the next step along the cycle, or a shortcut towards the food.
+
+        :param snapshot: The board to decide on.
+        :return: The next direction, or None if the head is not on the cycle.
+        """
+        body = snapshot.get_body()
+
+        if not body:
+            return None
+
+        cycle = self.get_cycle(self._fallback.get_level(snapshot))
+
+        if cycle is None:
+            return self._fallback.decide(snapshot)
+
+        head_x, head_y = body[0]
+        head = cycle.index_of(head_x, head_y)
+
+        if head < 0:
+            return None
+
+        next_x, next_y = cycle.cell_at(head + 1)
+        best = (next_x - head_x, next_y - head_y)
+
+        food = snapshot.get_food()
+
+        if food is None or cycle.index_of(*food) < 0 or len(body) >= len(cycle) * self.SHORTCUT_LIMIT:
+            return best
+
+        tail = cycle.index_of(*body[-1])
+        food_distance = cycle.distance(head, cycle.index_of(*food))
+        tail_distance = cycle.distance(head, tail) if len(body) > 1 else len(cycle)
+        best_distance = 1
+
+        for x_dir, y_dir in DIRECTIONS:
+            x, y = head_x + x_dir, head_y + y_dir
+            neighbour = cycle.index_of(x, y)
+
+            if neighbour < 0 or snapshot.is_blocked(x, y):
+                continue
+
+            distance = cycle.distance(head, neighbour)
+
+            # Skipping ahead is only safe while the whole body stays behind the head in cycle order
+            if best_distance < distance <= food_distance and distance < tail_distance - self.SHORTCUT_MARGIN:
+                best, best_distance = (x_dir, y_dir), distance
+
+        return best
+
+
+# The Monte Carlo policy runs on a process pool, and importing multiprocessing takes longer than starting the game
+register_lazy_policy("montecarlo", "MonteCarlo", "MonteCarloPolicy", budget_ms=120.0)
+
+
+class Planner(ABC):
+    """
+    A planner is responsible for running an autopilot policy on submitted snapshots and handing back its moves.
+    """
+
+    @abstractmethod
+    def submit(self, snapshot: BoardSnapshot) -> None:
+        """
+        Submit a snapshot to plan the next move for.
+
+        :param snapshot: The snapshot to plan for.
+        """
+        pass
+
+    @abstractmethod
+    def poll(self, tick: int) -> Optional[Direction]:
+        """
+        Get the planned move for a snapshot without waiting.
+
+        :param tick: The tick of the snapshot the move was planned for.
+        :return: The planned move, or None if there is no plan for the snapshot.
+        """
+        pass
+
+    @abstractmethod
+    def set_policy(self, policy: AutopilotPolicy) -> None:
+        """
+        Swap the policy moves are planned with, starting with the next snapshot.
+
+        :param policy: The policy to plan with.
+        """
+        pass
+
+    @abstractmethod
+    def discard(self) -> None:
+        """
+        Forget every submitted snapshot and every planned move, such as when the autopilot is switched on or off.
+        """
+        pass
+
+    @abstractmethod
+    def get_policy(self) -> AutopilotPolicy:
+        """
+        Get the policy moves are planned with.
+
+        :return: The policy.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Release any resources held by the planner.
+        """
+        pass
+
+
+class InlinePlanner(Planner):
+    """
+    The inline planner runs the policy as soon as a snapshot is submitted, which keeps headless runs deterministic.
+    """
+
+    def __init__(self, policy: AutopilotPolicy) -> None:
+        """
+        Create a new inline planner.
+
+        :param policy: The policy to plan with.
+        """
+        self._policy = policy
+        self._planned_tick = -1
+        self._move: Optional[Direction] = None
+
+    def submit(self, snapshot: BoardSnapshot) -> None:
+        """
+        Plan the next move for a snapshot.
+
+        :param snapshot: The snapshot to plan for.
+        """
+        self._planned_tick = snapshot.get_tick()
+        self._move = self._policy.decide(snapshot)
+
+    def poll(self, tick: int) -> Optional[Direction]:
+        """
+        Get the planned move for a snapshot.
+
+        :param tick: The tick of the snapshot the move was planned for.
+        :return: The planned move, or None if there is no plan for the snapshot.
+        """
+        return self._move if tick == self._planned_tick else None
+
+    def set_policy(self, policy: AutopilotPolicy) -> None:
+        """
+        Swap the policy moves are planned with, starting with the next snapshot.
+
+        :param policy: The policy to plan with.
+        """
+        if policy is not self._policy:
+            self._policy.close()
+
+        self._policy = policy
+
+    def close(self) -> None:
+        """
+        Release any resources held by the policy.
+        """
+        self._policy.close()
+
+    def discard(self) -> None:
+        """
+        Forget the planned move.
+        """
+        self._planned_tick = -1
+        self._move = None
+
+    def get_policy(self) -> AutopilotPolicy:
+        """
+        Get the policy moves are planned with.
+
+        :return: The policy.
+        """
+        return self._policy
+
+
+class AutopilotPlanner(Planner):
+    """
+    The autopilot planner is responsible for running a policy on a worker thread so that slow decisions never stall
+    the game loop.
+
+    Every tick the latest snapshot is submitted, and on the following tick the decision for that snapshot is polled.
+    Decisions that arrive after their tick has passed are discarded.
+    """
+
+    def __init__(self, policy: AutopilotPolicy) -> None:
+        """
+        Create a new autopilot planner and start its worker thread.
+
+        :param policy: The policy to plan with.
+        """
+        self._policy = policy
+
+        # Policies that were swapped out, which the worker closes once it is no longer deciding with them
+        self._retired: List[AutopilotPolicy] = []
+
+        self._requests: 'Queue[Optional[BoardSnapshot]]' = Queue(maxsize=1)
+        self._results: 'Queue[Tuple[int, Direction]]' = Queue()
+
+        self._thread = threading.Thread(target=self._run, name="autopilot-planner", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: BoardSnapshot) -> None:
+        """
+        Submit a snapshot to plan the next move for.
+
+        Only the latest snapshot matters, so a snapshot the worker has not picked up yet is replaced.
+
+        :param snapshot: The snapshot to plan for.
+        """
+        try:
+            self._requests.get_nowait()
+        except Empty:
+            pass
+
+        self._requests.put_nowait(snapshot)
+
+    def poll(self, tick: int) -> Optional[Direction]:
+        """
+        Get the planned move for a snapshot without waiting.
+
+        :param tick: The tick of the snapshot the move was planned for.
+        :return: The planned move, or None if the plan did not arrive in time.
+        """
+        move: Optional[Direction] = None
+
+        while True:
+            try:
+                planned_tick, direction = self._results.get_nowait()
+            except Empty:
+                break
+
+            if planned_tick == tick:
+                move = direction
+
+        return move
+
+    def set_policy(self, policy: AutopilotPolicy) -> None:
+        """
+        Swap the policy moves are planned with, starting with the next snapshot the worker picks up.
+
+        :param policy: The policy to plan with.
+        """
+        retired, self._policy = self._policy, policy
+
+        if retired is not policy:
+            self._retired.append(retired)
+
+    def discard(self) -> None:
+        """
+        Forget the snapshot the worker has not picked up yet and every move planned so far. A decision the worker is
+        still making is discarded by poll, as its tick has passed by the time it arrives.
+        """
+        try:
+            self._requests.get_nowait()
+        except Empty:
+            pass
+
+        while True:
+            try:
+                self._results.get_nowait()
+            except Empty:
+                break
+
+    def get_policy(self) -> AutopilotPolicy:
+        """
+        Get the policy moves are planned with.
+
+        :return: The policy.
+        """
+        return self._policy
+
+    def close(self) -> None:
+        """
+        Stop the worker thread once it has finished its current decision, which then releases the resources held by
+        the policy.
+        """
+        try:
+            self._requests.get_nowait()
+        except Empty:
+            pass
+
+        self._requests.put_nowait(None)
+        self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        """
+        Plan moves for submitted snapshots until asked to stop.
+        """
+        while True:
+            snapshot = self._requests.get()
+
+            while self._retired:
+                self._retired.pop().close()
+
+            if snapshot is None:
+                self._policy.close()
+                break
+
+            direction = self._policy.decide(snapshot)
+
+            if direction is not None:
+                self._results.put((snapshot.get_tick(), direction))
@@ -0,0 +1,132 @@
+"""
+This module is responsible for bitboards, which hold a set of cells of the board as the bits of a single integer, so
+flood fills and counts run as a handful of operations over the whole board instead of a loop over every cell.
+"""
+from typing import List, Optional, Sequence
+
+from BoardSnapshot import Cell
+
+# Maps a mask byte to the ASCII digit of its bit
+MASK_DIGITS = bytes(ord("1") if value else ord("0") for value in range(256))
+
+
+class Bitboard:
+    """
+    The bitboard is responsible for the layout of the bits of a board of a given size, and the operations on sets of
+    cells laid out that way. The sets themselves are plain integers, so they are combined with the usual &, | and ~.
+
+    Cell (x, y) is bit y * stride + x, where the stride is one more than the number of columns. The extra column is
+    never part of any set, so shifting a set by one moves every cell left or right without wrapping into the next row,
+    and shifting it by the stride moves every cell up or down.
+    """
+
+    def __init__(self, cols: int, rows: int) -> None:
+        """
+        Create a new bitboard layout.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._stride = cols + 1
+        self._all = self.from_mask(b"\x01" * (cols * rows))
+
+    def from_mask(self, mask: Sequence[int]) -> int:
+        """
+        Build a set of cells from a row-major mask.
+
+        :param mask: A byte per cell, set for every cell in the set.
+        :return: The set of cells.
+        """
+        cols = self._cols
+        digits = bytes(mask).translate(MASK_DIGITS)
+
+        # A padding digit after every row, reversed as int reads the most significant digit first
+        padded = b"0".join([digits[start:start + cols] for start in range(0, len(digits), cols)])
+        return int(padded[::-1], 2) if padded else 0
+
+    def bit(self, x: int, y: int) -> int:
+        """
+        Get the set holding a single cell.
+
+        :param x: The x index of the cell.
+        :param y: The y index of the cell.
+        :return: The set of the cell.
+        """
+        return 1 << (y * self._stride + x)
+
+    def flood(self, seeds: int, free: int, limit: Optional[int] = None) -> int:
+        """
+        Find every free cell that can be reached from a set of cells by stepping between free cells.
+
+        Each round grows the reached cells by a step in every direction at once, so the number of rounds is the
+        distance to the furthest reachable cell rather than the number of cells.
+
+        :param seeds: The cells to start from, of which only the free ones are reached.
+        :param free: The cells that can be stepped onto.
+        :param limit: Stop early once at least this many cells are reached, for callers that only need to know if
+            there is enough room.
+        :return: The set of reachable cells, or a subset of at least limit of them if stopped early.
+        """
+        stride = self._stride
+        reached = seeds & free
+        frontier = reached
+
+        while frontier and (limit is None or reached.bit_count() < limit):
+            grown = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & free
+            frontier = grown & ~reached
+            reached |= frontier
+
+        return reached
+
+    def count(self, cells: int) -> int:
+        """
+        Count the cells in a set.
+
+        :param cells: The set of cells.
+        :return: The number of cells.
+        """
+        return cells.bit_count()
+
+    def cells(self, cells: int) -> List[Cell]:
+        """
+        List the cells in a set.
+
+        :param cells: The set of cells.
+        :return: The x and y index of every cell, row-major.
+        """
+        stride = self._stride
+        result: List[Cell] = []
+
+        while cells:
+            lowest = cells & -cells
+            index = lowest.bit_length() - 1
+            result.append((index % stride, index // stride))
+            cells ^= lowest
+
+        return result
+
+    def get_all(self) -> int:
+        """
+        Get the set of every cell on the board.
+
+        :return: The set of every cell.
+        """
+        return self._all
+
+    def get_cols(self) -> int:
+        """
+        Get the number of columns on the board.
+
+        :return: The number of columns.
+        """
+        return self._cols
+
+    def get_rows(self) -> int:
+        """
+        Get the number of rows on the board.
+
+        :return: The number of rows.
+        """
+        return self._rows
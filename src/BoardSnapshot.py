@@ -0,0 +1,215 @@
+"""
+This module is responsible for containing the board snapshot class and the cell codes used to describe the board.
+"""
+from typing import List, Optional, Tuple
+
+from GameObject import Snake, Food, Wall
+from Component import TransformComponent
+from GameStateManager import SCORE
+from Grid import Grid
+from Level import Level
+from World import World
+
+# Cell codes, ordered by priority when more than one game object shares a cell.
+EMPTY = 0
+FOOD = 1
+SNAKE = 2
+WALL = 3
+
+Cell = Tuple[int, int]
+
+
+class BoardSnapshot:
+    """
+    The board snapshot is an immutable, process independent copy of the board.
+
+    Cells are stored row-major as one byte per cell so a snapshot can be copied into shared memory or handed to
+    another thread without touching any game objects.
+    """
+
+    def __init__(self, cols: int, rows: int, cells: bytes, body: Tuple[Cell, ...], food: Optional[Cell], score: int, tick: int, level: Optional[Level] = None) -> None:
+        """
+        Create a new board snapshot.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param cells: The cell codes of the board, row-major.
+        :param body: The cells of the snake, starting with the head.
+        :param food: The cell of the food, if there is any.
+        :param score: The score at the time of the snapshot.
+        :param tick: The tick the snapshot was taken on.
+        :param level: The level the board is laid out from, if known, which is shared rather than copied.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._cells = cells
+        self._body = body
+        self._food = food
+        self._score = score
+        self._tick = tick
+        self._level = level
+
+    @classmethod
+    def capture(cls, grid: Grid, world: World, tick: int) -> 'BoardSnapshot':
+        """
+        Capture the current state of the world.
+
+        Positions are read from the transforms of the game objects rather than the grid, so the snapshot reflects
+        the board after the systems have run for the tick.
+
+        :param grid: The grid the world is laid out on.
+        :param world: The world to capture.
+        :param tick: The current tick.
+        :return: A snapshot of the board.
+        """
+        cols, rows = grid.get_num_cols(), grid.get_num_rows()
+        cell_size = grid.get_cell_size()
+        cells = bytearray(cols * rows)
+        food: Optional[Cell] = None
+
+        for game_object in world.get_game_objects():
+            transform_component = game_object.get_component(TransformComponent)
+
+            if transform_component is None:
+                continue
+
+            if isinstance(game_object, Wall):
+                code = WALL
+            elif isinstance(game_object, Snake):
+                code = SNAKE
+            elif isinstance(game_object, Food):
+                code = FOOD
+            else:
+                continue
+
+            x, y = int(transform_component.x // cell_size), int(transform_component.y // cell_size)
+
+            if 0 <= x < cols and 0 <= y < rows and cells[y * cols + x] < code:
+                cells[y * cols + x] = code
+
+            if code == FOOD:
+                food = (x, y)
+
+        body: List[Cell] = []
+
+        # The world is emptied on defeat, in which case there is no snake left to describe.
+        if world.get_game_objects():
+            for segment in world.get_player().get_segments():
+                segment_transform = segment.get_component(TransformComponent)
+
+                if segment_transform:
+                    body.append((int(segment_transform.x // cell_size), int(segment_transform.y // cell_size)))
+
+        return cls(cols, rows, bytes(cells), tuple(body), food, world.get_state().get_state(SCORE), tick, world.get_level())
+
+    def index(self, x: int, y: int) -> int:
+        """
+        Get the index of a cell in the cell buffer.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: The index of the cell.
+        """
+        return y * self._cols + x
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        """
+        Check if a cell is on the board.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: True if the cell is on the board, otherwise False.
+        """
+        return 0 <= x < self._cols and 0 <= y < self._rows
+
+    def get_cell(self, x: int, y: int) -> int:
+        """
+        Get the code of a cell.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: The code of the cell.
+        """
+        return self._cells[y * self._cols + x]
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        """
+        Check if moving into a cell would end the game.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: True if the cell is off the board, a wall or part of the snake, otherwise False.
+        """
+        return not self.in_bounds(x, y) or self._cells[y * self._cols + x] >= SNAKE
+
+    def get_cols(self) -> int:
+        """
+        Get the number of columns on the board.
+
+        :return: The number of columns on the board.
+        """
+        return self._cols
+
+    def get_rows(self) -> int:
+        """
+        Get the number of rows on the board.
+
+        :return: The number of rows on the board.
+        """
+        return self._rows
+
+    def get_cells(self) -> bytes:
+        """
+        Get the cell codes of the board, row-major.
+
+        :return: The cell codes of the board.
+        """
+        return self._cells
+
+    def get_body(self) -> Tuple[Cell, ...]:
+        """
+        Get the cells of the snake, starting with the head.
+
+        :return: The cells of the snake.
+        """
+        return self._body
+
+    def get_head(self) -> Optional[Cell]:
+        """
+        Get the cell of the snake's head.
+
+        :return: The cell of the head, or None if there is no snake.
+        """
+        return self._body[0] if self._body else None
+
+    def get_food(self) -> Optional[Cell]:
+        """
+        Get the cell of the food.
+
+        :return: The cell of the food, or None if there is no food.
+        """
+        return self._food
+
+    def get_score(self) -> int:
+        """
+        Get the score at the time of the snapshot.
+
+        :return: The score.
+        """
+        return self._score
+
+    def get_tick(self) -> int:
+        """
+        Get the tick the snapshot was taken on.
+
+        :return: The tick.
+        """
+        return self._tick
+
+    def get_level(self) -> Optional[Level]:
+        """
+        Get the level the board is laid out from.
+
+        :return: The level, or None if the snapshot was not captured from a world, such as one read from shared memory.
+        """
+        return self._level
@@ -0,0 +1,77 @@
+"""
+This module is responsible for containing the camera, which decides which part of the board is shown in the window.
+"""
+from typing import Tuple
+
+
+class Camera:
+    """
+    The camera is responsible for keeping a target in view when the board is larger than the window.
+    """
+
+    def __init__(self, viewport_width: int, viewport_height: int, world_width: int, world_height: int) -> None:
+        """
+        Create a new camera looking at the top-left corner of the board.
+
+        :param viewport_width: The width of the window in pixels.
+        :param viewport_height: The height of the window in pixels.
+        :param world_width: The width of the board in pixels.
+        :param world_height: The height of the board in pixels.
+        """
+        self._viewport_width = viewport_width
+        self._viewport_height = viewport_height
+        self._world_width = world_width
+        self._world_height = world_height
+        self._x = 0
+        self._y = 0
+
+    def follow(self, x: int, y: int) -> None:
+        """
+        Center the camera on a position, without showing anything beyond the edges of the board.
+
+        If the board is smaller than the window along an axis, the board is centered along that axis instead.
+
+        :param x: The x position to center on, in board pixels.
+        :param y: The y position to center on, in board pixels.
+        """
+        self._x = self._clamp(x - self._viewport_width // 2, self._viewport_width, self._world_width)
+        self._y = self._clamp(y - self._viewport_height // 2, self._viewport_height, self._world_height)
+
+    @staticmethod
+    def _clamp(position: int, viewport_size: int, world_size: int) -> int:
+        """
+        Clamp the position of the camera along a single axis.
+
+        :param position: The desired position of the camera.
+        :param viewport_size: The size of the window along the axis.
+        :param world_size: The size of the board along the axis.
+        :return: The clamped position.
+        """
+        if world_size <= viewport_size:
+            return -(viewport_size - world_size) // 2
+
+        return max(0, min(position, world_size - viewport_size))
+
+    def get_offset(self) -> Tuple[int, int]:
+        """
+        Get the board position shown in the top-left corner of the window.
+
+        :return: The x and y offset of the camera in board pixels.
+        """
+        return self._x, self._y
+
+    def get_visible_cells(self, cell_size: int, cols: int, rows: int) -> Tuple[int, int, int, int]:
+        """
+        Get the range of cells that are at least partially inside the window.
+
+        :param cell_size: The size of a single cell in pixels.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :return: The first column, first row, and one past the last column and row that are visible.
+        """
+        min_x = max(0, self._x // cell_size)
+        min_y = max(0, self._y // cell_size)
+        max_x = min(cols, (self._x + self._viewport_width) // cell_size + 1)
+        max_y = min(rows, (self._y + self._viewport_height) // cell_size + 1)
+
+        return min_x, min_y, max_x, max_y
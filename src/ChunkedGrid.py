@@ -0,0 +1,269 @@
+"""
+This module is responsible for containing the chunked grid, a sparse grid for boards too large to allocate up front.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, overload
+
+from GameObject import GameObject
+from Grid import Grid
+
+Chunk = List[Optional[List[GameObject]]]
+
+
+class ChunkedGrid(Grid):
+    """
+    The chunked grid splits the board into fixed-size square chunks that are only allocated once something is placed
+    in them, so memory scales with the occupied area rather than the size of the board.
+
+    The grid is cleared and refilled every tick, so chunks stay allocated while they are in use and are only evicted
+    once they have stayed empty for EVICT_AFTER_CLEARS clears in a row. Evicted chunks are kept in a small pool and
+    reused when something moves into a new chunk.
+    """
+
+    # The number of clears in a row a chunk has to stay empty through before it is evicted
+    EVICT_AFTER_CLEARS = 8
+
+    def __init__(self, x: int, y: int, width: int, height: int, size: int, chunk_size: int = 32, max_pooled_chunks: int = 64):
+        """
+        Create a new chunked grid.
+
+        :param x: The x offset of the grid.
+        :param y: The y offset of the grid.
+        :param width: The width of the grid.
+        :param height: The height of the grid.
+        :param size: The size of a single cell in the grid.
+        :param chunk_size: The number of cells along each side of a chunk.
+        :param max_pooled_chunks: The number of evicted chunks kept around for reuse.
+        """
+        self._chunk_size = chunk_size
+        self._max_pooled_chunks = max_pooled_chunks
+
+        super().__init__(x, y, width, height, size)
+
+    def _create_cells(self) -> None:
+        """
+        Set up the chunks, none of which are allocated until something is placed in them.
+        """
+        self._chunks: Dict[Tuple[int, int], Chunk] = {}
+        self._chunk_counts: Dict[Tuple[int, int], int] = {}
+        self._pool: List[Chunk] = []
+
+        # The number of clears in a row each chunk has been empty through, and the chunks to evict after a clear
+        self._idle_clears: Dict[Tuple[int, int], int] = {}
+        self._evicted: List[Tuple[int, int]] = []
+
+        self._occupied: List[Tuple[int, int]] = []
+
+    def _locate(self, x: int, y: int) -> Tuple[Tuple[int, int], int]:
+        """
+        Find the chunk a cell belongs to and the index of the cell inside that chunk.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: The key of the chunk and the index of the cell in the chunk.
+        """
+        chunk_x, local_x = divmod(x, self._chunk_size)
+        chunk_y, local_y = divmod(y, self._chunk_size)
+
+        return (chunk_x, chunk_y), local_x * self._chunk_size + local_y
+
+    def add_cell(self, x: int, y: int, value: Any) -> None:
+        """
+        Add a value to a cell in the grid, allocating its chunk if needed.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :param value: The value to add to the cell.
+        """
+        if x < 0 or x >= self.get_num_cols() or y < 0 or y >= self.get_num_rows():
+            raise IndexError("Cell position out of range.")
+
+        key, index = self._locate(x, y)
+        chunk = self._chunks.get(key)
+
+        if chunk is None:
+            chunk = self._pool.pop() if self._pool else [None] * (self._chunk_size * self._chunk_size)
+            self._chunks[key] = chunk
+            self._chunk_counts[key] = 0
+            self._idle_clears[key] = 0
+
+        cell = chunk[index]
+
+        if cell is None:
+            chunk[index] = cell = self._new_cell()
+            self._chunk_counts[key] += 1
+            self._occupied.append((x, y))
+
+        cell.append(value)
+
+    def clear_cell(self, x: int, y: int) -> None:
+        """
+        Clear a cell in the grid. Its chunk stays allocated, and is evicted by clear_all once it has stayed empty.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        """
+        key, index = self._locate(x, y)
+        chunk = self._chunks.get(key)
+
+        if chunk is None:
+            return
+
+        cell = chunk[index]
+
+        if cell is None:
+            return
+
+        self._release_cell(cell)
+        chunk[index] = None
+        self._chunk_counts[key] -= 1
+
+    def clear_all(self) -> None:
+        """
+        Clear all cells in the grid, and evict the chunks that have been empty for EVICT_AFTER_CLEARS clears in a row.
+        """
+        idle_clears = self._idle_clears
+        evicted = self._evicted
+
+        # A chunk that holds cells now was used since the last clear, every other chunk has been idle for one more
+        for key, count in self._chunk_counts.items():
+            if count:
+                idle_clears[key] = 0
+            else:
+                idle_clears[key] += 1
+
+                if idle_clears[key] >= self.EVICT_AFTER_CLEARS:
+                    evicted.append(key)
+
+        for x, y in self._occupied:
+            self.clear_cell(x, y)
+
+        self._occupied.clear()
+
+        for key in evicted:
+            chunk = self._chunks.pop(key)
+            del self._chunk_counts[key]
+            del self._idle_clears[key]
+
+            if len(self._pool) < self._max_pooled_chunks:
+                self._pool.append(chunk)
+
+        evicted.clear()
+
+    def get_occupied_cells(self) -> List[Tuple[int, int]]:
+        """
+        Get every cell in the grid that currently holds a value.
+
+        :return: The x, y positions of the occupied cells.
+        """
+        return [(x, y) for x, y in self._occupied if self.get_cell(x, y)]
+
+    def get_empty_cells(self) -> List[Tuple[int, int]]:
+        """
+        Get every cell in the grid that does not hold a value, column by column.
+
+        This visits every cell of the board, so callers should avoid it on very large boards.
+
+        :return: The x, y positions of the empty cells.
+        """
+        return [
+            (x, y)
+            for x in range(self.get_num_cols())
+            for y in range(self.get_num_rows())
+            if self.get_cell(x, y) is None
+        ]
+
+    def get_cell(self, x: int, y: int) -> Any:
+        """
+        Get the value of a cell in the grid.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: The value of the cell.
+        """
+        key, index = self._locate(x, y)
+        chunk = self._chunks.get(key)
+
+        return chunk[index] if chunk is not None else None
+
+    def get_num_chunks(self) -> int:
+        """
+        Get the number of chunks currently allocated.
+
+        :return: The number of allocated chunks.
+        """
+        return len(self._chunks)
+
+    def get_grid(self) -> Sequence[Sequence[Any]]:
+        """
+        Get a view of the grid, indexed by column and then by row like a dense grid, which looks cells up in their
+        chunks rather than copying them.
+
+        :return: The view of the grid.
+        """
+        return ChunkedGridView(self)
+
+
+class ChunkedColumn(Sequence[Any]):
+    """
+    A view of a single column of a chunked grid.
+    """
+
+    def __init__(self, grid: ChunkedGrid, x: int) -> None:
+        """
+        Create a new view of a column.
+
+        :param grid: The grid the column is in.
+        :param x: The x position of the column.
+        """
+        self._grid = grid
+        self._x = x
+
+    def __len__(self) -> int:
+        return self._grid.get_num_rows()
+
+    @overload
+    def __getitem__(self, y: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, y: slice) -> Sequence[Any]: ...
+
+    def __getitem__(self, y: Union[int, slice]) -> Any:
+        if isinstance(y, slice):
+            return [self._grid.get_cell(self._x, row) for row in range(*y.indices(len(self)))]
+
+        if not 0 <= y < len(self):
+            raise IndexError("Cell position out of range.")
+
+        return self._grid.get_cell(self._x, y)
+
+
+class ChunkedGridView(Sequence[Sequence[Any]]):
+    """
+    A view of a chunked grid, indexed by column and then by row like a dense grid.
+    """
+
+    def __init__(self, grid: ChunkedGrid) -> None:
+        """
+        Create a new view of a chunked grid.
+
+        :param grid: The grid to view.
+        """
+        self._grid = grid
+
+    def __len__(self) -> int:
+        return self._grid.get_num_cols()
+
+    @overload
+    def __getitem__(self, x: int) -> Sequence[Any]: ...
+
+    @overload
+    def __getitem__(self, x: slice) -> Sequence[Sequence[Any]]: ...
+
+    def __getitem__(self, x: Union[int, slice]) -> Union[Sequence[Any], Sequence[Sequence[Any]]]:
+        if isinstance(x, slice):
+            return [ChunkedColumn(self._grid, column) for column in range(*x.indices(len(self)))]
+
+        if not 0 <= x < len(self):
+            raise IndexError("Cell position out of range.")
+
+        return ChunkedColumn(self._grid, x)
@@ -1,7 +1,9 @@
-from typing import Tuple
+from typing import Optional, Tuple, TYPE_CHECKING
 from abc import ABC
 
-import pygame
+# pygame is only needed to draw sprites, headless runs never import it.
+if TYPE_CHECKING:
+    import pygame
 
 
 class Component(ABC):
@@ -23,7 +25,10 @@ class BoxSpriteComponent(Component):
         self._color = color
         self._outline = outline
 
-    def draw(self, screen: pygame.Surface, x: int, y: int) -> None:
+        # Created on the first draw and moved on every draw after it
+        self._rect: Optional['pygame.Rect'] = None
+
+    def draw(self, screen: 'pygame.Surface', x: int, y: int) -> None:
         """
         Draw a square on the screen at the specified position.
 
@@ -31,11 +36,27 @@ class BoxSpriteComponent(Component):
         :param x: The x position of the square.
         :param y: The y position of the square.
         """
-        square_rect = pygame.Rect(x, y, self._width, self._height)
+        import pygame
+
+        square_rect = self._rect
+
+        if square_rect is None:
+            square_rect = self._rect = pygame.Rect(x, y, self._width, self._height)
+        else:
+            square_rect.x = x
+            square_rect.y = y
 
         # Draw the square on the screen with the specified color
         pygame.draw.rect(screen, self._color, square_rect, self._outline)
 
+    def get_color(self) -> Tuple[int, int, int]:
+        """
+        Get the color of the square.
+
+        :return: The color of the square.
+        """
+        return self._color
+
 
 class CircleSpriteComponent(Component):
     def __init__(self, radius: int, color: Tuple[int, int, int] = (255, 255, 255)):
@@ -48,7 +69,7 @@ class CircleSpriteComponent(Component):
         self._radius = radius
         self._color = color
 
-    def draw(self, screen: pygame.Surface, x: int, y: int) -> None:
+    def draw(self, screen: 'pygame.Surface', x: int, y: int) -> None:
         """
         Draw a circle on the screen at the specified position.
 
@@ -56,8 +77,18 @@ class CircleSpriteComponent(Component):
         :param x: The x position of the circle.
         :param y: The y position of the circle.
         """
+        import pygame
+
         pygame.draw.circle(screen, self._color, (x + self._radius * 2, y + self._radius * 2), radius=self._radius)
 
+    def get_color(self) -> Tuple[int, int, int]:
+        """
+        Get the color of the circle.
+
+        :return: The color of the circle.
+        """
+        return self._color
+
 
 class TransformComponent(Component):
     def __init__(self, x: int, y: int, width: int, height: int) -> None:
@@ -242,6 +273,14 @@ class PhysicsBodyComponent(Component):
             self._handlers[game_object_type] = []
         self._handlers[game_object_type].append(handler)
 
+    def has_collision_handlers(self) -> bool:
+        """
+        Check if any collision handlers were added.
+
+        :return: True if collisions with some type of game object are handled, otherwise False.
+        """
+        return bool(self._handlers)
+
     def on_collision(self, game_object) -> None:
         if self._handlers.get(type(game_object)) is not None:
             for handler in self._handlers[type(game_object)]:
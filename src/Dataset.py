@@ -0,0 +1,534 @@
+"""
+This module is responsible for exporting played games as a training dataset of (observation, action, reward) steps.
+
+Steps are written into shards of .npy files, one per array, next to an index.json describing the shards and the
+episodes in them. The arrays are plain .npy files, so training pipelines can memory-map them with numpy.load and
+stream them without loading the dataset into memory. Writing them does not need numpy.
+
+Observations are written straight into a chunk of rows from the transforms of the snake and food, over a copy of the
+walls of the level. Full chunks are handed to a writer thread, which copies them into memory-mapped shard files.
+
+Reading a dataset back with load_shards needs numpy, which is only imported when called.
+"""
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+
+from Autopilot import DIRECTIONS
+from BoardSnapshot import EMPTY, FOOD, SNAKE, WALL
+from Component import PhysicsBodyComponent, TransformComponent
+from GameObject import Food, GameObject
+from GameStateManager import SCORE, STATUS
+from Simulation import Simulation
+
+# The cell code of the head of the snake, which only appears in observations
+HEAD = 4
+
+# The action of a step is the index of the direction the head moved in, in DIRECTIONS, or NO_ACTION if it did not move
+NO_ACTION = -1
+
+# The reward for eating a piece of food, and for being defeated
+FOOD_REWARD = 1
+DEFEAT_REWARD = -1
+
+INDEX_VERSION = 1
+INDEX_FILE = "index.json"
+
+# The default sizes of chunks and shards, in bytes of observations, so their number of steps shrinks as boards grow
+CHUNK_BYTES = 16 * 1024 * 1024
+SHARD_BYTES = 256 * 1024 * 1024
+
+# Every .npy header is padded to this many bytes, so the shape of a shard can be rewritten in place once it is done
+NPY_HEADER_SIZE = 128
+
+# Maps x_dir and y_dir, each offset by one, to an action
+ACTIONS = [NO_ACTION] * 9
+for _action, (_x_dir, _y_dir) in enumerate(DIRECTIONS):
+    ACTIONS[(_y_dir + 1) * 3 + _x_dir + 1] = _action
+
+ARRAY_TYPES = {
+    "observations": "|u1",
+    "actions": "|i1",
+    "rewards": ("<" if sys.byteorder == "little" else ">") + "i2",
+    "dones": "|u1",
+}
+
+
+def npy_header(descr: str, shape: Tuple[int, ...]) -> bytes:
+    """
+    Build the header of a version 1.0 .npy file.
+
+    :param descr: The numpy type string of the array.
+    :param shape: The shape of the array.
+    :return: The header, NPY_HEADER_SIZE bytes long.
+    """
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape!r}, }}".encode("latin1")
+    prefix = b"\x93NUMPY\x01\x00" + struct.pack("<H", NPY_HEADER_SIZE - 10)
+
+    if len(prefix) + len(header) + 1 > NPY_HEADER_SIZE:
+        raise ValueError(f"The shape {shape} does not fit in a .npy header.")
+
+    return prefix + header.ljust(NPY_HEADER_SIZE - len(prefix) - 1) + b"\n"
+
+
+class Chunk:
+    """
+    A chunk of consecutive steps, laid out as the rows of every array.
+    """
+
+    __slots__ = ("observations", "actions", "rewards", "dones", "count")
+
+    def __init__(self, steps: int, cells: int) -> None:
+        """
+        Create a new, empty chunk.
+
+        :param steps: The number of steps the chunk holds.
+        :param cells: The number of cells in an observation.
+        """
+        self.observations = bytearray(steps * cells)
+        self.actions = bytearray(steps)
+        self.rewards = array("h", bytes(2 * steps))
+        self.dones = bytearray(steps)
+        self.count = 0
+
+    def get_arrays(self) -> Dict[str, memoryview]:
+        """
+        Get the rows filled so far of every array.
+
+        :return: The bytes of every array, by name.
+        """
+        count = self.count
+        observations = memoryview(self.observations)
+
+        return {
+            "observations": observations[:count * (len(observations) // len(self.actions))],
+            "actions": memoryview(self.actions)[:count],
+            "rewards": memoryview(self.rewards).cast("B")[:2 * count],
+            "dones": memoryview(self.dones)[:count],
+        }
+
+
+class ShardFile:
+    """
+    A single .npy file of a shard, memory-mapped at its full size up front and cut down to the rows written once done.
+    """
+
+    def __init__(self, path: str, descr: str, capacity: int, row_shape: Tuple[int, ...]) -> None:
+        """
+        Create a new shard file.
+
+        :param path: The path of the file.
+        :param descr: The numpy type string of the array.
+        :param capacity: The number of rows the file can hold.
+        :param row_shape: The shape of a single row.
+        """
+        self._descr = descr
+        self._row_shape = row_shape
+        self._written = 0
+
+        self._file = open(path, "w+b")
+        self._file.write(npy_header(descr, (capacity,) + row_shape))
+        self._file.truncate(NPY_HEADER_SIZE + capacity * self._row_size())
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _row_size(self) -> int:
+        """
+        Get the number of bytes in a single row.
+
+        :return: The size of a row.
+        """
+        size = int(self._descr[2:])
+
+        for length in self._row_shape:
+            size *= length
+
+        return size
+
+    def write(self, rows: memoryview) -> None:
+        """
+        Append rows to the file.
+
+        :param rows: The bytes of the rows.
+        """
+        start = NPY_HEADER_SIZE + self._written
+        self._map[start:start + len(rows)] = rows
+        self._written += len(rows)
+
+    def close(self) -> None:
+        """
+        Finish the file, with only the rows written.
+        """
+        self._map.flush()
+        self._map.close()
+
+        self._file.seek(0)
+        self._file.write(npy_header(self._descr, (self._written // self._row_size(),) + self._row_shape))
+        self._file.truncate(NPY_HEADER_SIZE + self._written)
+        self._file.close()
+
+
+class DatasetWriter:
+    """
+    The dataset writer is responsible for collecting the steps of played games into chunks and writing full chunks
+    into shards on its own thread.
+
+    Chunks come from a small pool. When the writer thread falls behind and the pool runs dry, adding a step waits for
+    a chunk to be written rather than dropping steps.
+    """
+
+    def __init__(self, path: str, cols: int, rows: int, shard_steps: Optional[int] = None, chunk_steps: Optional[int] = None, chunks: int = 4) -> None:
+        """
+        Create a new dataset writer and start its writer thread.
+
+        :param path: The directory to write the dataset into.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param shard_steps: The most steps in a shard, defaults to as many whole chunks as fit in SHARD_BYTES of
+            observations.
+        :param chunk_steps: The most steps in a chunk handed to the writer thread at once, defaults to as many as fit
+            in CHUNK_BYTES of observations, up to 1024. Chunks are made smaller to split a shard evenly.
+        :param chunks: The number of chunks in the pool.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        self._path = path
+        self._cols = cols
+        self._rows = rows
+        chunk_steps = chunk_steps or max(min(CHUNK_BYTES // (cols * rows), 1024), 1)
+
+        if shard_steps:
+            # Shards are written a whole chunk at a time, so the shard is split evenly into as few chunks as it takes
+            # for it to never hold more steps than asked for
+            shard_chunks = -(-shard_steps // chunk_steps)
+            chunk_steps = max(shard_steps // shard_chunks, 1)
+            self._shard_steps = shard_chunks * chunk_steps
+        else:
+            self._shard_steps = -(-(SHARD_BYTES // (cols * rows)) // chunk_steps) * chunk_steps
+
+        self._chunk_steps = chunk_steps
+
+        self._free: "queue.Queue[Chunk]" = queue.Queue()
+        self._full: "queue.Queue[Optional[Chunk]]" = queue.Queue()
+
+        for _ in range(max(chunks, 2)):
+            self._free.put(Chunk(chunk_steps, cols * rows))
+
+        self._chunk = self._free.get()
+        self._steps = 0
+        self._episode_start = 0
+        self._episodes: List[Dict[str, Any]] = []
+
+        # Only touched by the writer thread, until it is joined
+        self._shards: List[Dict[str, Any]] = []
+        self._shard_files: Optional[Dict[str, ShardFile]] = None
+        self._shard_written = 0
+        self._error: Optional[BaseException] = None
+
+        self._thread = threading.Thread(target=self._run, name="dataset-writer", daemon=True)
+        self._thread.start()
+
+    def next_row(self) -> Tuple[Chunk, int]:
+        """
+        Get the chunk and row the next step goes in, for the caller to fill before calling add_step.
+
+        :return: The chunk and the index of the row in it.
+        """
+        return self._chunk, self._chunk.count
+
+    def add_step(self) -> None:
+        """
+        Add the step filled into the next row, handing the chunk to the writer thread if it is full.
+        """
+        chunk = self._chunk
+        chunk.count += 1
+        self._steps += 1
+
+        if chunk.count == self._chunk_steps:
+            self._flush()
+
+    def end_episode(self, score: int, defeated: bool) -> None:
+        """
+        Mark every step since the last episode ended as an episode.
+
+        :param score: The final score of the episode.
+        :param defeated: Whether the episode ended in defeat, rather than being cut short.
+        """
+        if self._steps > self._episode_start:
+            self._episodes.append({"start": self._episode_start, "steps": self._steps - self._episode_start, "score": score, "defeated": defeated})
+
+        self._episode_start = self._steps
+
+    def _flush(self) -> None:
+        """
+        Hand the current chunk to the writer thread and take a free one.
+        """
+        if self._error:
+            raise RuntimeError("The dataset writer stopped") from self._error
+
+        self._full.put(self._chunk)
+        self._chunk = self._free.get()
+
+    def _run(self) -> None:
+        """
+        Write chunks into shards until the writer is closed.
+        """
+        while True:
+            chunk = self._full.get()
+
+            if chunk is None:
+                break
+
+            try:
+                if self._error is None:
+                    self._write_chunk(chunk)
+            except Exception as error:
+                print(f"Stopped writing the dataset: {error}", file=sys.stderr)
+                self._error = error
+            finally:
+                chunk.count = 0
+                self._free.put(chunk)
+
+        if self._shard_files is not None and self._error is None:
+            self._close_shard()
+
+    def _write_chunk(self, chunk: Chunk) -> None:
+        """
+        Copy a chunk into the current shard, starting a new shard if there is none.
+
+        :param chunk: The chunk to write.
+        """
+        if self._shard_files is None:
+            prefix = os.path.join(self._path, f"shard_{len(self._shards):05d}")
+            self._shard_files = {name: ShardFile(f"{prefix}_{name}.npy", descr, self._shard_steps, (self._rows, self._cols) if name == "observations" else ()) for name, descr in ARRAY_TYPES.items()}
+
+        for name, rows in chunk.get_arrays().items():
+            self._shard_files[name].write(rows)
+
+        self._shard_written += chunk.count
+
+        if self._shard_written >= self._shard_steps:
+            self._close_shard()
+
+    def _close_shard(self) -> None:
+        """
+        Finish the files of the current shard.
+        """
+        if self._shard_files is None:
+            return
+
+        for shard_file in self._shard_files.values():
+            shard_file.close()
+
+        name = f"shard_{len(self._shards):05d}"
+        self._shards.append({"steps": self._shard_written, "files": {array_name: f"{name}_{array_name}.npy" for array_name in ARRAY_TYPES}})
+        self._shard_files = None
+        self._shard_written = 0
+
+    def get_size(self) -> Tuple[int, int]:
+        """
+        Get the size of the board of every observation.
+
+        :return: The number of columns and rows.
+        """
+        return self._cols, self._rows
+
+    def get_steps(self) -> int:
+        """
+        Get the number of steps added so far.
+
+        :return: The number of steps.
+        """
+        return self._steps
+
+    def format(self) -> str:
+        """
+        Format what was written.
+
+        :return: A single line summary.
+        """
+        return f"Exported {self._steps} steps of {len(self._episodes)} episodes to {self._path} in {len(self._shards)} shards"
+
+    def close(self) -> None:
+        """
+        Write every step added so far, then stop the writer thread and write the index.
+        """
+        if not self._thread.is_alive():
+            return
+
+        if self._chunk.count:
+            self._full.put(self._chunk)
+
+        self._full.put(None)
+        self._thread.join()
+
+        if self._error:
+            raise RuntimeError("The dataset writer stopped") from self._error
+
+        index = {
+            "version": INDEX_VERSION,
+            "cols": self._cols,
+            "rows": self._rows,
+            "codes": {"empty": EMPTY, "food": FOOD, "snake": SNAKE, "wall": WALL, "head": HEAD},
+            "actions": ["up", "down", "left", "right"],
+            "steps": self._steps,
+            "shards": self._shards,
+            "episodes": self._episodes,
+        }
+
+        # Written aside and moved into place, so a reader never sees half an index
+        index_path = os.path.join(self._path, INDEX_FILE)
+
+        with open(index_path + ".tmp", "w") as file:
+            json.dump(index, file, indent=1)
+
+        os.replace(index_path + ".tmp", index_path)
+
+
+class DatasetRecorder:
+    """
+    The dataset recorder is responsible for turning every tick of a simulation into a step of a dataset: the board
+    before the tick, the direction the snake moved in during the tick, and the reward for it.
+
+    The step of a tick is only complete once the tick is over, so the board is written into the next row at the end of
+    every tick and the row is added at the end of the following tick.
+    """
+
+    def __init__(self, simulation: Simulation, writer: DatasetWriter) -> None:
+        """
+        Create a new dataset recorder, recording from the current tick on.
+
+        :param simulation: The simulation to record.
+        :param writer: The writer to add the steps to.
+        """
+        grid = simulation.get_grid()
+        world = simulation.get_world()
+
+        if (grid.get_num_cols(), grid.get_num_rows()) != writer.get_size():
+            raise ValueError(f"The board is {grid.get_num_cols()}x{grid.get_num_rows()} but the dataset is {writer.get_size()[0]}x{writer.get_size()[1]}.")
+
+        self._simulation = simulation
+        self._writer = writer
+        self._world = world
+        self._state = world.get_state()
+        self._cols = grid.get_num_cols()
+        self._rows = grid.get_num_rows()
+        self._cell_size = grid.get_cell_size()
+
+        # The walls never move, so every observation starts from a copy of them
+        self._background = bytes(world.get_level().get_walls()).translate(bytes([EMPTY] + [WALL] * 255))
+
+        self._observed = False
+        self._score = self._state.get_state(SCORE)
+        self._observe()
+
+        simulation.add_tick_listener(self._on_tick)
+        world.subscribe("started", self._on_started)
+
+    def _observe(self) -> None:
+        """
+        Write the board into the next row of the writer.
+        """
+        self._observed = False
+
+        if self._state.get_state(STATUS) != "in-game":
+            return
+
+        chunk, row = self._writer.next_row()
+        cols, rows, cell_size = self._cols, self._rows, self._cell_size
+        size = cols * rows
+        start = row * size
+
+        observations = chunk.observations
+        observations[start:start + size] = self._background
+
+        for game_object in self._world.get_game_objects():
+            if type(game_object) is Food:
+                transform = game_object.get_component(TransformComponent)
+
+                if transform:
+                    x, y = transform.x // cell_size, transform.y // cell_size
+
+                    if 0 <= x < cols and 0 <= y < rows:
+                        observations[start + y * cols + x] = FOOD
+
+        # The head goes last, as a new segment starts out on the cell of the segment before it
+        segments = self._world.get_player().get_segments()
+
+        for index in range(len(segments) - 1, -1, -1):
+            transform = segments[index].get_component(TransformComponent)
+
+            if transform:
+                x, y = transform.x // cell_size, transform.y // cell_size
+
+                if 0 <= x < cols and 0 <= y < rows:
+                    observations[start + y * cols + x] = SNAKE if index else HEAD
+
+        self._observed = True
+
+    def _on_started(self, player: GameObject) -> None:
+        """
+        End the episode in progress, if it did not already end in defeat, and observe the new board for the first step
+        of the next one.
+
+        :param player: The player of the new board.
+        """
+        if self._observed:
+            self._writer.end_episode(self._score, False)
+
+        self._score = self._state.get_state(SCORE)
+        self._observe()
+
+    def _on_tick(self) -> None:
+        """
+        Complete the step of the tick, and observe the board for the next one.
+        """
+        score = self._state.get_state(SCORE)
+        defeated = self._state.get_state(STATUS) != "in-game"
+
+        if self._observed:
+            chunk, row = self._writer.next_row()
+            body = self._world.get_player().get_component(PhysicsBodyComponent)
+
+            action = ACTIONS[(body.y_dir + 1) * 3 + body.x_dir + 1] if body else NO_ACTION
+            chunk.actions[row] = action & 0xFF
+            chunk.rewards[row] = (score - self._score) * FOOD_REWARD + (DEFEAT_REWARD if defeated else 0)
+            chunk.dones[row] = defeated
+            self._writer.add_step()
+
+            if defeated:
+                self._writer.end_episode(score, True)
+
+        self._score = score
+        self._observe()
+
+    def finish(self) -> None:
+        """
+        End the episode being recorded, if it has not already ended in defeat.
+        """
+        self._writer.end_episode(self._state.get_state(SCORE), False)
+        self._observed = False
+
+
+def load_shards(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Memory-map every shard of a dataset, in order. Needs numpy.
+
+    :param path: The directory of the dataset.
+    :return: The arrays of every shard, by name, as read-only memory maps.
+    """
+    import numpy
+
+    with open(os.path.join(path, INDEX_FILE)) as file:
+        index = json.load(file)
+
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"{path} is not a version {INDEX_VERSION} dataset.")
+
+    for shard in index["shards"]:
+        yield {name: numpy.load(os.path.join(path, file_name), mmap_mode="r") for name, file_name in shard["files"].items()}
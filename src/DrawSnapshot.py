@@ -0,0 +1,203 @@
+"""
+This module is responsible for containing draw snapshots, which hold everything needed to draw a tick so it can be
+drawn on one thread while the simulation runs the next tick on another, and the buffer that passes them between the
+two.
+"""
+from array import array
+from typing import Optional, Tuple, Union
+import threading
+
+from Camera import Camera
+from Component import BoxSpriteComponent, CircleSpriteComponent, TransformComponent
+from GameStateManager import SCORE, STATUS, GameStateManager
+from Grid import Grid
+from World import World
+
+Sprite = Union[BoxSpriteComponent, CircleSpriteComponent]
+
+
+class DrawSnapshot:
+    """
+    The draw snapshot is responsible for holding the sprites of a single tick and where to draw them.
+
+    Sprites are shared with the game objects rather than copied, as they never change once created, while positions
+    are copied into a flat array of x, y pairs. A snapshot is never changed once captured.
+    """
+
+    __slots__ = ("_sprites", "_positions", "_head", "_score", "_status", "_tick", "_offset")
+
+    def __init__(self, sprites: Tuple[Sprite, ...], positions: "array[int]", head: Optional[Tuple[int, int]], score: int, status: str, tick: int, offset: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Create a new draw snapshot.
+
+        :param sprites: The sprite of every drawable game object, in drawing order.
+        :param positions: The x and y position of every sprite, one after the other.
+        :param head: The position of the head of the player, if the player is in the world.
+        :param score: The score.
+        :param status: The game status.
+        :param tick: The tick the snapshot was captured after.
+        :param offset: The position of the camera the sprites were limited to, if they were captured through one.
+        """
+        self._sprites = sprites
+        self._positions = positions
+        self._head = head
+        self._score = score
+        self._status = status
+        self._tick = tick
+        self._offset = offset
+
+    @classmethod
+    def capture(cls, world: World, state: GameStateManager, tick: int, grid: Optional[Grid] = None, camera: Optional[Camera] = None) -> "DrawSnapshot":
+        """
+        Capture everything needed to draw the world as it is now.
+
+        Given a grid and a camera, the camera follows the head of the player and only the game objects in the cells it
+        can see are captured, found through the grid, so capturing costs the same no matter how large the board is.
+        The camera must belong to the capturing thread, as following the head moves it.
+
+        :param world: The world to capture.
+        :param state: The game state to take the score and status from.
+        :param tick: The current tick.
+        :param grid: The grid the world is indexed in.
+        :param camera: The camera to limit the snapshot to the view of.
+        :return: The snapshot.
+        """
+        sprites = []
+        positions = array("i")
+
+        head: Optional[Tuple[int, int]] = None
+        head_transform = world.get_player().get_component(TransformComponent)
+
+        if head_transform and world.has_player():
+            head = (head_transform.x, head_transform.y)
+
+        if grid and camera:
+            if head:
+                camera.follow(*head)
+
+            get_cell = grid.get_cell
+            min_x, min_y, max_x, max_y = camera.get_visible_cells(grid.get_cell_size(), grid.get_num_cols(), grid.get_num_rows())
+            game_objects = [entity for x in range(min_x, max_x) for y in range(min_y, max_y) for entity in get_cell(x, y) or ()]
+        else:
+            game_objects = world.get_game_objects()
+
+        for game_object in game_objects:
+            transform = game_object.get_component(TransformComponent)
+            sprite: Optional[Sprite] = game_object.get_component(BoxSpriteComponent) or game_object.get_component(CircleSpriteComponent)
+
+            if transform and sprite:
+                sprites.append(sprite)
+                positions.append(transform.x)
+                positions.append(transform.y)
+
+        offset = camera.get_offset() if grid and camera else None
+
+        return cls(tuple(sprites), positions, head, state.get_state(SCORE), state.get_state(STATUS), tick, offset)
+
+    def get_sprites(self) -> Tuple[Sprite, ...]:
+        """
+        Get the sprite of every drawable game object.
+
+        :return: The sprites, in drawing order.
+        """
+        return self._sprites
+
+    def get_positions(self) -> "array[int]":
+        """
+        Get the position of every sprite, which must not be changed.
+
+        :return: The x and y position of every sprite, one after the other.
+        """
+        return self._positions
+
+    def get_head(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the position of the head of the player.
+
+        :return: The x and y position of the head, or None if the player is not in the world.
+        """
+        return self._head
+
+    def get_offset(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the position of the camera the sprites were limited to.
+
+        :return: The x and y offset of the camera, or None if every sprite was captured.
+        """
+        return self._offset
+
+    def get_score(self) -> int:
+        """
+        Get the score.
+
+        :return: The score.
+        """
+        return self._score
+
+    def get_status(self) -> str:
+        """
+        Get the game status.
+
+        :return: The game status.
+        """
+        return self._status
+
+    def get_tick(self) -> int:
+        """
+        Get the tick the snapshot was captured after.
+
+        :return: The tick.
+        """
+        return self._tick
+
+
+class SnapshotBuffer:
+    """
+    The snapshot buffer is responsible for handing the latest draw snapshot from the simulation to the renderer.
+
+    It holds two snapshots: the back snapshot, published by the simulation and not drawn yet, and the front snapshot,
+    which the renderer draws until a newer one is published. Publishing only replaces the back snapshot, so the
+    simulation never waits for a frame to finish, and snapshots that were replaced before being drawn are counted.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a new, empty snapshot buffer.
+        """
+        self._lock = threading.Lock()
+        self._back: Optional[DrawSnapshot] = None
+        self._front: Optional[DrawSnapshot] = None
+        self._skipped = 0
+
+    def publish(self, snapshot: DrawSnapshot) -> None:
+        """
+        Publish the snapshot of the tick that just ran.
+
+        :param snapshot: The snapshot to publish.
+        """
+        with self._lock:
+            if self._back is not None:
+                self._skipped += 1
+
+            self._back = snapshot
+
+    def swap(self) -> Optional[DrawSnapshot]:
+        """
+        Bring the latest published snapshot to the front, if one was published since the last swap.
+
+        :return: The front snapshot, or None if nothing was published yet.
+        """
+        with self._lock:
+            if self._back is not None:
+                self._front = self._back
+                self._back = None
+
+            return self._front
+
+    def get_skipped(self) -> int:
+        """
+        Get the number of snapshots that were published but never drawn, because the renderer fell behind.
+
+        :return: The number of skipped snapshots.
+        """
+        return self._skipped
@@ -0,0 +1,152 @@
+"""
+This module is responsible for the event bus, which queues typed events while a phase of the tick runs and hands them
+to their handlers in batches once the phase is over, so handlers never change the world while a system iterates it.
+"""
+from typing import Any, Callable, Dict, List, Type, TypeVar
+
+
+class Event:
+    """
+    An event is responsible for holding the fields of something that happened during a tick.
+
+    Events are pooled by the event bus, which fills a free event of the type with the fields of every emit and takes
+    it back once it has been dispatched, so handlers must not keep them.
+    """
+    __slots__ = ()
+
+    def set(self, *fields: Any) -> None:
+        """
+        Fill the event with the fields it is emitted with.
+
+        :param fields: The fields of the event, in the order of its slots.
+        """
+        raise NotImplementedError
+
+
+E = TypeVar("E", bound=Event)
+
+
+class EventBus:
+    """
+    The event bus is responsible for queueing events by type and dispatching them in batches.
+
+    Every event type has to be registered before events of that type are emitted. Each type gets a pair of lists
+    when it is registered, which are reused every tick: one collects the events emitted, the other holds the batch
+    being dispatched, so handlers may emit more events of the same type without changing the batch they were given.
+    Each type also gets a pool of events, which are filled in when emitted and returned once dispatched, so a tick only
+    creates events when it emits more of a type than any tick before it.
+
+    Events are dispatched type by type in the order the types were registered, and within a type in the order they
+    were emitted, so the results never depend on how the events were interleaved.
+    """
+
+    # Handlers that keep emitting events in response to each other are stopped after this many rounds
+    MAX_ROUNDS = 16
+
+    def __init__(self) -> None:
+        """
+        Create a new event bus with no event types.
+        """
+        self._types: List[type] = []
+        self._queues: Dict[type, List[Any]] = {}
+        self._batches: Dict[type, List[Any]] = {}
+        self._pools: Dict[type, List[Any]] = {}
+        self._handlers: Dict[type, List[Callable[[List[Any]], None]]] = {}
+
+    def register(self, event_type: Type[E]) -> None:
+        """
+        Register an event type, dispatched after every type registered before it.
+
+        :param event_type: The event type.
+        """
+        if event_type in self._queues:
+            raise ValueError(f"{event_type.__name__} is already registered.")
+
+        self._types.append(event_type)
+        self._queues[event_type] = []
+        self._batches[event_type] = []
+        self._pools[event_type] = []
+        self._handlers[event_type] = []
+
+    def subscribe(self, event_type: Type[E], handler: Callable[[List[E]], None]) -> None:
+        """
+        Subscribe a handler to every batch of events of a type.
+
+        :param event_type: The event type, which must be registered.
+        :param handler: The handler, given the events of the type emitted since the last dispatch, in the order they
+            were emitted. The list is reused once the handler returns, so it must not be kept.
+        """
+        if event_type not in self._handlers:
+            raise ValueError(f"{event_type.__name__} is not registered.")
+
+        self._handlers[event_type].append(handler)
+
+    def emit(self, event_type: Type[Event], *fields: Any) -> None:
+        """
+        Queue an event until the next dispatch, filling in a pooled event of the type with its fields.
+
+        :param event_type: The event type, which must be registered.
+        :param fields: The fields of the event, in the order of its slots.
+        """
+        queue = self._queues.get(event_type)
+
+        if queue is None:
+            raise ValueError(f"{event_type.__name__} is not registered.")
+
+        pool = self._pools[event_type]
+        event = pool.pop() if pool else event_type()
+        event.set(*fields)
+        queue.append(event)
+
+    def get_pending(self, event_type: Type[E]) -> int:
+        """
+        Get the number of events of a type waiting to be dispatched.
+
+        :param event_type: The event type.
+        :return: The number of events queued.
+        """
+        return len(self._queues.get(event_type, ()))
+
+    def dispatch(self) -> int:
+        """
+        Hand every queued event to the handlers of its type, until no handler emits any more events.
+
+        :return: The number of events dispatched.
+        """
+        dispatched = 0
+
+        for _ in range(self.MAX_ROUNDS):
+            emitted = False
+
+            for event_type in self._types:
+                queue = self._queues[event_type]
+
+                if not queue:
+                    continue
+
+                # Swap the lists, so events emitted by the handlers are queued for the next round
+                batch = queue
+                self._queues[event_type] = self._batches[event_type]
+                self._batches[event_type] = batch
+                emitted = True
+
+                try:
+                    for handler in self._handlers[event_type]:
+                        handler(batch)
+                finally:
+                    dispatched += len(batch)
+                    self._pools[event_type].extend(batch)
+                    batch.clear()
+
+            if not emitted:
+                return dispatched
+
+        raise RuntimeError(f"Events were still being emitted after {self.MAX_ROUNDS} rounds of dispatch.")
+
+    def clear(self) -> None:
+        """
+        Discard every queued event.
+        """
+        for event_type, queue in self._queues.items():
+            self._pools[event_type].extend(queue)
+            queue.clear()
@@ -1,6 +1,53 @@
+from typing import Any, List
+
+from Component import PhysicsBodyComponent
+from EventBus import Event
 from Grid import Grid
-from GameStateManager import GameStateManager
-from GameObject import Snake, Food
+from GameStateManager import GameStateManager, SCORE
+from GameObject import GameObject, Snake, Food
+
+
+class Collision(Event):
+    """
+    Two game objects with physics bodies overlapped at the end of a tick.
+    """
+    __slots__ = ("first", "second")
+
+    first: GameObject
+    second: GameObject
+
+    def set(self, *fields: Any) -> None:
+        self.first, self.second = fields
+
+
+class FoodEaten(Event):
+    """
+    A snake ran into food.
+    """
+    __slots__ = ("snake", "food")
+
+    snake: Snake
+    food: Food
+
+    def set(self, *fields: Any) -> None:
+        self.snake, self.food = fields
+
+
+class PlayerDefeated(Event):
+    """
+    The player ran into a wall or a snake.
+    """
+    __slots__ = ("snake",)
+
+    snake: Snake
+
+    def set(self, *fields: Any) -> None:
+        self.snake, = fields
+
+
+# The order events are dispatched in at the end of every tick. Collisions come first as they lead to the game events,
+# and food is eaten before the player is defeated, so eating and dying in the same tick still scores
+EVENT_TYPES = (Collision, FoodEaten, PlayerDefeated)
 
 
 class EventSystem:
@@ -8,6 +55,8 @@ class EventSystem:
         """
         The event system is responsible for handling events that occur in the game.
 
+        Events are handled in batches, every event of a type emitted during a tick at once.
+
         :param world: The world to handle events for.
         :param grid: The grid to handle events for.
         :param state: The game state to handle events for.
@@ -16,18 +65,53 @@ class EventSystem:
         self._state = state
         self._grid = grid
 
-    def on_eat_food(self, snake: Snake, food: Food) -> None:
+    def on_collisions(self, events: List[Collision]) -> None:
+        """
+        Handle collisions by triggering the on_collision methods of the physics bodies of both game objects, and
+        passing them the game object they collided with.
+
+        :param events: The collisions, in the order they were detected.
+        """
+        for event in events:
+            first, second = event.first, event.second
+            first_body = first.get_component(PhysicsBodyComponent)
+            second_body = second.get_component(PhysicsBodyComponent)
+
+            if first_body and second_body:
+                first_body.on_collision(second)
+                second_body.on_collision(first)
+
+    def on_food_eaten(self, events: List[FoodEaten]) -> None:
         """
-        Handle the event of a snake eating food.
+        Handle snakes eating food.
 
-        :param snake: The snake that ate the food.
-        :param food: The food that was eaten.
+        :param events: The food eaten, in the order it was eaten.
         """
-        self._world.remove_game_object(food)
+        eaten = 0
 
-        # Add a segment to the snake
-        segment = snake.add_segment()
-        self._world.add_game_object(segment)
+        for event in events:
+            snake, food = event.snake, event.food
+
+            # The same food may be reported more than once, but is only eaten once
+            if food not in self._world.get_game_objects():
+                continue
+
+            self._world.remove_game_object(food)
+
+            # Add a segment to the snake
+            segment = snake.add_segment()
+            self._world.add_game_object(segment)
+            eaten += 1
 
         # Update the player's score
-        self._state.set_state("score", int(self._state.get_state("score")) + 1)
+        if eaten:
+            self._state.set_state(SCORE, self._state.get_state(SCORE) + eaten)
+
+    def on_player_defeated(self, events: List[PlayerDefeated]) -> None:
+        """
+        Handle the player being defeated, however many things it ran into.
+
+        :param events: The defeats.
+        """
+        if events:
+            self._world.defeat()
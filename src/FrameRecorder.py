@@ -0,0 +1,330 @@
+"""
+This module is responsible for recording the frames shown in the game window to disk, for reviewing sessions later.
+
+Recording must not slow the game down, so the window thread only copies each recorded frame into one of a fixed ring of
+surfaces, and a worker thread encodes them. When the worker falls behind and every surface is waiting to be encoded,
+frames are dropped rather than waiting for a free surface.
+"""
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Callable, Dict, Iterator, NamedTuple, Optional, Tuple, Type, TYPE_CHECKING
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# pygame is only needed to copy and encode frames, reading a raw stream back never imports it. Metrics pulls in the HTTP
+# server, so it is only imported once recording starts rather than at startup.
+if TYPE_CHECKING:
+    import pygame
+    from Metrics import Histogram
+
+# The header of a raw stream: magic, version, width and height, followed by frames of a header and zlib compressed
+# RGB pixels each
+RAW_MAGIC = b"SNAKEFRM"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct("<8sHII")
+RAW_FRAME_HEADER = struct.Struct("<QQI")
+
+# Upper bounds in seconds, copying a frame should take a fraction of a millisecond while encoding one may take tens
+CAPTURE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+ENCODERS: Dict[str, Type["FrameEncoder"]] = {}
+
+
+def register_encoder(name: str) -> Callable[[Type["FrameEncoder"]], Type["FrameEncoder"]]:
+    """
+    Register a frame encoder under a name, so recordings can be written in it.
+
+    :param name: The name of the format.
+    :return: A decorator that registers the encoder class.
+    """
+    def decorator(encoder: Type["FrameEncoder"]) -> Type["FrameEncoder"]:
+        ENCODERS[name] = encoder
+        return encoder
+
+    return decorator
+
+
+def get_encoder_names() -> Tuple[str, ...]:
+    """
+    Get the names of every registered frame encoder.
+
+    :return: The names of the formats, in registration order.
+    """
+    return tuple(ENCODERS)
+
+
+class FrameEncoder(ABC):
+    """
+    The frame encoder is responsible for writing frames to disk in a single format. It is only ever used by the worker
+    thread of a frame recorder.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int]) -> None:
+        """
+        Create a new frame encoder.
+
+        :param path: Where to write the frames.
+        :param size: The width and height of every frame.
+        """
+        self._path = path
+        self._size = size
+
+    @abstractmethod
+    def write(self, frame: 'pygame.Surface', index: int, tick: int) -> int:
+        """
+        Write a single frame.
+
+        :param frame: The frame.
+        :param index: The number of frames shown in the window before this one.
+        :param tick: The tick the frame shows.
+        :return: The number of bytes written.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Finish writing frames.
+        """
+        pass
+
+
+@register_encoder("raw")
+class RawStreamEncoder(FrameEncoder):
+    """
+    Writes every frame into a single file, as zlib compressed RGB pixels. Read it back with read_raw_stream.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int]) -> None:
+        super().__init__(path, size)
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, *size))
+
+    def write(self, frame: 'pygame.Surface', index: int, tick: int) -> int:
+        import pygame
+
+        # Most of the window is the same few colors, so the fastest level still compresses frames many times over
+        pixels = zlib.compress(pygame.image.tobytes(frame, "RGB"), 1)
+        self._file.write(RAW_FRAME_HEADER.pack(index, tick, len(pixels)))
+        self._file.write(pixels)
+
+        return RAW_FRAME_HEADER.size + len(pixels)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@register_encoder("png")
+class PngSequenceEncoder(FrameEncoder):
+    """
+    Writes every frame into its own PNG file in a directory, named after the frame number and tick.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int]) -> None:
+        super().__init__(path, size)
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, frame: 'pygame.Surface', index: int, tick: int) -> int:
+        import pygame
+
+        path = os.path.join(self._path, f"frame_{index:08d}_tick_{tick:08d}.png")
+        pygame.image.save(frame, path)
+
+        return os.path.getsize(path)
+
+
+class RawFrame(NamedTuple):
+    """
+    A frame read back from a raw stream, with the number of frames shown in the window before it.
+    """
+    frame: int
+    tick: int
+    width: int
+    height: int
+    pixels: bytes
+
+
+def read_raw_stream(path: str) -> Iterator[RawFrame]:
+    """
+    Read back every frame of a raw stream, such as to review it or convert it to a video.
+
+    :param path: The raw stream file.
+    :return: The frames, with their RGB pixels row by row.
+    """
+    with open(path, "rb") as file:
+        magic, version, width, height = RAW_HEADER.unpack(file.read(RAW_HEADER.size))
+
+        if magic != RAW_MAGIC or version != RAW_VERSION:
+            raise ValueError(f"{path} is not a version {RAW_VERSION} raw frame stream.")
+
+        while True:
+            header = file.read(RAW_FRAME_HEADER.size)
+
+            # A recording cut short may end part way through a frame
+            if len(header) < RAW_FRAME_HEADER.size:
+                return
+
+            index, tick, length = RAW_FRAME_HEADER.unpack(header)
+            pixels = file.read(length)
+
+            if len(pixels) < length:
+                return
+
+            yield RawFrame(index, tick, width, height, zlib.decompress(pixels))
+
+
+class FrameRecorder:
+    """
+    The frame recorder is responsible for recording every frame (or every nth frame) shown in a window.
+
+    The window thread hands each frame to capture just before it is shown, which copies it into a free surface of the
+    ring and queues it for the worker thread. The worker encodes queued frames in the order they were captured and
+    hands the surfaces back. If no surface is free, the frame is dropped and counted instead.
+    """
+
+    def __init__(self, screen: 'pygame.Surface', path: str, encoder: str = "raw", every: int = 1, slots: int = 8) -> None:
+        """
+        Create a new frame recorder and start its worker thread.
+
+        :param screen: The surface of the window, which every surface of the ring matches so copying is a plain copy.
+        :param path: Where to write the frames, a file for a raw stream or a directory for a PNG sequence.
+        :param encoder: The name of the format to write.
+        :param every: Record one in this many frames.
+        :param slots: The number of surfaces in the ring, the most frames that can wait to be encoded.
+        """
+        import pygame
+        from Metrics import Histogram
+
+        if encoder not in ENCODERS:
+            raise ValueError(f"Unknown frame format {encoder!r}, expected one of {', '.join(ENCODERS)}.")
+
+        self._screen = screen
+        self._path = path
+        self._every = max(every, 1)
+        self._encoder = ENCODERS[encoder](path, screen.get_size())
+
+        self._free: "queue.SimpleQueue[pygame.Surface]" = queue.SimpleQueue()
+        self._queued: "queue.SimpleQueue[Optional[Tuple[pygame.Surface, int, int]]]" = queue.SimpleQueue()
+
+        for _ in range(max(slots, 1)):
+            self._free.put(pygame.Surface(screen.get_size(), 0, screen))
+
+        self._frames = 0
+        self._captured = 0
+        self._dropped = 0
+        self._written = 0
+        self._bytes_written = 0
+        self._capture_total = 0.0
+        self._encode_total = 0.0
+        self._error: Optional[BaseException] = None
+
+        self._capture_seconds = Histogram("snake_frame_capture_seconds", "Time the window thread spent copying a frame to record.", CAPTURE_BUCKETS)
+        self._encode_seconds = Histogram("snake_frame_encode_seconds", "Time the recorder thread spent encoding and writing a frame.", CAPTURE_BUCKETS)
+
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+
+    def capture(self, tick: int) -> None:
+        """
+        Record the frame in the window, if it is one of the frames to record. Never waits for the worker thread.
+
+        :param tick: The tick the frame shows.
+        """
+        index = self._frames
+        self._frames += 1
+
+        if index % self._every:
+            return
+
+        start = time.perf_counter()
+
+        try:
+            frame = self._free.get_nowait()
+        except queue.Empty:
+            self._dropped += 1
+            return
+
+        frame.blit(self._screen, (0, 0))
+        self._queued.put((frame, index, tick))
+        self._captured += 1
+
+        elapsed = time.perf_counter() - start
+        self._capture_total += elapsed
+        self._capture_seconds.observe(elapsed)
+
+    def _run(self) -> None:
+        """
+        Encode queued frames until the recorder is closed.
+        """
+        while True:
+            item = self._queued.get()
+
+            if item is None:
+                return
+
+            frame, index, tick = item
+
+            try:
+                if self._error is None:
+                    start = time.perf_counter()
+                    self._bytes_written += self._encoder.write(frame, index, tick)
+                    self._written += 1
+
+                    elapsed = time.perf_counter() - start
+                    self._encode_total += elapsed
+                    self._encode_seconds.observe(elapsed)
+            except Exception as error:
+                # Keep handing surfaces back so the game goes on, every later frame is dropped
+                print(f"Stopped recording frames: {error}", file=sys.stderr)
+                self._error = error
+            finally:
+                self._free.put(frame)
+
+    def get_histograms(self) -> Tuple["Histogram", "Histogram"]:
+        """
+        Get the capture and encode duration histograms.
+
+        :return: The time copying each frame on the window thread, and the time encoding it on the worker thread.
+        """
+        return self._capture_seconds, self._encode_seconds
+
+    def get_dropped(self) -> int:
+        """
+        Get the number of frames to record that were dropped as no surface was free.
+
+        :return: The number of dropped frames.
+        """
+        return self._dropped
+
+    def get_written(self) -> int:
+        """
+        Get the number of frames written to disk so far.
+
+        :return: The number of written frames.
+        """
+        return self._written
+
+    def format(self) -> str:
+        """
+        Format what was recorded and what it cost the window thread.
+
+        :return: A single line summary.
+        """
+        capture_ms = self._capture_total / self._captured * 1000 if self._captured else 0.0
+        encode_ms = self._encode_total / self._written * 1000 if self._written else 0.0
+
+        return f"Recorded {self._written} of {self._frames} frames to {self._path} ({self._bytes_written / 1e6:.1f}MB), {self._dropped} dropped, {capture_ms:.2f}ms copying and {encode_ms:.1f}ms encoding per frame"
+
+    def close(self) -> None:
+        """
+        Encode every frame still queued, then stop the worker thread and finish writing.
+        """
+        if not self._thread.is_alive():
+            return
+
+        self._queued.put(None)
+        self._thread.join()
+        self._encoder.close()
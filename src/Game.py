@@ -2,19 +2,37 @@
 This module is responsible for containing the game loop, game states, and any other game management utilies
 """
 import datetime as datetime
+from dataclasses import dataclass
 from datetime import timezone
 from math import floor
+from typing import TYPE_CHECKING, Callable, List, Optional, Type, Union
+import queue
+import sys
+import threading
+import time
 
 import pygame
 
-from GameStateManager import GameStateManager
 from PygameEventManager import PygameEventManager
 from Window import Window
-from World import World
-from Grid import Grid
 from UI import UI
-from System import RenderingSystem, KeyboardInputSystem, MovementSystem, AiFollowSystem, CollisionSystem, FoodSpawnSystem, GridObjectSystem, PlayerControllerSystem
-from Component import BoxSpriteComponent, CircleSpriteComponent, TransformComponent, PhysicsBodyComponent, PlayerControllerComponent, AiFollowComponent
+from Camera import Camera
+from SharedBoard import SharedBoard
+from Spectator import ChangeFeed, SpectatorServer
+from GameStateManager import SCORE, STATUS
+from Level import Level
+from Simulation import Simulation
+from StartupReport import StartupReport
+from DrawSnapshot import DrawSnapshot, SnapshotBuffer
+from InputLatency import LatencyTracker
+from FrameRecorder import FrameRecorder
+from System import RenderingSystem, PixelRenderingSystem, KeyboardInputSystem
+from Autopilot import AutopilotPlanner, AutopilotPolicy, TimedPolicy, create_policy, get_policy_names
+from Component import Component, BoxSpriteComponent, CircleSpriteComponent, TransformComponent, PhysicsBodyComponent, PlayerControllerComponent
+
+if TYPE_CHECKING:
+    from AllocationProfiler import AllocationProfiler
+    from Metrics import Metrics
 
 
 def current_milli_time() -> float:
@@ -26,53 +44,188 @@ def current_milli_time() -> float:
     return floor(datetime.datetime.now(timezone.utc).replace(tzinfo=timezone.utc).timestamp() * 1000)
 
 
+@dataclass
+class GameOptions:
+    """
+    The options of a game, besides the size of its window and its tick rate.
+
+    :param shared_board: The name of a shared memory segment to publish the board into every tick, if any.
+    :param autopilot: Whether the snake starts out steered by the autopilot.
+    :param autopilot_policy: The policy the autopilot steers with, defaults to the first registered policy.
+    :param startup_report: A report to record startup phases into and print once the first tick has run, if any.
+    :param spectate: The address to stream the game to spectators on, either "unix:<path>" or "<host>:<port>".
+    :param board_cols: The number of columns on the board, defaults to as many as fit in the window.
+    :param board_rows: The number of rows on the board, defaults to as many as fit in the window.
+    :param chunked_grid: Whether to lay the board out on a sparse, chunked grid, for very large boards.
+    :param metrics: The metrics to record tick and frame times into, if any.
+    :param freeze_gc: Whether to keep the game objects out of reach of the garbage collector.
+    :param allocation_profiler: A profiler to report the allocations made every tick to, if any.
+    :param level: The level to lay the walls out from, defaults to walls around the perimeter of the board.
+    :param fused_pipeline: Whether to run the systems after steering in a single pass over the game objects.
+    :param scheduler_workers: The number of threads to schedule the systems on by what they read and write, 0 to run them in a fixed order.
+    :param render_thread: Whether to run the simulation on its own thread and draw snapshots of it at the display rate, so slow frames do not hold up ticks.
+    :param fps: The number of frames to draw per second when drawing apart from the simulation.
+    :param latency_trace: The path to write a trace of the latency of every key press to when the game ends, if any.
+    :param pixel_renderer: Whether to draw the whole board with a pixel per cell, scaled to fit the window, instead of drawing every sprite.
+    :param record: Where to record the frames shown in the window, dropping frames rather than slowing the game down when writing falls behind.
+    :param record_format: The format to record frames in, a single raw stream file or a directory of PNG files.
+    :param record_every: Record one in this many frames.
+    """
+    shared_board: Optional[str] = None
+    autopilot: bool = False
+    autopilot_policy: Optional[AutopilotPolicy] = None
+    startup_report: Optional[StartupReport] = None
+    spectate: Optional[str] = None
+    board_cols: Optional[int] = None
+    board_rows: Optional[int] = None
+    chunked_grid: bool = False
+    metrics: Optional["Metrics"] = None
+    freeze_gc: bool = False
+    allocation_profiler: Optional["AllocationProfiler"] = None
+    level: Optional[Level] = None
+    fused_pipeline: bool = False
+    scheduler_workers: int = 0
+    render_thread: bool = False
+    fps: int = 60
+    latency_trace: Optional[str] = None
+    pixel_renderer: bool = False
+    record: Optional[str] = None
+    record_format: str = "raw"
+    record_every: int = 1
+
+
 class Game:
     """
     The game class is responsible for managing the game loop and updating the game state.
     """
 
-    def __init__(self, width: int, height: int, tickrate: int) -> None:
+    def __init__(self, width: int, height: int, tickrate: int, options: Optional[GameOptions] = None) -> None:
         """
-        Create a new game.
+        Create a new game and run it until the window is closed.
 
         :param width: The width of the game window.
         :param height: The height of the game window.
         :param tickrate: The number of times to update the game per second.
+        :param options: The options of the game, defaults to a plain game steered with the keyboard.
         """
+        options = options or GameOptions()
+
         self._width = width
         self._height = height
         self._tickrate = tickrate
+        self._startup_report = options.startup_report
+        self._metrics = options.metrics
+        self._fps = options.fps
+
+        # When drawing apart from the simulation, the simulation thread publishes a snapshot of every tick, and
+        # anything that changes the world from the window thread is queued to run between ticks
+        self._snapshot_buffer: Optional[SnapshotBuffer] = SnapshotBuffer() if options.render_thread else None
+        self._commands: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+        self._simulation_error: Optional[BaseException] = None
 
         pixels_to_unit = 32
 
-        pygame.init()
+        # Only the display (which also drives the event queue) is needed up front, fonts are loaded on first use
+        pygame.display.init()
         self._pg_event_manager = PygameEventManager()
 
         self._window = Window(width, height)
         self._pg_event_manager.subscribe(pygame.QUIT, lambda event: self.stop())
+        self._mark_startup("display")
 
-        self._state = GameStateManager()
         self._ui = UI()
 
-        grid_x = int((width - (width // pixels_to_unit) * pixels_to_unit) / 2)
-        grid_y = int((height - (height // pixels_to_unit) * pixels_to_unit) / 2)
-        self._grid = Grid(grid_x, grid_y, width, height, pixels_to_unit)
-
-        self._world = World(self._grid, self._state)
-        self._pg_event_manager.subscribe(pygame.KEYDOWN, lambda event: self._world.reset() if event.key == pygame.K_r else None)
-
-        self._food_spawn_system = FoodSpawnSystem(self._grid, self._world, [])
-        self._grid_object_system = GridObjectSystem(self._grid, [[TransformComponent]])
-        self._rendering_system = RenderingSystem(self._window.get_surface(), [[TransformComponent, BoxSpriteComponent], [TransformComponent, CircleSpriteComponent]])
-        self._player_controller_system = PlayerControllerSystem([[PlayerControllerComponent, PhysicsBodyComponent]])
+        self._autopilot_planner = AutopilotPlanner(options.autopilot_policy or create_policy(get_policy_names()[0]))
+        board_width = options.board_cols * pixels_to_unit if options.board_cols else width
+        board_height = options.board_rows * pixels_to_unit if options.board_rows else height
+
+        self._simulation = Simulation(board_width, board_height, pixels_to_unit, self._autopilot_planner, chunked=options.chunked_grid, freeze_gc=options.freeze_gc, level=options.level, fused_pipeline=options.fused_pipeline, scheduler_workers=options.scheduler_workers)
+        self._simulation.set_autopilot_enabled(options.autopilot)
+
+        if options.allocation_profiler:
+            self._simulation.add_tick_listener(options.allocation_profiler.on_tick)
+
+        self._grid = self._simulation.get_grid()
+        self._world = self._simulation.get_world()
+        self._state = self._simulation.get_state()
+        self._mark_startup("world")
+
+        # The HUD follows the game state through subscriptions instead of polling it every frame. When drawing apart
+        # from the simulation, it follows the snapshots instead, so the UI is only touched by the window thread
+        self._status = self._state.get_state(STATUS)
+        self._ui.set_score(self._state.get_state(SCORE))
+
+        if not self._snapshot_buffer:
+            self._state.subscribe(STATUS, self._on_status_changed)
+            self._state.subscribe(SCORE, self._ui.set_score)
+
+        self._pg_event_manager.subscribe(pygame.KEYDOWN, lambda event: self._run_between_ticks(self._world.reset) if event.key == pygame.K_r else None)
+        self._pg_event_manager.subscribe(pygame.KEYDOWN, lambda event: self._run_between_ticks(self.toggle_autopilot) if event.key == pygame.K_p else None)
+        self._pg_event_manager.subscribe(pygame.KEYDOWN, lambda event: self._run_between_ticks(self.cycle_autopilot_policy) if event.key == pygame.K_o else None)
+
+        # Boards larger than the window are rendered through a camera that follows the snake, unless the whole board
+        # is drawn a pixel per cell
+        self._camera: Optional[Camera] = None
+        # The simulation thread limits draw snapshots to the view of its own camera, which follows the same head
+        self._snapshot_camera: Optional[Camera] = None
+        if (board_width > width or board_height > height) and not options.pixel_renderer:
+            self._camera = Camera(width, height, board_width, board_height)
+            self._snapshot_camera = Camera(width, height, board_width, board_height)
+
+        sprite_components: List[List[Type[Component]]] = [[TransformComponent, BoxSpriteComponent], [TransformComponent, CircleSpriteComponent]]
+        self._rendering_system: Union[RenderingSystem, PixelRenderingSystem]
+
+        if options.pixel_renderer:
+            self._rendering_system = PixelRenderingSystem(self._window.get_surface(), sprite_components, self._grid, self._world.get_level())
+        else:
+            self._rendering_system = RenderingSystem(self._window.get_surface(), sprite_components, self._camera, self._grid)
         self._keyboard_input_system = KeyboardInputSystem(self._pg_event_manager, [[PlayerControllerComponent, PhysicsBodyComponent]])
-        self._movement_system = MovementSystem(grid_x, grid_y, pixels_to_unit, [[TransformComponent, PhysicsBodyComponent]])
-        self._collisions_system = CollisionSystem([[PhysicsBodyComponent, TransformComponent]])
 
-        self._follow_system = AiFollowSystem([[AiFollowComponent, TransformComponent]])
+        # Follow every key press to the frame that shows it, shown in the overlay toggled with [L]
+        self._latency_tracker = LatencyTracker()
+        self._latency_trace = options.latency_trace
+        self._show_overlay = False
+        self._overlay_text = ""
+        self._next_overlay_update = 0.0
+        self._keyboard_input_system.add_key_listener(self._latency_tracker.on_received)
+        self._simulation.get_player_controller_system().add_apply_listener(self._latency_tracker.on_applied)
+        self._simulation.add_tick_listener(lambda: self._latency_tracker.on_tick(self._simulation.get_tick()))
+        self._pg_event_manager.subscribe(pygame.KEYDOWN, lambda event: self.toggle_overlay() if event.key == pygame.K_l else None)
+
+        # Recorded frames are copied on the window thread and encoded on a thread of their own
+        self._frame_recorder: Optional[FrameRecorder] = None
+        if options.record is not None:
+            self._frame_recorder = FrameRecorder(self._window.get_surface(), options.record, options.record_format, options.record_every)
+
+        if options.metrics:
+            for histogram in self._latency_tracker.get_histograms():
+                options.metrics.add_histogram(histogram)
+
+            if self._frame_recorder:
+                for histogram in self._frame_recorder.get_histograms():
+                    options.metrics.add_histogram(histogram)
+
+        self._shared_board: Optional[SharedBoard] = None
+        if options.shared_board is not None:
+            self._shared_board = SharedBoard(self._grid.get_num_cols(), self._grid.get_num_rows(), options.shared_board)
+            self._simulation.add_snapshot_listener(self._shared_board.publish)
+
+        self._spectator_server: Optional[SpectatorServer] = None
+        if options.spectate is not None:
+            spectator_server = SpectatorServer(options.spectate)
+            change_feed = ChangeFeed(self._simulation)
+            self._simulation.add_tick_listener(lambda: spectator_server.publish(*change_feed.next_frame()))
+            self._spectator_server = spectator_server
+
+        self._mark_startup("systems")
 
         self.start()
-        self.loop(tickrate)
+
+        # Shared memory, worker threads and processes and the recording are released even if the game crashes
+        try:
+            self.loop(tickrate)
+        finally:
+            self.close()
 
     def start(self) -> None:
         """
@@ -86,31 +239,186 @@ class Game:
         """
         self._isRunning = False
 
+    def toggle_autopilot(self) -> None:
+        """
+        Switch between manual control and the autopilot.
+        """
+        self._simulation.set_autopilot_enabled(not self._simulation.is_autopilot_enabled())
+
+    def cycle_autopilot_policy(self) -> None:
+        """
+        Swap the autopilot over to the next registered policy, keeping the decision budget of the current policy.
+        """
+        names = get_policy_names()
+        current = self._autopilot_planner.get_policy()
+        name = names[0]
+        budget_ms: Optional[float] = None
+
+        if isinstance(current, TimedPolicy):
+            print(current.format(), file=sys.stderr)
+            budget_ms = current.get_budget_ms()
+
+            if current.get_name() in names:
+                name = names[(names.index(current.get_name()) + 1) % len(names)]
+
+        self._autopilot_planner.set_policy(create_policy(name, budget_ms))
+
+    def toggle_overlay(self) -> None:
+        """
+        Show or hide the diagnostics overlay.
+        """
+        self._show_overlay = not self._show_overlay
+
+    def _render_overlay(self, surface: pygame.Surface) -> None:
+        """
+        Render the diagnostics overlay if it is shown, refreshing its text twice a second.
+
+        :param surface: The surface to render the overlay on.
+        """
+        if not self._show_overlay:
+            return
+
+        now = time.perf_counter()
+
+        if now >= self._next_overlay_update:
+            self._next_overlay_update = now + 0.5
+            self._overlay_text = self._latency_tracker.format()
+
+        self._ui.render_overlay(surface, self._overlay_text, 8, self._height - 8)
+
+    def _run_between_ticks(self, command: Callable[[], None]) -> None:
+        """
+        Run a command that changes the simulation, right away or, when the simulation runs on its own thread, before
+        its next tick.
+
+        :param command: The command to run.
+        """
+        if self._snapshot_buffer:
+            self._commands.put(command)
+        else:
+            command()
+
+    def _on_status_changed(self, status: str) -> None:
+        """
+        Keep track of the game status whenever it changes.
+
+        :param status: The new game status.
+        """
+        self._status = status
+
+    def _mark_startup(self, phase: str) -> None:
+        """
+        Record that a startup phase has finished, if startup is being measured.
+
+        :param phase: The name of the phase.
+        """
+        if self._startup_report:
+            self._startup_report.mark(phase)
+
+    def close(self) -> None:
+        """
+        Release any resources held by the game once the game loop has ended.
+        """
+        self._autopilot_planner.close()
+
+        scheduler = self._simulation.get_scheduler()
+        if scheduler:
+            print(scheduler.format(), file=sys.stderr)
+
+        self._simulation.close()
+
+        if self._latency_trace:
+            self._latency_tracker.write_trace(self._latency_trace)
+
+        if self._frame_recorder:
+            self._frame_recorder.close()
+            print(self._frame_recorder.format(), file=sys.stderr)
+            self._frame_recorder = None
+
+        if self._shared_board:
+            self._shared_board.close()
+            self._shared_board = None
+
+        if self._spectator_server:
+            self._spectator_server.close()
+            self._spectator_server = None
+
     def onTick(self) -> None:
         """
         Update the game every tick.
         """
+        self._step()
+        frame_start = time.perf_counter()
+
         objects = self._world.get_game_objects()
+        surface = self._window.get_surface()
+
+        if self._status == "in-game":
+            if self._camera:
+                head_transform = self._world.get_player().get_component(TransformComponent)
+
+                if head_transform:
+                    self._camera.follow(head_transform.x, head_transform.y)
+
+            self._rendering_system.process(objects)
+            self._ui.render_score(surface, 8, int((self._grid.get_cell_size() - 20) / 2 + self._grid.get_y_offset()))
+        elif self._status == "game-over":
+            self._ui.render_game_over(surface, int(self._width / 2), int(self._height / 2))
 
-        self._grid.clear_all()
+        self._render_overlay(surface)
+
+        if self._frame_recorder:
+            self._frame_recorder.capture(self._simulation.get_tick())
+
+        self._window.update()
+        self._latency_tracker.on_frame(self._simulation.get_tick())
+
+        if self._metrics:
+            self._metrics.record_frame(time.perf_counter() - frame_start)
+
+    def _step(self) -> None:
+        """
+        Advance the simulation by a single tick.
+        """
+        tick_start = time.perf_counter()
+        self._simulation.step()
+
+        if self._metrics:
+            self._metrics.record_tick(time.perf_counter() - tick_start, self._simulation)
+
+        if self._startup_report and self._simulation.get_tick() == 1:
+            self._mark_startup("first tick")
+            print(self._startup_report.format(), file=sys.stderr)
+
+    def onFrame(self, snapshot: Optional[DrawSnapshot]) -> None:
+        """
+        Draw the latest snapshot of the simulation, when drawing apart from it.
 
-        self._grid_object_system.process(objects)
-        self._food_spawn_system.process(objects)
-        self._player_controller_system.process(objects)
-        self._movement_system.process(objects)
-        self._follow_system.process(objects)
-        self._collisions_system.process(objects)
+        :param snapshot: The snapshot to draw, or None if no tick has run yet.
+        """
+        if snapshot is None:
+            return
 
+        frame_start = time.perf_counter()
         surface = self._window.get_surface()
-        game_status: str = self._state.get_state("status")
+        self._ui.set_score(snapshot.get_score())
 
-        if game_status == "in-game":
-            self._rendering_system.process(objects)
-            self._ui.render_score(surface, 8, int((self._grid.get_cell_size() - 20) / 2 + self._grid.get_y_offset()), int(self._state.get_state("score") or 0))
-        elif game_status == "game-over":
+        if snapshot.get_status() == "in-game":
+            self._rendering_system.draw_snapshot(snapshot)
+            self._ui.render_score(surface, 8, int((self._grid.get_cell_size() - 20) / 2 + self._grid.get_y_offset()))
+        elif snapshot.get_status() == "game-over":
             self._ui.render_game_over(surface, int(self._width / 2), int(self._height / 2))
 
+        self._render_overlay(surface)
+
+        if self._frame_recorder:
+            self._frame_recorder.capture(snapshot.get_tick())
+
         self._window.update()
+        self._latency_tracker.on_frame(snapshot.get_tick())
+
+        if self._metrics:
+            self._metrics.record_frame(time.perf_counter() - frame_start)
 
     def onImmediateUpdate(self) -> None:
         """
@@ -127,6 +435,10 @@ class Game:
 
         :param tickrate: The number of times to update the game per second.
         """
+        if self._snapshot_buffer:
+            self._loop_threaded(tickrate, self._snapshot_buffer)
+            return
+
         ms_per_tick = 1000 / tickrate
         last_time_ms = current_milli_time()
         delta_time = 0.0
@@ -142,3 +454,64 @@ class Game:
             if (delta_time >= ms_per_tick):
                 self.onTick()
                 last_time_ms += ms_per_tick
+
+    def _loop_threaded(self, tickrate: int, snapshot_buffer: SnapshotBuffer) -> None:
+        """
+        Run the simulation on its own thread and draw the latest snapshot of it at the display rate on this thread,
+        which keeps the window and its events, until the game is stopped.
+
+        :param tickrate: The number of times to update the game per second.
+        :param snapshot_buffer: The buffer the simulation publishes its snapshots into.
+        """
+        simulation_thread = threading.Thread(target=self._simulate, args=(tickrate, snapshot_buffer), name="simulation", daemon=True)
+        simulation_thread.start()
+
+        seconds_per_frame = 1 / self._fps
+        next_frame = time.perf_counter()
+
+        while self._isRunning:
+            self._pg_event_manager.update()
+            self.onFrame(snapshot_buffer.swap())
+
+            # Frames that could not be drawn in time are dropped rather than caught up on
+            next_frame += seconds_per_frame
+            delay = next_frame - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.perf_counter()
+
+        simulation_thread.join()
+
+        if self._simulation_error:
+            raise self._simulation_error
+
+    def _simulate(self, tickrate: int, snapshot_buffer: SnapshotBuffer) -> None:
+        """
+        Advance the simulation every tick and publish a snapshot of it, until the game is stopped.
+
+        :param tickrate: The number of times to update the game per second.
+        :param snapshot_buffer: The buffer to publish the snapshots into.
+        """
+        seconds_per_tick = 1 / tickrate
+        next_tick = time.perf_counter()
+
+        try:
+            while self._isRunning:
+                while not self._commands.empty():
+                    self._commands.get()()
+
+                self._keyboard_input_system.process(self._world.get_game_objects())
+                self._step()
+                snapshot_buffer.publish(DrawSnapshot.capture(self._world, self._state, self._simulation.get_tick(), self._grid, self._snapshot_camera))
+
+                # Ticks that ran late are caught up on, so the simulation keeps to its tick rate on average
+                next_tick += seconds_per_tick
+                delay = next_tick - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+        except BaseException as error:
+            self._simulation_error = error
+            self.stop()
@@ -6,6 +6,9 @@ from Component import Component, TransformComponent, PhysicsBodyComponent, AiFol
 
 ComponentType = TypeVar("ComponentType", bound=Component)
 
+# The color walls are drawn in
+WALL_COLOR = (50, 50, 50)
+
 
 class GameObject(ABC):
     def __init__(self) -> None:
@@ -140,5 +143,5 @@ class Wall(Entity):
         :param height: The height of the wall.
         """
         super().__init__(x, y, width, height)
-        self._sprite_component = BoxSpriteComponent(self._transform_component.width, self._transform_component._height, color=(50, 50, 50), outline=False)
+        self._sprite_component = BoxSpriteComponent(self._transform_component.width, self._transform_component._height, color=WALL_COLOR, outline=False)
         self.add_component(self._sprite_component)
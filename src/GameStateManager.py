@@ -1,35 +1,146 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+class StateKey(Generic[T]):
+    def __init__(self, name: str, default: T) -> None:
+        """
+        Create a new state key.
+
+        A state key is responsible for naming a piece of game state and fixing its type and its value before it is
+        first set.
+
+        :param name: The name of the state.
+        :param default: The value of the state before it is first set.
+        """
+        self._name = name
+        self._default = default
+
+    def get_name(self) -> str:
+        """
+        Get the name of the state.
+
+        :return: The name of the state.
+        """
+        return self._name
+
+    def get_default(self) -> T:
+        """
+        Get the value of the state before it is first set.
+
+        :return: The default value.
+        """
+        return self._default
+
+    def __repr__(self) -> str:
+        return f"StateKey({self._name!r})"
+
+
+SCORE: StateKey[int] = StateKey("score", 0)
+STATUS: StateKey[str] = StateKey("status", "in-game")
+
+
 class GameStateManager():
     def __init__(self) -> None:
         """
         Create a new GameStateManager.
 
-        The GameStateManager is responsible for tracking state of the game.
+        The GameStateManager is responsible for tracking state of the game and telling subscribers when it changes.
+        Changes made inside a batch are only announced once the outermost batch commits, once per changed key, and
+        not at all if the key ended up back at the value it had when the batch began.
         """
-        self._state = {}
+        self._state: Dict[StateKey[Any], Any] = {}
+        self._handlers: Dict[StateKey[Any], List[Callable[[Any], None]]] = {}
+        self._commit_handlers: List[Callable[[Dict[StateKey[Any], Any]], None]] = []
 
-    def set_state(self, state_name: str, value) -> None:
+        self._batch_depth = 0
+        self._batch_origin: Dict[StateKey[Any], Any] = {}
+
+    def set_state(self, key: StateKey[T], value: T) -> None:
         """
         Set a state value.
 
-        :param state_name: The name of the state to set.
+        :param key: The key of the state to set.
         :param value: The value to set the state to.
         """
-        self._state[state_name] = value
+        previous = self.get_state(key)
+        self._state[key] = value
+
+        if self._batch_depth:
+            self._batch_origin.setdefault(key, previous)
+        elif value != previous:
+            self._commit({key: value})
 
-    def has_state(self, state_name: str) -> bool:
+    def has_state(self, key: StateKey[Any]) -> bool:
         """
-        Check if a state exists.
+        Check if a state has been set.
 
-        :param state_name: The name of the state to check.
-        :return: True if the state exists, otherwise False.
+        :param key: The key of the state to check.
+        :return: True if the state has been set, otherwise False.
         """
-        return state_name in self._state
+        return key in self._state
 
-    def get_state(self, state_name: str):
+    def get_state(self, key: StateKey[T]) -> T:
         """
         Get a state value.
 
-        :param state_name: The name of the state to get.
-        :return: The value of the state.
+        :param key: The key of the state to get.
+        :return: The value of the state, or the default of the key if it has not been set.
         """
-        return self._state.get(state_name)
+        value: T = self._state.get(key, key.get_default())
+        return value
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Group every change made inside the block into a single commit.
+
+        Batches may be nested, changes are announced when the outermost batch ends.
+        """
+        self._batch_depth += 1
+
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+
+            if not self._batch_depth:
+                origin = self._batch_origin
+                self._batch_origin = {}
+
+                changes = {key: self._state[key] for key, previous in origin.items() if self._state[key] != previous}
+
+                if changes:
+                    self._commit(changes)
+
+    def subscribe(self, key: StateKey[T], handler: Callable[[T], None]) -> None:
+        """
+        Subscribe a handler to changes of a single state.
+
+        :param key: The key of the state to watch.
+        :param handler: The handler to call with the new value whenever the state changes.
+        """
+        self._handlers.setdefault(key, []).append(handler)
+
+    def subscribe_commit(self, handler: Callable[[Dict[StateKey[Any], Any]], None]) -> None:
+        """
+        Subscribe a handler to every commit.
+
+        :param handler: The handler to call with the new value of every state that changed in the commit.
+        """
+        self._commit_handlers.append(handler)
+
+    def _commit(self, changes: Dict[StateKey[Any], Any]) -> None:
+        """
+        Announce committed changes to subscribers.
+
+        :param changes: The new value of every state that changed.
+        """
+        for key, value in changes.items():
+            for handler in self._handlers.get(key, ()):
+                handler(value)
+
+        for commit_handler in self._commit_handlers:
+            commit_handler(changes)
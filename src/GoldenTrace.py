@@ -0,0 +1,458 @@
+"""
+This module is responsible for proving that an alternative engine, such as a faster grid, collision system or tick
+pipeline, plays exactly the same game as the reference systems. Engines are run side by side from the same seed and
+inputs, the world state is hashed after every tick and the first tick where the hashes differ is reported.
+
+The hashes of every tick can also be recorded into a replay, so a later build, or another machine, can play the
+replay back and find the first tick where it desyncs.
+
+Usage:
+    python GoldenTrace.py compare [--engine ENGINE ...] [--seed N] [--ticks N]
+    python GoldenTrace.py record <replay.json> [--engine ENGINE] [--seed N] [--ticks N]
+    python GoldenTrace.py verify <replay.json> [--engine ENGINE ...]
+"""
+from difflib import ndiff
+from hashlib import blake2b
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import random
+import sys
+
+import Keys
+from Autopilot import InlinePlanner, Planner, create_policy
+from Component import PhysicsBodyComponent, PlayerControllerComponent, TransformComponent
+from GameStateManager import SCORE, STATUS
+from Level import Level
+from Simulation import Simulation
+
+# Creates a simulation for a board size in pixels, steered by a planner if given, placing food with a random number
+# generator and laying walls out from a level if given
+EngineFactory = Callable[[int, int, Optional[Planner], random.Random, Optional[Level]], Simulation]
+
+ENGINES: Dict[str, EngineFactory] = {}
+
+REFERENCE = "reference"
+CELL_SIZE = 32
+
+
+def register_engine(name: str) -> Callable[[EngineFactory], EngineFactory]:
+    """
+    Register an engine under a name, so it can be compared against the reference.
+
+    :param name: The name to register the engine under.
+    :return: A decorator that registers an engine factory.
+    """
+    def register(factory: EngineFactory) -> EngineFactory:
+        ENGINES[name] = factory
+        return factory
+
+    return register
+
+
+@register_engine(REFERENCE)
+def _reference_engine(width: int, height: int, planner: Optional[Planner], rng: random.Random, level: Optional[Level]) -> Simulation:
+    return Simulation(width, height, CELL_SIZE, planner, level=level, rng=rng)
+
+
+@register_engine("chunked")
+def _chunked_engine(width: int, height: int, planner: Optional[Planner], rng: random.Random, level: Optional[Level]) -> Simulation:
+    return Simulation(width, height, CELL_SIZE, planner, chunked=True, level=level, rng=rng)
+
+
+@register_engine("fused")
+def _fused_engine(width: int, height: int, planner: Optional[Planner], rng: random.Random, level: Optional[Level]) -> Simulation:
+    return Simulation(width, height, CELL_SIZE, planner, level=level, fused_pipeline=True, rng=rng)
+
+
+@register_engine("scheduled")
+def _scheduled_engine(width: int, height: int, planner: Optional[Planner], rng: random.Random, level: Optional[Level]) -> Simulation:
+    return Simulation(width, height, CELL_SIZE, planner, level=level, scheduler_workers=4, rng=rng)
+
+
+def describe_state(simulation: Simulation) -> List[str]:
+    """
+    Describe everything about the world that an engine must agree on: the tick, score and status, the type, position
+    and direction of every game object in the order of the world, and what the grid holds in every occupied cell.
+
+    :param simulation: The simulation to describe.
+    :return: A line per fact.
+    """
+    state = simulation.get_state()
+    lines = [f"tick {simulation.get_tick()} score {state.get_state(SCORE)} status {state.get_state(STATUS)}"]
+
+    for game_object in simulation.get_world().get_game_objects():
+        transform = game_object.get_component(TransformComponent)
+        body = game_object.get_component(PhysicsBodyComponent)
+        position = f"{transform.x},{transform.y}" if transform else "-"
+        direction = f"{body.x_dir},{body.y_dir}" if body else "-"
+        lines.append(f"{type(game_object).__name__} at {position} heading {direction}")
+
+    grid = simulation.get_grid()
+
+    for x, y in sorted(grid.get_occupied_cells()):
+        cell = grid.get_cell(x, y) or []
+        lines.append(f"cell {x},{y}: {' '.join(type(value).__name__ for value in cell)}")
+
+    return lines
+
+
+def hash_state(simulation: Simulation) -> str:
+    """
+    Hash the state of the world, as described by describe_state.
+
+    :param simulation: The simulation to hash.
+    :return: The hash, as 16 hexadecimal digits.
+    """
+    digest = blake2b(digest_size=8)
+
+    for line in describe_state(simulation):
+        digest.update(line.encode())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+def random_inputs(seed: int, ticks: int, interval: int = 4) -> Dict[int, int]:
+    """
+    Generate a key press every few ticks, for driving engines without the autopilot.
+
+    :param seed: The seed to generate the key presses from.
+    :param ticks: The number of ticks to generate key presses for.
+    :param interval: The average number of ticks between key presses.
+    :return: The key pressed on each tick that has one.
+    """
+    rng = random.Random(seed)
+    keys = (Keys.K_w, Keys.K_a, Keys.K_s, Keys.K_d)
+
+    return {tick: rng.choice(keys) for tick in range(ticks) if rng.randrange(interval) == 0}
+
+
+class Run:
+    """
+    The run is responsible for playing a game on a single engine from a seed, either with an autopilot policy or with
+    a script of key presses, and restarting the game whenever it is lost so long runs keep exercising the engine.
+    """
+
+    def __init__(self, engine: str, seed: int, cols: int, rows: int, policy: Optional[str] = None, inputs: Optional[Dict[int, int]] = None, level: Optional[Level] = None) -> None:
+        """
+        Create a new run.
+
+        :param engine: The name of the engine to run.
+        :param seed: The seed of the random number generator food is placed with.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param policy: The autopilot policy to steer with, if any. Decisions are never discarded for taking too long,
+            so the moves do not depend on the speed of the engine.
+        :param inputs: The key pressed on each tick that has one, used when there is no policy.
+        :param level: The level to lay the walls out from, if any.
+        """
+        planner = InlinePlanner(create_policy(policy, 0)) if policy else None
+
+        self._simulation = ENGINES[engine](cols * CELL_SIZE, rows * CELL_SIZE, planner, random.Random(seed), level)
+        self._simulation.set_autopilot_enabled(planner is not None)
+        self._inputs = inputs or {}
+
+    def step(self) -> str:
+        """
+        Play a single tick.
+
+        :return: The hash of the world after the tick.
+        """
+        simulation = self._simulation
+        world = simulation.get_world()
+
+        if simulation.get_state().get_state(STATUS) == "game-over":
+            world.reset()
+
+        key = self._inputs.get(simulation.get_tick())
+
+        if key is not None:
+            controller = world.get_player().get_component(PlayerControllerComponent)
+
+            if controller:
+                controller.key = key
+
+        simulation.step()
+
+        return hash_state(simulation)
+
+    def get_simulation(self) -> Simulation:
+        """
+        Get the simulation the run plays on.
+
+        :return: The simulation.
+        """
+        return self._simulation
+
+    def close(self) -> None:
+        """
+        Release any threads held by the simulation.
+        """
+        self._simulation.close()
+
+
+class Divergence:
+    """
+    The divergence is responsible for describing the first tick where an engine stopped matching what was expected
+    of it.
+    """
+
+    def __init__(self, engine: str, tick: int, expected: str, actual: str, differences: Sequence[str]) -> None:
+        """
+        Create a new divergence.
+
+        :param engine: The name of the engine that diverged.
+        :param tick: The first tick whose state differs.
+        :param expected: The expected hash of the tick.
+        :param actual: The hash the engine produced.
+        :param differences: The lines of the state description that differ, if both states are known.
+        """
+        self._engine = engine
+        self._tick = tick
+        self._expected = expected
+        self._actual = actual
+        self._differences = list(differences)
+
+    def get_tick(self) -> int:
+        """
+        Get the first tick whose state differs.
+
+        :return: The tick.
+        """
+        return self._tick
+
+    def get_differences(self) -> List[str]:
+        """
+        Get the lines of the state description that differ.
+
+        :return: The differing lines, prefixed with "-" for expected and "+" for actual.
+        """
+        return self._differences
+
+    def format(self, limit: int = 20) -> str:
+        """
+        Format the divergence.
+
+        :param limit: The number of differing lines to show.
+        :return: A summary of the divergence.
+        """
+        lines = [f"{self._engine} diverged at tick {self._tick}: expected {self._expected}, got {self._actual}"]
+        lines.extend(f"  {line}" for line in self._differences[:limit])
+
+        if len(self._differences) > limit:
+            lines.append(f"  ... {len(self._differences) - limit} more")
+
+        return "\n".join(lines)
+
+
+def diff_states(expected: Sequence[str], actual: Sequence[str]) -> List[str]:
+    """
+    Find the lines of two state descriptions that differ.
+
+    :param expected: The expected description.
+    :param actual: The actual description.
+    :return: The differing lines, prefixed with "-" for expected and "+" for actual, in order.
+    """
+    return [line for line in ndiff(list(expected), list(actual)) if line.startswith(("- ", "+ "))]
+
+
+def compare(engine: str, seed: int, ticks: int, cols: int = 28, rows: int = 18, policy: Optional[str] = "bfs", inputs: Optional[Dict[int, int]] = None, level: Optional[Level] = None) -> Optional[Divergence]:
+    """
+    Run an engine and the reference side by side and find the first tick where their worlds differ.
+
+    :param engine: The name of the engine to compare.
+    :param seed: The seed of the random number generator food is placed with.
+    :param ticks: The number of ticks to run for.
+    :param cols: The number of columns on the board.
+    :param rows: The number of rows on the board.
+    :param policy: The autopilot policy to steer with, or None to steer with the inputs.
+    :param inputs: The key pressed on each tick that has one, defaults to random key presses from the seed.
+    :param level: The level to lay the walls out from, if any.
+    :return: The first divergence, or None if the engines agreed on every tick.
+    """
+    if policy is None and inputs is None:
+        inputs = random_inputs(seed, ticks)
+
+    reference = Run(REFERENCE, seed, cols, rows, policy, inputs, level)
+    candidate = Run(engine, seed, cols, rows, policy, inputs, level)
+
+    try:
+        for _ in range(ticks):
+            expected, actual = reference.step(), candidate.step()
+
+            if expected != actual:
+                tick = reference.get_simulation().get_tick()
+                differences = diff_states(describe_state(reference.get_simulation()), describe_state(candidate.get_simulation()))
+                return Divergence(engine, tick, expected, actual, differences)
+    finally:
+        reference.close()
+        candidate.close()
+
+    return None
+
+
+class Replay:
+    """
+    The replay is responsible for holding everything needed to play a game again, and the hash of the world after
+    every tick of it, so playing it again on any engine shows the first tick where that engine desyncs.
+    """
+
+    def __init__(self, seed: int, cols: int, rows: int, policy: Optional[str], inputs: Dict[int, int], hashes: List[str]) -> None:
+        """
+        Create a new replay.
+
+        :param seed: The seed of the random number generator food is placed with.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param policy: The autopilot policy that steered, or None if the inputs did.
+        :param inputs: The key pressed on each tick that has one.
+        :param hashes: The hash of the world after every tick.
+        """
+        self._seed = seed
+        self._cols = cols
+        self._rows = rows
+        self._policy = policy
+        self._inputs = inputs
+        self._hashes = hashes
+
+    @classmethod
+    def record(cls, engine: str, seed: int, ticks: int, cols: int = 28, rows: int = 18, policy: Optional[str] = "bfs", inputs: Optional[Dict[int, int]] = None) -> "Replay":
+        """
+        Record a replay by playing a game.
+
+        :param engine: The name of the engine to play on.
+        :param seed: The seed of the random number generator food is placed with.
+        :param ticks: The number of ticks to play for.
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param policy: The autopilot policy to steer with, or None to steer with the inputs.
+        :param inputs: The key pressed on each tick that has one, defaults to random key presses from the seed.
+        :return: The replay.
+        """
+        if policy is None and inputs is None:
+            inputs = random_inputs(seed, ticks)
+
+        run = Run(engine, seed, cols, rows, policy, inputs)
+
+        try:
+            hashes = [run.step() for _ in range(ticks)]
+        finally:
+            run.close()
+
+        return cls(seed, cols, rows, policy, inputs or {}, hashes)
+
+    def verify(self, engine: str) -> Optional[Divergence]:
+        """
+        Play the replay on an engine and find the first tick where it desyncs.
+
+        :param engine: The name of the engine to play on.
+        :return: The first divergence, or None if every tick matched.
+        """
+        run = Run(engine, self._seed, self._cols, self._rows, self._policy, self._inputs)
+
+        try:
+            for expected in self._hashes:
+                actual = run.step()
+
+                if actual != expected:
+                    return Divergence(engine, run.get_simulation().get_tick(), expected, actual, [])
+        finally:
+            run.close()
+
+        return None
+
+    def get_hashes(self) -> List[str]:
+        """
+        Get the hash of the world after every tick.
+
+        :return: The hashes, in tick order.
+        """
+        return self._hashes
+
+    def save(self, path: str) -> None:
+        """
+        Write the replay to a file.
+
+        :param path: The path of the file to write.
+        """
+        with open(path, "w") as file:
+            json.dump({
+                "version": 1,
+                "seed": self._seed,
+                "cols": self._cols,
+                "rows": self._rows,
+                "policy": self._policy,
+                "inputs": {str(tick): key for tick, key in self._inputs.items()},
+                "hashes": self._hashes,
+            }, file)
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        """
+        Read a replay from a file.
+
+        :param path: The path of the file to read.
+        :return: The replay.
+        """
+        with open(path) as file:
+            data = json.load(file)
+
+        if data.get("version") != 1:
+            raise ValueError(f"{path} is not a version 1 replay.")
+
+        inputs = {int(tick): int(key) for tick, key in data["inputs"].items()}
+        return cls(int(data["seed"]), int(data["cols"]), int(data["rows"]), data["policy"], inputs, list(data["hashes"]))
+
+
+def _parse() -> argparse.Namespace:
+    """
+    Parse the command line.
+
+    :return: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Check that engines play exactly the same game as the reference systems.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_game_arguments(command: argparse.ArgumentParser) -> None:
+        command.add_argument("--seed", type=int, default=0, help="The seed food is placed with, and key presses are generated from.")
+        command.add_argument("--ticks", type=int, default=5000, help="The number of ticks to play.")
+        command.add_argument("--cols", type=int, default=28, help="The number of columns on the board.")
+        command.add_argument("--rows", type=int, default=18, help="The number of rows on the board.")
+        command.add_argument("--policy", type=str, default="bfs", help="The autopilot policy to steer with, or \"keys\" for random key presses.")
+
+    compare_command = commands.add_parser("compare", help="Run engines side by side with the reference.")
+    compare_command.add_argument("--engine", type=str, nargs="+", default=[name for name in ENGINES if name != REFERENCE], choices=list(ENGINES))
+    add_game_arguments(compare_command)
+
+    record_command = commands.add_parser("record", help="Record a replay with the hash of every tick.")
+    record_command.add_argument("replay", type=str)
+    record_command.add_argument("--engine", type=str, default=REFERENCE, choices=list(ENGINES))
+    add_game_arguments(record_command)
+
+    verify_command = commands.add_parser("verify", help="Play a replay back and report the first desync.")
+    verify_command.add_argument("replay", type=str)
+    verify_command.add_argument("--engine", type=str, nargs="+", default=list(ENGINES), choices=list(ENGINES))
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse()
+    divergences: List[Tuple[str, Optional[Divergence]]] = []
+
+    if args.command == "record":
+        replay = Replay.record(args.engine, args.seed, args.ticks, args.cols, args.rows, None if args.policy == "keys" else args.policy)
+        replay.save(args.replay)
+        print(f"Recorded {len(replay.get_hashes())} ticks on {args.engine} into {args.replay}")
+    elif args.command == "compare":
+        policy = None if args.policy == "keys" else args.policy
+        divergences = [(engine, compare(engine, args.seed, args.ticks, args.cols, args.rows, policy)) for engine in args.engine]
+    else:
+        replay = Replay.load(args.replay)
+        divergences = [(engine, replay.verify(engine)) for engine in args.engine]
+
+    for engine, divergence in divergences:
+        print(divergence.format() if divergence else f"{engine} matched on every tick")
+
+    sys.exit(1 if any(divergence for engine, divergence in divergences) else 0)
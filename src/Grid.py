@@ -1,4 +1,4 @@
-from typing import List, Any, Tuple, Optional
+from typing import List, Any, Sequence, Tuple, Optional
 
 from GameObject import GameObject
 
@@ -19,14 +19,31 @@ class Grid:
         self._width = width
         self._height = height
         self._size = size
+
+        # Emptied cell lists, reused so refilling the grid every tick does not allocate new ones
+        self._cell_pool: List[List[GameObject]] = []
+
+        self._create_cells()
+
+    def _create_cells(self) -> None:
+        """
+        Allocate the storage of every cell, which for this grid is a column of cells for every column of the board.
+        """
         self._grid: List[List[Optional[List[GameObject]]]] = [
             [
                 None
-                for y in range(height // size)
+                for y in range(self.get_num_rows())
             ]
-            for x in range(width // size)
+            for x in range(self.get_num_cols())
         ]
 
+        # Cells that have been given a value since the last clear_all, so clearing is proportional to what is on the
+        # board rather than to the size of the board. The columns and rows are kept apart so recording a cell does not
+        # allocate a tuple, and the lists are overwritten rather than emptied so they keep their storage between ticks
+        self._occupied_x: List[int] = []
+        self._occupied_y: List[int] = []
+        self._num_occupied = 0
+
     def add_cell(self, x: int, y: int, value: Any) -> None:
         """
         Add a value to a cell in the grid.
@@ -38,9 +55,38 @@ class Grid:
         if x < 0 or x >= self.get_num_cols() or y < 0 or y >= self.get_num_rows():
             raise IndexError("Cell position out of range.")
 
-        if self._grid[x][y] is None:
-            self._grid[x][y] = []
-        self._grid[x][y].append(value)
+        cell = self._grid[x][y]
+
+        if cell is None:
+            cell = self._grid[x][y] = self._new_cell()
+            index = self._num_occupied
+
+            if index < len(self._occupied_x):
+                self._occupied_x[index] = x
+                self._occupied_y[index] = y
+            else:
+                self._occupied_x.append(x)
+                self._occupied_y.append(y)
+
+            self._num_occupied = index + 1
+        cell.append(value)
+
+    def _new_cell(self) -> List[GameObject]:
+        """
+        Take an empty cell list from the pool, or create one if the pool is empty.
+
+        :return: An empty cell list.
+        """
+        return self._cell_pool.pop() if self._cell_pool else []
+
+    def _release_cell(self, cell: List[GameObject]) -> None:
+        """
+        Empty a cell list and return it to the pool.
+
+        :param cell: The cell list to release.
+        """
+        cell.clear()
+        self._cell_pool.append(cell)
 
     def clear_cell(self, x: int, y: int) -> None:
         """
@@ -49,16 +95,52 @@ class Grid:
         :param x: The x position of the cell.
         :param y: The y position of the cell.
         """
-        if self._grid[x][y]:
+        cell = self._grid[x][y]
+
+        if cell:
+            self._release_cell(cell)
             self._grid[x][y] = None
 
     def clear_all(self) -> None:
         """
         Clear all cells in the grid.
         """
-        for x in range(self.get_num_cols()):
-            for y in range(self.get_num_rows()):
-                self.clear_cell(x, y)
+        grid = self._grid
+        occupied_x = self._occupied_x
+        occupied_y = self._occupied_y
+
+        for index in range(self._num_occupied):
+            column = grid[occupied_x[index]]
+            y = occupied_y[index]
+            cell = column[y]
+
+            if cell is not None:
+                self._release_cell(cell)
+                column[y] = None
+
+        self._num_occupied = 0
+
+    def get_occupied_cells(self) -> List[Tuple[int, int]]:
+        """
+        Get every cell in the grid that currently holds a value.
+
+        :return: The x, y positions of the occupied cells.
+        """
+        num_occupied = self._num_occupied
+        return [(x, y) for x, y in zip(self._occupied_x[:num_occupied], self._occupied_y[:num_occupied]) if self._grid[x][y]]
+
+    def get_empty_cells(self) -> List[Tuple[int, int]]:
+        """
+        Get every cell in the grid that does not hold a value, column by column.
+
+        :return: The x, y positions of the empty cells.
+        """
+        return [
+            (x, y)
+            for x in range(self.get_num_cols())
+            for y in range(self.get_num_rows())
+            if self._grid[x][y] is None
+        ]
 
     def get_cell(self, x: int, y: int) -> Any:
         """
@@ -116,9 +198,9 @@ class Grid:
         """
         return self._y
 
-    def get_grid(self) -> List[List[Any]]:
+    def get_grid(self) -> Sequence[Sequence[Any]]:
         """
-        Get the grid.
+        Get the grid, indexed by column and then by row.
 
         :return: The grid.
         """
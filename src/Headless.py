@@ -0,0 +1,102 @@
+"""
+This module is responsible for running games without a window or keyboard, as fast as the simulation allows.
+
+Nothing imported from here imports pygame, so headless workers start without paying for it.
+"""
+from typing import TYPE_CHECKING, Optional, Tuple
+import sys
+import time
+
+from Autopilot import AutopilotPolicy, InlinePlanner
+from GameStateManager import SCORE, STATUS
+from Level import Level
+from Simulation import Simulation
+from StartupReport import StartupReport
+
+if TYPE_CHECKING:
+    from AllocationProfiler import AllocationProfiler
+    from Dataset import DatasetRecorder, DatasetWriter
+    from Metrics import Metrics
+
+
+class HeadlessGame:
+    """
+    The headless game is responsible for playing a single game with the autopilot until it ends.
+    """
+
+    def __init__(self, width: int, height: int, policy: AutopilotPolicy, startup_report: Optional[StartupReport] = None, chunked_grid: bool = False, metrics: Optional["Metrics"] = None, freeze_gc: bool = False, allocation_profiler: Optional["AllocationProfiler"] = None, level: Optional[Level] = None, fused_pipeline: bool = False, scheduler_workers: int = 0, dataset: Optional["DatasetWriter"] = None) -> None:
+        """
+        Create a new headless game.
+
+        :param width: The width of the board in pixels.
+        :param height: The height of the board in pixels.
+        :param policy: The policy the autopilot steers with.
+        :param startup_report: A report to record startup phases into and print once the first tick has run, if any.
+        :param chunked_grid: Whether to lay the board out on a sparse, chunked grid, for very large boards.
+        :param metrics: The metrics to record tick times into, if any.
+        :param freeze_gc: Whether to keep the game objects out of reach of the garbage collector.
+        :param allocation_profiler: A profiler to report the allocations made every tick to, if any.
+        :param level: The level to lay the walls out from, defaults to walls around the perimeter of the board.
+        :param fused_pipeline: Whether to run the systems after steering in a single pass over the game objects.
+        :param scheduler_workers: The number of threads to schedule the systems on by what they read and write, 0 to run them in a fixed order.
+        :param dataset: A dataset to export every tick of the game into as a step, if any.
+        """
+        self._startup_report = startup_report
+        self._metrics = metrics
+
+        # Planning inline keeps a headless game deterministic for a given seed
+        self._planner = InlinePlanner(policy)
+        self._simulation = Simulation(width, height, 32, self._planner, chunked=chunked_grid, freeze_gc=freeze_gc, level=level, fused_pipeline=fused_pipeline, scheduler_workers=scheduler_workers)
+        self._simulation.set_autopilot_enabled(True)
+
+        if allocation_profiler:
+            self._simulation.add_tick_listener(allocation_profiler.on_tick)
+
+        self._dataset_recorder: Optional["DatasetRecorder"] = None
+        if dataset:
+            from Dataset import DatasetRecorder
+
+            self._dataset_recorder = DatasetRecorder(self._simulation, dataset)
+
+        if self._startup_report:
+            self._startup_report.mark("simulation")
+
+    def get_simulation(self) -> Simulation:
+        """
+        Get the simulation the game is played on.
+
+        :return: The simulation.
+        """
+        return self._simulation
+
+    def run(self, max_ticks: int) -> Tuple[int, int]:
+        """
+        Play the game until the snake is defeated or the tick limit is reached.
+
+        :param max_ticks: The maximum number of ticks to play for.
+        :return: The final score and the number of ticks played.
+        """
+        state = self._simulation.get_state()
+
+        while self._simulation.get_tick() < max_ticks and state.get_state(STATUS) == "in-game":
+            tick_start = time.perf_counter()
+            self._simulation.step()
+
+            if self._metrics:
+                self._metrics.record_tick(time.perf_counter() - tick_start, self._simulation)
+
+            if self._startup_report and self._simulation.get_tick() == 1:
+                self._startup_report.mark("first tick")
+                print(self._startup_report.format(), file=sys.stderr)
+
+        if self._dataset_recorder:
+            self._dataset_recorder.finish()
+
+        return state.get_state(SCORE), self._simulation.get_tick()
+
+    def close(self) -> None:
+        """
+        Release any threads and processes held by the simulation and the policy.
+        """
+        self._simulation.close()
+        self._planner.close()
@@ -0,0 +1,194 @@
+"""
+This module is responsible for measuring how long it takes a key press to show up on the screen, split into the time
+until the simulation applies it and the time until a frame showing it is flipped to the display.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import json
+import threading
+import time
+
+from Metrics import Histogram
+
+# Upper bounds in seconds, a 7 tick/s game can take well over 100ms to apply a press
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.016, 0.033, 0.05, 0.1, 0.15, 0.25, 0.5, 1.0)
+
+
+class KeyPress:
+    """
+    The key press is responsible for holding the moments a single key press went through on its way to the screen.
+    """
+
+    __slots__ = ("key", "received", "applied", "tick", "displayed")
+
+    def __init__(self, key: int, received: float) -> None:
+        """
+        Create a new key press.
+
+        :param key: The key code.
+        :param received: When the keyboard input system received the press, in perf_counter seconds.
+        """
+        self.key = key
+        self.received = received
+        self.applied: Optional[float] = None
+        self.tick: Optional[int] = None
+        self.displayed: Optional[float] = None
+
+
+class LatencyTracker:
+    """
+    The latency tracker is responsible for following every key press from the keyboard input system, through the tick
+    where the player controller system applies it, to the first frame that shows that tick.
+
+    Presses are received and displayed on the window thread while they are applied on the simulation thread, which may
+    be a different thread, so every method takes a lock.
+    """
+
+    # Presses that are never applied, such as while the autopilot steers, are dropped beyond this many
+    MAX_PENDING = 32
+
+    def __init__(self, max_trace: int = 100_000) -> None:
+        """
+        Create a new latency tracker.
+
+        :param max_trace: The number of displayed presses to keep for the trace.
+        """
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+        self._pending: List[KeyPress] = []
+        self._applied: List[KeyPress] = []
+        self._awaiting_frame: List[KeyPress] = []
+        self._trace: Deque[KeyPress] = deque(maxlen=max_trace)
+        self._recent: Deque[float] = deque(maxlen=256)
+        self._superseded = 0
+        self._dropped = 0
+
+        self._to_apply = Histogram("snake_input_to_apply_seconds", "Time from a key press reaching the keyboard input system to the player controller applying it.", LATENCY_BUCKETS)
+        self._to_display = Histogram("snake_apply_to_display_seconds", "Time from the player controller applying a key press to the frame showing it being flipped.", LATENCY_BUCKETS)
+        self._total = Histogram("snake_input_to_display_seconds", "Time from a key press reaching the keyboard input system to the frame showing it being flipped.", LATENCY_BUCKETS)
+
+    def on_received(self, key: int) -> None:
+        """
+        Record that the keyboard input system received a key press.
+
+        :param key: The key code.
+        """
+        with self._lock:
+            if len(self._pending) >= self.MAX_PENDING:
+                del self._pending[0]
+                self._dropped += 1
+
+            self._pending.append(KeyPress(key, time.perf_counter()))
+
+    def on_applied(self, key: int) -> None:
+        """
+        Record that the player controller system applied a key to the player.
+
+        The oldest pending press of the key is applied, and pending presses received before it are superseded, as
+        their key was replaced before it could be applied.
+
+        :param key: The key code that was applied.
+        """
+        with self._lock:
+            pending = self._pending
+
+            for index, press in enumerate(pending):
+                if press.key == key:
+                    press.applied = time.perf_counter()
+                    self._applied.append(press)
+                    self._superseded += index
+                    del pending[:index + 1]
+                    return
+
+    def on_tick(self, tick: int) -> None:
+        """
+        Record that a tick has finished, so the presses applied during it show up in the first frame of the tick.
+
+        :param tick: The number of ticks run so far, including the one that just finished.
+        """
+        with self._lock:
+            for press in self._applied:
+                press.tick = tick
+                self._awaiting_frame.append(press)
+
+            self._applied.clear()
+
+    def on_frame(self, tick: int) -> None:
+        """
+        Record that a frame was flipped to the display.
+
+        :param tick: The tick the frame shows.
+        """
+        with self._lock:
+            if not self._awaiting_frame:
+                return
+
+            now = time.perf_counter()
+            remaining = []
+
+            for press in self._awaiting_frame:
+                if press.tick is None or press.applied is None or press.tick > tick:
+                    remaining.append(press)
+                    continue
+
+                press.displayed = now
+                self._to_apply.observe(press.applied - press.received)
+                self._to_display.observe(now - press.applied)
+                self._total.observe(now - press.received)
+                self._recent.append(now - press.received)
+                self._trace.append(press)
+
+            self._awaiting_frame = remaining
+
+    def get_histograms(self) -> List[Histogram]:
+        """
+        Get the latency histograms.
+
+        :return: The input to apply, apply to display and input to display histograms.
+        """
+        return [self._to_apply, self._to_display, self._total]
+
+    def format(self) -> str:
+        """
+        Format the latency of recent key presses, for the overlay.
+
+        :return: A single line summary.
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            superseded, dropped = self._superseded, self._dropped
+
+        if not recent:
+            return "Input latency: no key presses yet"
+
+        def percentile(fraction: float) -> float:
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000
+
+        return f"Input latency over {len(recent)} presses: p50 {percentile(0.5):.0f}ms p95 {percentile(0.95):.0f}ms max {recent[-1] * 1000:.0f}ms, {superseded} superseded, {dropped} dropped"
+
+    def write_trace(self, path: str) -> None:
+        """
+        Write every displayed key press as a trace in the Chrome trace event format, which Perfetto and
+        chrome://tracing can open.
+
+        :param path: The path of the file to write.
+        """
+        events: List[Dict[str, Any]] = []
+
+        def microseconds(moment: float) -> float:
+            return round((moment - self._origin) * 1_000_000, 1)
+
+        with self._lock:
+            presses = list(self._trace)
+
+        for press in presses:
+            if press.applied is None or press.displayed is None:
+                continue
+
+            args = {"key": press.key, "tick": press.tick}
+            events.append({"name": "input to apply", "cat": "input", "ph": "X", "pid": 1, "tid": 1, "ts": microseconds(press.received), "dur": round((press.applied - press.received) * 1_000_000, 1), "args": args})
+            events.append({"name": "apply to display", "cat": "input", "ph": "X", "pid": 1, "tid": 1, "ts": microseconds(press.applied), "dur": round((press.displayed - press.applied) * 1_000_000, 1), "args": args})
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
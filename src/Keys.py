@@ -0,0 +1,13 @@
+"""
+This module is responsible for containing the key codes the game responds to.
+
+The values mirror pygame's key constants, so modules that only simulate the game can read key codes without
+importing pygame.
+"""
+
+K_w = ord("w")
+K_a = ord("a")
+K_s = ord("s")
+K_d = ord("d")
+K_p = ord("p")
+K_r = ord("r")
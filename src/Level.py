@@ -0,0 +1,744 @@
+"""
+This module is responsible for containing levels, which lay out the walls and obstacles of a board, and the navigation
+tables precomputed for them.
+
+A level file is a small header followed by one byte per cell, row-major, 1 for a wall and 0 for an open cell:
+
+    magic b"SNKL", uint8 version, uint8 padding, uint16 cols, uint16 rows, uint16 spawn_x, uint16 spawn_y
+
+Level files are memory mapped rather than read, and the navigation tables of a level are cached in a file next to it,
+or in ~/.cache/snake for levels that were not loaded from a file, so loading a level costs the same no matter how large
+it is and nothing is recomputed per tick or per reset. Perimeter levels work their tables out from the position of a
+cell instead, so they are never built or cached at all.
+
+Text levels, with "#" for a wall, "." for an open cell and "S" for the spawn, can be compiled into level files by
+running this module: python Level.py <level.txt> <level.lvl>
+"""
+from array import array
+from collections import deque
+from typing import BinaryIO, Deque, Iterator, List, Optional, Sequence, Tuple, Union, overload
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+Cell = Tuple[int, int]
+
+LEVEL_MAGIC = b"SNKL"
+LEVEL_VERSION = 1
+LEVEL_HEADER = struct.Struct("<4sBxHHHH")
+
+NAV_MAGIC = b"SNKN"
+NAV_VERSION = 2
+
+# magic, version, digest of the level, cols, rows, number of open cells
+NAV_HEADER = struct.Struct("<4sBxx20sHHI")
+
+# Where the navigation tables of levels that were not loaded from a file are cached, named after the level's digest
+NAV_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "snake")
+
+# The order neighbours are stored in, matching the autopilot's DIRECTIONS: up, down, left, right
+NEIGHBOUR_OFFSETS: Tuple[Cell, ...] = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+class NavTables:
+    """
+    The navigation tables are responsible for holding everything about a level that only depends on its walls.
+
+    Every table is indexed by the row-major index of a cell:
+
+    - neighbours holds four entries per cell, the index of the open neighbour in each direction or -1.
+    - components holds the connected component of every open cell, or -1 for walls.
+
+    open_cells lists the index of every open cell column by column.
+    """
+
+    def __init__(self, cols: int, rows: int, neighbours: Sequence[int], components: Sequence[int], open_cells: Sequence[int]) -> None:
+        """
+        Create new navigation tables.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param neighbours: The open neighbours of every cell.
+        :param components: The connected component of every cell.
+        :param open_cells: The index of every open cell, column by column.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._neighbours = neighbours
+        self._components = components
+        self._open_cells = open_cells
+
+    @classmethod
+    def build(cls, level: 'Level') -> 'NavTables':
+        """
+        Compute the navigation tables of a level.
+
+        :param level: The level to compute the tables for.
+        :return: The tables.
+        """
+        cols, rows = level.get_cols(), level.get_rows()
+        walls = level.get_walls()
+        num_cells = cols * rows
+
+        neighbours = array("i", [-1]) * (num_cells * 4)
+
+        for y in range(rows):
+            for x in range(cols):
+                index = y * cols + x
+
+                if walls[index]:
+                    continue
+
+                for direction, (x_dir, y_dir) in enumerate(NEIGHBOUR_OFFSETS):
+                    next_x, next_y = x + x_dir, y + y_dir
+
+                    if 0 <= next_x < cols and 0 <= next_y < rows and not walls[next_y * cols + next_x]:
+                        neighbours[index * 4 + direction] = next_y * cols + next_x
+
+        # Flood fill every component from its first open cell
+        components = array("i", [-1]) * num_cells
+        num_components = 0
+        frontier: Deque[int] = deque()
+
+        for start in range(num_cells):
+            if walls[start] or components[start] != -1:
+                continue
+
+            component = num_components
+            num_components += 1
+            components[start] = component
+            frontier.append(start)
+
+            while frontier:
+                index = frontier.popleft()
+
+                for neighbour in neighbours[index * 4:index * 4 + 4]:
+                    if neighbour != -1 and components[neighbour] == -1:
+                        components[neighbour] = component
+                        frontier.append(neighbour)
+
+        open_cells = array("i", (y * cols + x for x in range(cols) for y in range(rows) if not walls[y * cols + x]))
+
+        return cls(cols, rows, neighbours, components, open_cells)
+
+    @classmethod
+    def load_or_build(cls, level: 'Level', path: str) -> 'NavTables':
+        """
+        Load the navigation tables of a level from disk, building and caching them if they are missing or were built
+        for a different version of the level.
+
+        :param level: The level the tables are for.
+        :param path: The path of the cache file.
+        :return: The tables.
+        """
+        tables = cls._load(level, path)
+
+        if tables is not None:
+            return tables
+
+        tables = cls.build(level)
+
+        # Write to a temporary file first so a concurrent reader never sees partial tables
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+
+            with open(temp_path, "wb") as file:
+                tables._write(file, level.get_digest())
+
+            os.replace(temp_path, path)
+        except OSError:
+            # The level may live somewhere read-only, the tables are still usable without the cache
+            pass
+
+        return tables
+
+    @classmethod
+    def _load(cls, level: 'Level', path: str) -> Optional['NavTables']:
+        """
+        Map cached navigation tables into memory.
+
+        :param level: The level the tables are for.
+        :param path: The path of the cache file.
+        :return: The tables, or None if there is no valid cache for the level.
+        """
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) < NAV_HEADER.size:
+            return None
+
+        magic, version, digest, cols, rows, num_open = NAV_HEADER.unpack_from(mapped)
+
+        if magic != NAV_MAGIC or version != NAV_VERSION or digest != level.get_digest() or (cols, rows) != (level.get_cols(), level.get_rows()):
+            return None
+
+        num_cells = cols * rows
+        sizes = (num_cells * 4 * 4, num_cells * 4, num_open * 4)
+
+        if len(mapped) != NAV_HEADER.size + sum(sizes):
+            return None
+
+        # Each table is a typed view straight onto the mapped file, nothing is copied
+        view = memoryview(mapped)
+        tables = []
+        offset = NAV_HEADER.size
+
+        for size, code in zip(sizes, ("i", "i", "i")):
+            tables.append(view[offset:offset + size].cast(code))
+            offset += size
+
+        return cls(cols, rows, *tables)
+
+    def _write(self, file: BinaryIO, digest: bytes) -> None:
+        """
+        Write the tables to a file.
+
+        :param file: The binary file to write to.
+        :param digest: The digest of the level the tables are for.
+        """
+        file.write(NAV_HEADER.pack(NAV_MAGIC, NAV_VERSION, digest, self._cols, self._rows, len(self._open_cells)))
+
+        for table, code in ((self._neighbours, "i"), (self._components, "i"), (self._open_cells, "i")):
+            file.write(array(code, table).tobytes())
+
+    def get_neighbours(self) -> Sequence[int]:
+        """
+        Get the open neighbours of every cell, four entries per cell in the order up, down, left, right.
+
+        :return: The neighbour table.
+        """
+        return self._neighbours
+
+    def get_components(self) -> Sequence[int]:
+        """
+        Get the connected component of every cell, -1 for walls.
+
+        :return: The component table.
+        """
+        return self._components
+
+    def get_open_cells(self) -> Sequence[int]:
+        """
+        Get the index of every open cell, column by column.
+
+        :return: The open cells.
+        """
+        return self._open_cells
+
+    def is_connected(self, start: int, end: int) -> bool:
+        """
+        Check if two cells can ever reach each other, ignoring the snake.
+
+        :param start: The index of the first cell.
+        :param end: The index of the second cell.
+        :return: True if both cells are open and in the same component, otherwise False.
+        """
+        component = self._components[start]
+        return component != -1 and component == self._components[end]
+
+    def prepare(self) -> None:
+        """
+        Build any table that is otherwise only built the first time it is asked for, such as before the autopilot
+        starts deciding so its first decision does not pay for it.
+        """
+        pass
+
+
+class PerimeterCells(Sequence[int]):
+    """
+    The perimeter cells are responsible for listing the index of every open cell of a perimeter level, column by
+    column, without storing them.
+    """
+
+    def __init__(self, cols: int, rows: int) -> None:
+        """
+        Create a new list of the open cells of a perimeter level.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        """
+        self._cols = cols
+        self._inner_rows = max(rows - 2, 0)
+        self._length = max(cols - 2, 0) * self._inner_rows
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[int]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, Sequence[int]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+
+        if not 0 <= index < self._length:
+            raise IndexError("cell index out of range")
+
+        x, y = divmod(index, self._inner_rows)
+        return (y + 1) * self._cols + x + 1
+
+    def __iter__(self) -> Iterator[int]:
+        cols = self._cols
+        return (y * cols + x for x in range(1, cols - 1) for y in range(1, self._inner_rows + 1))
+
+
+class PerimeterWalls(Sequence[int]):
+    """
+    The perimeter walls are responsible for telling which cells of a perimeter level are walls, one entry per cell,
+    row-major, without storing them.
+    """
+
+    def __init__(self, cols: int, rows: int) -> None:
+        """
+        Create a new list of the walls of a perimeter level.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._length = cols * rows
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[int]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, Sequence[int]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+
+        if not 0 <= index < self._length:
+            raise IndexError("cell index out of range")
+
+        y, x = divmod(index, self._cols)
+        return int(x == 0 or y == 0 or x == self._cols - 1 or y == self._rows - 1)
+
+
+class PerimeterNavTables(NavTables):
+    """
+    The perimeter navigation tables are responsible for the navigation tables of a board with walls around its edges
+    and nothing in between.
+
+    Every open cell is inside the walls and they are all connected, so the open cells and whether two cells are connected
+    are worked out from the position of a cell. The neighbour and component tables are only built the first time they
+    are needed, a row at a time rather than a cell at a time, and kept from then on.
+    """
+
+    def __init__(self, cols: int, rows: int) -> None:
+        """
+        Create new perimeter navigation tables.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        """
+        super().__init__(cols, rows, array("i"), array("i"), PerimeterCells(cols, rows))
+        self._built = False
+        self._components_built = False
+
+    def _is_open(self, index: int) -> bool:
+        """
+        Check if a cell is inside the walls.
+
+        :param index: The index of the cell.
+        :return: True if the cell is open, otherwise False.
+        """
+        y, x = divmod(index, self._cols)
+        return 0 < x < self._cols - 1 and 0 < y < self._rows - 1
+
+    def prepare(self) -> None:
+        """
+        Build the neighbour table.
+        """
+        if self._built:
+            return
+
+        cols, rows = self._cols, self._rows
+        neighbours = array("i", [-1]) * (cols * rows * 4)
+        inner = cols - 2
+
+        # The open cells of a row are a run of consecutive indices, so each direction of a row is a shifted range with
+        # the neighbours that are walls cut off at its ends
+        for y in range(1, rows - 1 if inner > 0 else 1):
+            start, stop = y * cols + 1, y * cols + cols - 1
+            walled = array("i", [-1]) * inner
+
+            left = array("i", range(start - 1, stop - 1))
+            right = array("i", range(start + 1, stop + 1))
+            left[0] = right[-1] = -1
+
+            neighbours[start * 4:stop * 4:4] = array("i", range(start - cols, stop - cols)) if y > 1 else walled
+            neighbours[start * 4 + 1:stop * 4:4] = array("i", range(start + cols, stop + cols)) if y < rows - 2 else walled
+            neighbours[start * 4 + 2:stop * 4:4] = left
+            neighbours[start * 4 + 3:stop * 4:4] = right
+
+        self._neighbours = neighbours
+        self._built = True
+
+    def get_neighbours(self) -> Sequence[int]:
+        """
+        Get the open neighbours of every cell, building them the first time they are needed.
+
+        :return: The neighbour table.
+        """
+        self.prepare()
+        return self._neighbours
+
+    def get_components(self) -> Sequence[int]:
+        """
+        Get the connected component of every cell, building them the first time they are needed.
+
+        :return: The component table, 0 for every cell inside the walls and -1 for the walls.
+        """
+        if not self._components_built:
+            cols, rows = self._cols, self._rows
+            components = array("i", [-1]) * (cols * rows)
+            inner = cols - 2
+
+            for y in range(1, rows - 1 if inner > 0 else 1):
+                components[y * cols + 1:y * cols + cols - 1] = array("i", [0]) * inner
+
+            self._components = components
+            self._components_built = True
+
+        return self._components
+
+    def is_connected(self, start: int, end: int) -> bool:
+        """
+        Check if two cells can ever reach each other, ignoring the snake.
+
+        :param start: The index of the first cell.
+        :param end: The index of the second cell.
+        :return: True if both cells are inside the walls, otherwise False.
+        """
+        return self._is_open(start) and self._is_open(end)
+
+
+class Level:
+    """
+    The level is responsible for describing where the walls of a board are and where the snake spawns.
+    """
+
+    def __init__(self, cols: int, rows: int, walls: Sequence[int], spawn: Cell = (1, 1), path: Optional[str] = None) -> None:
+        """
+        Create a new level.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param walls: One entry per cell, row-major, non-zero for a wall.
+        :param spawn: The cell the snake spawns in.
+        :param path: The file the level was loaded from, if any, next to which its navigation tables are cached.
+        """
+        if len(walls) != cols * rows:
+            raise ValueError(f"Expected {cols * rows} cells for a {cols}x{rows} level, got {len(walls)}.")
+
+        self._cols = cols
+        self._rows = rows
+        self._walls = walls
+        self._spawn = spawn
+        self._path = path
+        self._digest: Optional[bytes] = None
+        self._nav: Optional[NavTables] = None
+        self._interior_walls: Optional[bool] = None
+
+    @classmethod
+    def perimeter(cls, cols: int, rows: int) -> 'Level':
+        """
+        Create a level with walls around the edges of the board and nothing in between.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :return: The level.
+        """
+        return PerimeterLevel(cols, rows)
+
+    @classmethod
+    def from_walls(cls, cols: int, rows: int, walls: Sequence[int], spawn: Cell = (1, 1)) -> 'Level':
+        """
+        Create a level from the walls of a board, such as one rebuilt from a snapshot, which is a perimeter level if
+        the walls are only around the edges.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param walls: One entry per cell, row-major, non-zero for a wall.
+        :param spawn: The cell the snake spawns in.
+        :return: The level.
+        """
+        perimeter = PerimeterLevel(cols, rows, spawn)
+
+        if bytes(walls) == perimeter.get_walls():
+            return perimeter
+
+        return cls(cols, rows, walls, spawn)
+
+    @classmethod
+    def load(cls, path: str) -> 'Level':
+        """
+        Load a level file by mapping it into memory, or parse a text level if the path ends in ".txt".
+
+        :param path: The path of the level.
+        :return: The level.
+        """
+        if path.endswith(".txt"):
+            with open(path) as file:
+                level = cls.from_text(file.read())
+
+            return cls(level.get_cols(), level.get_rows(), level.get_walls(), level.get_spawn(), path)
+
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(mapped) < LEVEL_HEADER.size:
+            raise ValueError(f"{path} is too short to be a level file.")
+
+        magic, version, cols, rows, spawn_x, spawn_y = LEVEL_HEADER.unpack_from(mapped)
+
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise ValueError(f"{path} is not a version {LEVEL_VERSION} level file.")
+
+        walls = memoryview(mapped)[LEVEL_HEADER.size:LEVEL_HEADER.size + cols * rows]
+
+        return cls(cols, rows, walls, (spawn_x, spawn_y), path)
+
+    @classmethod
+    def from_text(cls, text: str) -> 'Level':
+        """
+        Parse a text level, with "#" for a wall, "." for an open cell and "S" for the spawn.
+
+        :param text: The text of the level, one line per row.
+        :return: The level.
+        """
+        lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+        cols, rows = max(len(line) for line in lines), len(lines)
+        walls = bytearray(cols * rows)
+        spawn = (1, 1)
+
+        for y, line in enumerate(lines):
+            for x, character in enumerate(line.ljust(cols, ".")):
+                if character == "#":
+                    walls[y * cols + x] = 1
+                elif character == "S":
+                    spawn = (x, y)
+
+        return cls(cols, rows, bytes(walls), spawn)
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the level in the level file format.
+
+        :return: The encoded level.
+        """
+        return LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, self._cols, self._rows, *self._spawn) + bytes(self.get_walls())
+
+    def save(self, path: str) -> None:
+        """
+        Write the level to a level file.
+
+        :param path: The path to write to.
+        """
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    def get_nav(self) -> NavTables:
+        """
+        Get the navigation tables of the level, loading or building them the first time they are needed.
+
+        Tables of levels loaded from a file are cached next to it, in a file with ".nav" appended to its name, and
+        tables of other levels in NAV_CACHE_DIR, in a file named after the digest of the level.
+
+        :return: The navigation tables.
+        """
+        if self._nav is None:
+            path = f"{self._path}.nav" if self._path else os.path.join(NAV_CACHE_DIR, f"{self.get_digest().hex()}.nav")
+            self._nav = NavTables.load_or_build(self, path)
+
+        return self._nav
+
+    def get_digest(self) -> bytes:
+        """
+        Get a digest of the level, used to tell whether cached navigation tables belong to it.
+
+        :return: The SHA-1 digest of the encoded level.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.to_bytes()).digest()
+
+        return self._digest
+
+    def is_wall(self, x: int, y: int) -> bool:
+        """
+        Check if a cell is a wall.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: True if the cell is a wall, otherwise False.
+        """
+        return bool(self._walls[y * self._cols + x])
+
+    def has_interior_walls(self) -> bool:
+        """
+        Check if the level has walls off the edges of the board, such as pillars, checking the walls once.
+
+        :return: True if any cell inside the perimeter is a wall, otherwise False.
+        """
+        if self._interior_walls is None:
+            cols, walls = self._cols, self._walls
+            self._interior_walls = any(any(walls[y * cols + 1:(y + 1) * cols - 1]) for y in range(1, self._rows - 1))
+
+        return self._interior_walls
+
+    def get_wall_cells(self) -> List[Cell]:
+        """
+        Get every wall cell, column by column.
+
+        :return: The x, y positions of the walls.
+        """
+        cols, rows, walls = self._cols, self._rows, self._walls
+        return [(x, y) for x in range(cols) for y in range(rows) if walls[y * cols + x]]
+
+    def get_cols(self) -> int:
+        """
+        Get the number of columns on the board.
+
+        :return: The number of columns.
+        """
+        return self._cols
+
+    def get_rows(self) -> int:
+        """
+        Get the number of rows on the board.
+
+        :return: The number of rows.
+        """
+        return self._rows
+
+    def get_walls(self) -> Sequence[int]:
+        """
+        Get the walls of the level, one entry per cell, row-major, non-zero for a wall.
+
+        :return: The walls.
+        """
+        return self._walls
+
+    def get_spawn(self) -> Cell:
+        """
+        Get the cell the snake spawns in.
+
+        :return: The spawn cell.
+        """
+        return self._spawn
+
+
+class PerimeterLevel(Level):
+    """
+    The perimeter level is responsible for describing a board with walls around its edges and nothing in between.
+
+    Its walls are worked out from their position instead of being stored, so very large boards cost nothing until
+    something asks for every cell.
+    """
+
+    def __init__(self, cols: int, rows: int, spawn: Cell = (1, 1)) -> None:
+        """
+        Create a new perimeter level.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param spawn: The cell the snake spawns in.
+        """
+        super().__init__(cols, rows, PerimeterWalls(cols, rows), spawn)
+
+        # The walls as bytes, built the first time something asks for every cell
+        self._wall_bytes: Optional[bytes] = None
+
+    def get_nav(self) -> NavTables:
+        """
+        Get the navigation tables of the level, which are worked out from the position of a cell.
+
+        :return: The navigation tables.
+        """
+        if self._nav is None:
+            self._nav = PerimeterNavTables(self._cols, self._rows)
+
+        return self._nav
+
+    def is_wall(self, x: int, y: int) -> bool:
+        """
+        Check if a cell is a wall.
+
+        :param x: The x position of the cell.
+        :param y: The y position of the cell.
+        :return: True if the cell is on the edge of the board, otherwise False.
+        """
+        return x == 0 or y == 0 or x == self._cols - 1 or y == self._rows - 1
+
+    def has_interior_walls(self) -> bool:
+        """
+        Check if the level has walls off the edges of the board.
+
+        :return: False, a perimeter level only has walls around its edges.
+        """
+        return False
+
+    def get_wall_cells(self) -> List[Cell]:
+        """
+        Get every wall cell, the top and bottom walls column by column followed by the left and right walls row by row.
+
+        :return: The x, y positions of the walls.
+        """
+        cols, rows = self._cols, self._rows
+        cells: List[Cell] = []
+
+        for x in range(cols):
+            cells.append((x, 0))
+            cells.append((x, rows - 1))
+
+        for y in range(1, rows - 1):
+            cells.append((0, y))
+            cells.append((cols - 1, y))
+
+        return cells
+
+    def get_walls(self) -> Sequence[int]:
+        """
+        Get the walls of the level, building them the first time they are needed.
+
+        :return: The walls, one entry per cell, row-major, non-zero for a wall.
+        """
+        if self._wall_bytes is None:
+            cols, rows = self._cols, self._rows
+            walls = bytearray(cols * rows)
+
+            for x, y in self.get_wall_cells():
+                walls[y * cols + x] = 1
+
+            self._wall_bytes = bytes(walls)
+
+        return self._wall_bytes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python Level.py <level.txt> <level.lvl>", file=sys.stderr)
+        sys.exit(2)
+
+    with open(sys.argv[1]) as text_file:
+        Level.from_text(text_file.read()).save(sys.argv[2])
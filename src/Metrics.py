@@ -0,0 +1,362 @@
+"""
+This module is responsible for collecting operational metrics from a running game and exposing them in the Prometheus
+text exposition format, either over HTTP or as a periodically rewritten text file.
+
+The game loop only records tick and frame durations, which costs a few additions per tick. Entity counts and grid
+occupancy are sampled at most once per sample interval, and GC and memory statistics are read by the exporter thread
+when the metrics are rendered.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import gc
+import os
+import threading
+import time
+
+from Simulation import Simulation
+
+# Upper bounds in seconds, a 60 tick/s game has about 16ms to spare per tick
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.016, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    """
+    The histogram is responsible for counting observations into cumulative buckets, as Prometheus expects them.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        """
+        Create a new, empty histogram.
+
+        :param name: The name of the metric.
+        :param description: The help text of the metric.
+        :param buckets: The upper bounds of the buckets, in increasing order.
+        """
+        self._name = name
+        self._description = description
+        self._buckets = tuple(buckets)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Count a single observation.
+
+        :param value: The observed value.
+        """
+        self._counts[bisect_left(self._buckets, value)] += 1
+        self._sum += value
+
+    def render(self) -> List[str]:
+        """
+        Render the histogram in the exposition format.
+
+        :return: The lines of the histogram.
+        """
+        counts = list(self._counts)
+        lines = [f"# HELP {self._name} {self._description}", f"# TYPE {self._name} histogram"]
+        cumulative = 0
+
+        for bound, count in zip(self._buckets, counts):
+            cumulative += count
+            lines.append(f'{self._name}_bucket{{le="{bound}"}} {cumulative}')
+
+        cumulative += counts[-1]
+        lines.append(f'{self._name}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{self._name}_sum {self._sum}")
+        lines.append(f"{self._name}_count {cumulative}")
+
+        return lines
+
+
+class Metrics:
+    """
+    The metrics are responsible for recording how a game is performing and rendering it for a scraper.
+    """
+
+    def __init__(self, sample_interval: float = 1.0) -> None:
+        """
+        Create a new set of metrics and start counting garbage collections.
+
+        :param sample_interval: The minimum number of seconds between samples of the entity count and grid occupancy.
+        """
+        self._sample_interval = sample_interval
+        self._next_sample = 0.0
+
+        self._tick_seconds = Histogram("snake_tick_seconds", "Time spent advancing the simulation by one tick.")
+        self._frame_seconds = Histogram("snake_frame_seconds", "Time spent rendering one frame.")
+        self._ticks = 0
+        self._histograms: List[Histogram] = []
+
+        self._ticks_per_second = 0.0
+        self._last_sample_time = time.perf_counter()
+        self._last_sample_ticks = 0
+        self._entities = 0
+        self._occupied_cells = 0
+        self._grid_cells = 0
+
+        self._gc_collections = [0] * len(gc.get_count())
+        self._gc_pause_seconds = 0.0
+        self._gc_started = 0.0
+        gc.callbacks.append(self._on_gc)
+
+    def add_histogram(self, histogram: Histogram) -> None:
+        """
+        Render a histogram kept up to date elsewhere alongside the metrics.
+
+        :param histogram: The histogram to render.
+        """
+        self._histograms.append(histogram)
+
+    def record_tick(self, seconds: float, simulation: Simulation) -> None:
+        """
+        Record that the simulation advanced by one tick.
+
+        :param seconds: How long the tick took.
+        :param simulation: The simulation that was advanced, sampled if the sample interval has passed.
+        """
+        self._tick_seconds.observe(seconds)
+        self._ticks += 1
+
+        now = time.perf_counter()
+
+        if now >= self._next_sample:
+            self._next_sample = now + self._sample_interval
+            self._sample(simulation, now)
+
+    def record_frame(self, seconds: float) -> None:
+        """
+        Record that a frame was rendered.
+
+        :param seconds: How long rendering the frame took.
+        """
+        self._frame_seconds.observe(seconds)
+
+    def _sample(self, simulation: Simulation, now: float) -> None:
+        """
+        Sample the gauges that are too costly to update every tick.
+
+        :param simulation: The simulation to sample.
+        :param now: The current time, in seconds.
+        """
+        elapsed = now - self._last_sample_time
+
+        if elapsed > 0:
+            self._ticks_per_second = (self._ticks - self._last_sample_ticks) / elapsed
+
+        self._last_sample_time = now
+        self._last_sample_ticks = self._ticks
+
+        grid = simulation.get_grid()
+        self._entities = len(simulation.get_world().get_game_objects())
+        self._occupied_cells = len(grid.get_occupied_cells())
+        self._grid_cells = grid.get_num_cols() * grid.get_num_rows()
+
+    def _on_gc(self, phase: str, info: Dict[str, Any]) -> None:
+        """
+        Time and count a garbage collection.
+
+        :param phase: Either "start" or "stop".
+        :param info: Details about the collection, including its generation.
+        """
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        else:
+            self._gc_pause_seconds += time.perf_counter() - self._gc_started
+            self._gc_collections[info["generation"]] += 1
+
+    def render(self) -> str:
+        """
+        Render every metric in the exposition format.
+
+        :return: The metrics, one sample per line.
+        """
+        lines: List[str] = []
+
+        def metric(name: str, description: str, value: float, kind: str = "gauge") -> None:
+            lines.extend((f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"))
+
+        metric("snake_ticks_total", "Number of ticks the simulation has run for.", self._ticks, "counter")
+        metric("snake_ticks_per_second", "Ticks per second over the last sample interval.", round(self._ticks_per_second, 3))
+        lines.extend(self._tick_seconds.render())
+        lines.extend(self._frame_seconds.render())
+
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+
+        metric("snake_entities", "Number of game objects in the world.", self._entities)
+        metric("snake_grid_occupied_cells", "Number of grid cells holding at least one game object.", self._occupied_cells)
+        metric("snake_grid_cells", "Number of cells on the grid.", self._grid_cells)
+
+        lines.extend(("# HELP snake_gc_collections_total Number of garbage collections per generation.", "# TYPE snake_gc_collections_total counter"))
+        for generation, count in enumerate(self._gc_collections):
+            lines.append(f'snake_gc_collections_total{{generation="{generation}"}} {count}')
+
+        metric("snake_gc_pause_seconds_total", "Time spent paused in garbage collection.", round(self._gc_pause_seconds, 6), "counter")
+        metric("snake_resident_memory_bytes", "Resident set size of the process.", read_rss())
+
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """
+        Stop counting garbage collections.
+        """
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+
+def read_rss() -> int:
+    """
+    Read the resident set size of the current process.
+
+    Falls back to the peak resident set size where /proc is not available.
+
+    :return: The resident set size in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # Reported in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MetricsExporter(ABC):
+    """
+    The metrics exporter is responsible for making the metrics available outside the process.
+    """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Stop exporting the metrics.
+        """
+        pass
+
+
+class MetricsHttpServer(MetricsExporter):
+    """
+    The metrics HTTP server is responsible for serving the metrics to scrapers from a background thread.
+    """
+
+    def __init__(self, metrics: Metrics, address: str) -> None:
+        """
+        Create a new metrics server and start listening.
+
+        :param metrics: The metrics to serve.
+        :param address: The "<host>:<port>" to listen on.
+        """
+        host, port = address.rsplit(":", 1)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, int(port)), Handler)
+        self._server.daemon_threads = True
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def get_address(self) -> Tuple[str, int]:
+        """
+        Get the address the server listens on.
+
+        :return: The host and port of the server.
+        """
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def close(self) -> None:
+        """
+        Stop the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=1)
+
+
+class MetricsTextFile(MetricsExporter):
+    """
+    The metrics text file is responsible for periodically rewriting the metrics to a file, for collectors such as the
+    node exporter's textfile collector.
+    """
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 5.0) -> None:
+        """
+        Create a new metrics text file and start writing it.
+
+        :param metrics: The metrics to write.
+        :param path: The path of the file to write.
+        :param interval: The number of seconds between writes.
+        """
+        self._metrics = metrics
+        self._path = path
+        self._interval = interval
+        self._stopped = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Write the metrics every interval until stopped.
+        """
+        while not self._stopped.wait(self._interval):
+            self.write()
+
+    def write(self) -> None:
+        """
+        Write the metrics now, replacing the file atomically so a collector never reads a partial file.
+        """
+        temporary_path = f"{self._path}.{os.getpid()}.tmp"
+
+        with open(temporary_path, "w") as file:
+            file.write(self._metrics.render())
+
+        os.replace(temporary_path, self._path)
+
+    def close(self) -> None:
+        """
+        Stop writing, after writing the final metrics.
+        """
+        self._stopped.set()
+        self._thread.join(timeout=1)
+        self.write()
+
+
+def start_exporters(metrics: Metrics, address: Optional[str], path: Optional[str]) -> List[MetricsExporter]:
+    """
+    Start the exporters that were asked for.
+
+    :param metrics: The metrics to export.
+    :param address: The "<host>:<port>" to serve the metrics on, if any.
+    :param path: The path of the text file to write the metrics to, if any.
+    :return: The started exporters, each of which must be closed.
+    """
+    exporters: List[MetricsExporter] = []
+
+    if address:
+        exporters.append(MetricsHttpServer(metrics, address))
+
+    if path:
+        exporters.append(MetricsTextFile(metrics, path))
+
+    return exporters
@@ -0,0 +1,340 @@
+"""
+This module is responsible for the Monte Carlo autopilot policy, which scores every safe move by playing many short
+games on from it, on headless copies of the world spread over a pool of processes.
+
+The policy is registered by the autopilot module, which only imports this module the first time the policy is created.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+import multiprocessing
+import os
+import random
+import time
+
+from Autopilot import DIRECTIONS, WALL_TABLE, AutopilotPolicy, Direction, blocked_cells
+from BoardSnapshot import BoardSnapshot
+from Component import PhysicsBodyComponent, TransformComponent
+from GameObject import Food, Snake, Wall
+from GameStateManager import SCORE, STATUS
+from Simulation import Simulation
+
+# What losing a rollout costs, against a point for every food eaten. Losing later costs less
+DEATH_PENALTY = 5.0
+
+# What ending a rollout next to the food is worth, falling off with the distance to it
+FOOD_DISTANCE_WEIGHT = 0.5
+
+# The simulations of a worker process, one per board size and wall layout, reused by every rollout on that board,
+# along with the random number generator each one places food with
+_simulations: Dict[Tuple[int, int, bytes], Tuple[Simulation, random.Random]] = {}
+
+
+def _get_simulation(snapshot: BoardSnapshot) -> Tuple[Simulation, random.Random]:
+    """
+    Get the simulation of this process for the board of a snapshot, creating it on first use.
+
+    :param snapshot: The snapshot to get the simulation for.
+    :return: The simulation, in whatever state the last rollout left it, and the random number generator it places
+        food with.
+    """
+    key = (snapshot.get_cols(), snapshot.get_rows(), snapshot.get_cells().translate(WALL_TABLE))
+    entry = _simulations.get(key)
+
+    if entry is None:
+        rng = random.Random()
+        entry = _simulations[key] = (Simulation.from_snapshot(snapshot, rng=rng, fused_pipeline=True), rng)
+
+    return entry
+
+
+def _rollout_move(simulation: Simulation, current: Direction, greedy: float, rng: random.Random) -> Direction:
+    """
+    Pick the next move of a rollout: towards the food most of the time, otherwise any move that does not run straight
+    into a wall or a snake.
+
+    :param simulation: The simulation the rollout plays on.
+    :param current: The direction the snake is moving in.
+    :param greedy: The chance of heading for the food instead of moving at random.
+    :param rng: The random number generator of the rollout.
+    :return: The move.
+    """
+    grid = simulation.get_grid()
+    cell_size = grid.get_cell_size()
+    cols, rows = grid.get_num_cols(), grid.get_num_rows()
+    game_objects = simulation.get_world().get_game_objects()
+    head = simulation.get_world().get_player().get_component(TransformComponent)
+
+    if head is None:
+        return current
+
+    head_x, head_y = int(head.x // cell_size), int(head.y // cell_size)
+    moves: List[Direction] = []
+
+    for x_dir, y_dir in DIRECTIONS:
+        if (x_dir, y_dir) == (-current[0], -current[1]) and current != (0, 0):
+            continue
+
+        x, y = head_x + x_dir, head_y + y_dir
+
+        if not (0 <= x < cols and 0 <= y < rows):
+            continue
+
+        occupants = grid.get_cell(x, y)
+
+        if not occupants or not any(isinstance(occupant, (Snake, Wall)) for occupant in occupants):
+            moves.append((x_dir, y_dir))
+
+    if not moves:
+        return current
+
+    # Food is added after the walls, so it is found quickest from the end
+    food = next((game_object for game_object in reversed(game_objects) if isinstance(game_object, Food)), None)
+    food_transform = food.get_component(TransformComponent) if food else None
+
+    if food_transform and rng.random() < greedy:
+        food_x, food_y = int(food_transform.x // cell_size), int(food_transform.y // cell_size)
+        return min(moves, key=lambda move: abs(head_x + move[0] - food_x) + abs(head_y + move[1] - food_y))
+
+    return rng.choice(moves)
+
+
+def rollout(simulation: Simulation, snapshot: BoardSnapshot, first_move: Direction, depth: int, greedy: float, rng: random.Random) -> float:
+    """
+    Play a short game from a snapshot, starting with a given move.
+
+    :param simulation: The simulation to play on, which is restored to the snapshot first.
+    :param snapshot: The snapshot to start from.
+    :param first_move: The move to make on the first tick.
+    :param depth: The number of ticks to play.
+    :param greedy: The chance of heading for the food instead of moving at random after the first move.
+    :param rng: The random number generator of the rollout.
+    :return: The value of the rollout: the food eaten, less a penalty if the snake lost, which is smaller the later
+        it lost, plus a little for ending up near the food.
+    """
+    simulation.restore(snapshot)
+    state = simulation.get_state()
+    start_score = snapshot.get_score()
+    move = first_move
+
+    for tick in range(depth):
+        player_body = simulation.get_world().get_player().get_component(PhysicsBodyComponent)
+
+        if player_body is None:
+            break
+
+        if tick:
+            move = _rollout_move(simulation, (player_body.x_dir, player_body.y_dir), greedy, rng)
+
+        player_body.x_dir, player_body.y_dir = move
+        simulation.step()
+
+        if state.get_state(STATUS) == "game-over":
+            return state.get_state(SCORE) - start_score - DEATH_PENALTY * (depth - tick) / depth
+
+    value = float(state.get_state(SCORE) - start_score)
+    snapshot_after = simulation.snapshot()
+    head, food = snapshot_after.get_head(), snapshot_after.get_food()
+
+    if head and food:
+        distance = abs(head[0] - food[0]) + abs(head[1] - food[1])
+        value += FOOD_DISTANCE_WEIGHT * (1 - distance / (snapshot.get_cols() + snapshot.get_rows()))
+
+    return value
+
+
+def warm_up() -> int:
+    """
+    Do nothing, which is enough to get a worker process started and this module imported in it.
+
+    :return: The id of the worker process.
+    """
+    return os.getpid()
+
+
+def run_rollouts(snapshot: BoardSnapshot, moves: List[Direction], deadline: Optional[float], max_rollouts: int, depth: int, greedy: float, seed: int) -> List[Tuple[float, int]]:
+    """
+    Play rollouts for every move in turn until the deadline passes or every move has had its share, which is the work
+    of a single worker process for a single decision.
+
+    :param snapshot: The snapshot to start every rollout from.
+    :param moves: The moves to play rollouts for.
+    :param deadline: The time.monotonic() after which no more rollouts are started, or None to play every rollout.
+        The monotonic clock is shared by every process on the machine.
+    :param max_rollouts: The number of rollouts to play for each move at most.
+    :param depth: The number of ticks in every rollout.
+    :param greedy: The chance of heading for the food instead of moving at random.
+    :param seed: The seed of the random number generator of the rollouts.
+    :return: The total value and number of rollouts played for every move, in order.
+    """
+    simulation, rng = _get_simulation(snapshot)
+    seeds = random.Random(seed)
+    totals = [0.0] * len(moves)
+    counts = [0] * len(moves)
+
+    for _ in range(max_rollouts):
+        # Every move of a round plays with the same random numbers, for both its moves and the food, so the moves
+        # are compared on the same luck
+        round_seed = seeds.getrandbits(64)
+
+        for index, move in enumerate(moves):
+            if deadline is not None and time.monotonic() >= deadline:
+                return list(zip(totals, counts))
+
+            rng.seed(round_seed)
+            totals[index] += rollout(simulation, snapshot, move, depth, greedy, rng)
+            counts[index] += 1
+
+    return list(zip(totals, counts))
+
+
+class MonteCarloPolicy(AutopilotPolicy):
+    """
+    The Monte Carlo policy plays short rollouts from every safe move and takes the move whose rollouts went best on
+    average, so it sees traps and detours that a single shortest path does not.
+
+    Rollouts run on a pool of processes, one per core by default, each with its own copy of the world that is reset
+    to the snapshot before every rollout. Every process plays rollouts for every move in turn until the deadline, so
+    the number of rollouts per decision grows with the number of cores.
+    """
+
+    def __init__(self, workers: Optional[int] = None, deadline_ms: Optional[float] = 80.0, rollouts: int = 256, depth: int = 20, greedy: float = 0.75) -> None:
+        """
+        Create a new Monte Carlo policy and start its worker processes in the background. Until every worker is up,
+        decisions play their rollouts on the calling thread.
+
+        :param workers: The number of processes to run rollouts on, defaults to one per core, 0 runs them on the
+            calling thread instead.
+        :param deadline_ms: The time every decision may spend on rollouts, or None to always play every rollout.
+        :param rollouts: The number of rollouts to play for every move at most.
+        :param depth: The number of ticks in every rollout.
+        :param greedy: The chance a rollout heads for the food on each tick instead of moving at random.
+        """
+        self._workers = (os.cpu_count() or 1) if workers is None else workers
+        self._deadline_ms = deadline_ms
+        self._rollouts = rollouts
+        self._depth = depth
+        self._greedy = greedy
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._warming: List["Future[int]"] = []
+
+        if self._workers:
+            # Forking a process that runs pygame and planner threads is unsafe, so workers start from scratch, which
+            # takes long enough to miss several decisions if it were left to the first one
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+            self._warming = [self._executor.submit(warm_up) for _ in range(self._workers)]
+
+        self._decisions = 0
+        self._rollouts_played = 0
+        self._rollout_seconds = 0.0
+
+    def decide(self, snapshot: BoardSnapshot) -> Optional[Direction]:
+        """
+        Decide the move whose rollouts went best on average.
+
+        :param snapshot: The board to decide on.
+        :return: The next direction, or None if every direction is lethal.
+        """
+        head = snapshot.get_head()
+
+        if head is None:
+            return None
+
+        body = snapshot.get_body()
+        current = (head[0] - body[1][0], head[1] - body[1][1]) if len(body) > 1 else (0, 0)
+        blocked = blocked_cells(snapshot)
+        moves: List[Direction] = []
+
+        for x_dir, y_dir in ((current,) + DIRECTIONS if current != (0, 0) else DIRECTIONS):
+            if (x_dir, y_dir) in moves or ((x_dir, y_dir) == (-current[0], -current[1]) and current != (0, 0)):
+                continue
+
+            x, y = head[0] + x_dir, head[1] + y_dir
+
+            if snapshot.in_bounds(x, y) and not blocked[snapshot.index(x, y)]:
+                moves.append((x_dir, y_dir))
+
+        if len(moves) < 2:
+            return moves[0] if moves else None
+
+        start = time.monotonic()
+        deadline = start + self._deadline_ms / 1000 if self._deadline_ms is not None else None
+
+        # The level is left behind, the workers lay the walls out from the cells instead of pickling it
+        board = BoardSnapshot(snapshot.get_cols(), snapshot.get_rows(), snapshot.get_cells(), body, snapshot.get_food(), snapshot.get_score(), snapshot.get_tick())
+        results = self._run(board, moves, deadline)
+
+        totals = [0.0] * len(moves)
+        counts = [0] * len(moves)
+
+        for result in results:
+            for index, (total, count) in enumerate(result):
+                totals[index] += total
+                counts[index] += count
+
+        self._decisions += 1
+        self._rollouts_played += sum(counts)
+        self._rollout_seconds += time.monotonic() - start
+
+        # The first of the best moves, which prefers the current direction. Moves without a single rollout lose out
+        values = [total / count if count else float("-inf") for total, count in zip(totals, counts)]
+        return moves[values.index(max(values))]
+
+    def _run(self, board: BoardSnapshot, moves: List[Direction], deadline: Optional[float]) -> List[List[Tuple[float, int]]]:
+        """
+        Share the rollouts of a decision between the workers and collect what they played by the deadline.
+
+        :param board: The snapshot to start every rollout from.
+        :param moves: The moves to play rollouts for.
+        :param deadline: The time.monotonic() after which no more rollouts are started.
+        :return: The total value and number of rollouts of every move, from every worker that finished in time.
+        """
+        seed = board.get_tick()
+
+        # Without a deadline nothing is lost waiting for the workers, and the rollouts do not depend on how long they
+        # took to start
+        if self._warming and (deadline is None or all(future.done() for future in self._warming)):
+            wait(self._warming)
+            self._warming = []
+
+        if self._executor is None or self._warming:
+            return [run_rollouts(board, moves, deadline, self._rollouts, self._depth, self._greedy, seed)]
+
+        share = -(-self._rollouts // self._workers)
+        futures: List["Future[List[Tuple[float, int]]]"] = [
+            self._executor.submit(run_rollouts, board, moves, deadline, share, self._depth, self._greedy, seed * self._workers + worker)
+            for worker in range(self._workers)
+        ]
+
+        # A rollout that started just before the deadline is still waited for
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic()) + self._depth * 0.001
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in not_done:
+            future.cancel()
+
+        return [future.result() for future in done if future.exception() is None]
+
+    def get_rollouts_per_second(self) -> float:
+        """
+        Get the number of rollouts played per second spent deciding.
+
+        :return: The number of rollouts per second.
+        """
+        return self._rollouts_played / self._rollout_seconds if self._rollout_seconds else 0.0
+
+    def format(self) -> str:
+        """
+        Format the rollout statistics of the policy.
+
+        :return: The statistics on a single line.
+        """
+        per_decision = self._rollouts_played / self._decisions if self._decisions else 0.0
+        return f"montecarlo: {per_decision:.0f} rollouts per decision on {self._workers or 1} processes, {self.get_rollouts_per_second():.0f} rollouts/s"
+
+    def close(self) -> None:
+        """
+        Stop the worker processes, if they were started.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
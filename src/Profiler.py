@@ -0,0 +1,198 @@
+"""
+This module is responsible for profiling a running game by sampling the stacks of its threads at a fixed rate, which
+costs little enough to leave on for real sessions, unlike a deterministic profiler that hooks every call.
+"""
+from types import CodeType, FrameType
+from typing import Dict, List, Optional, Tuple, Type
+import os
+import sys
+import threading
+import time
+
+from System import System
+
+# The label of samples taken while no system was processing
+NO_SYSTEM = "no system"
+
+
+def _process_codes() -> Dict[CodeType, str]:
+    """
+    Find the code of the process method of every system, so a sample can tell which system was processing.
+
+    :return: The name of the system that owns each process method, by the code of the method.
+    """
+    codes: Dict[CodeType, str] = {}
+    classes: List[Type[System]] = [System]
+
+    while classes:
+        system_class = classes.pop()
+        classes.extend(system_class.__subclasses__())
+
+        process = system_class.__dict__.get("process")
+
+        if process is not None and system_class is not System:
+            codes[process.__code__] = system_class.__name__
+
+    return codes
+
+
+def _label(code: CodeType) -> str:
+    """
+    Label a frame of a stack with the function it is running.
+
+    :param code: The code of the frame.
+    :return: The qualified name of the function, and the file and line it starts on.
+    """
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    The sampling profiler is responsible for periodically recording the stack of every thread from a background
+    thread, and writing the samples as collapsed stacks, one line per distinct stack with the number of times it was
+    sampled, which flamegraph.pl, speedscope and inferno read directly.
+
+    Every stack starts with the name of its thread and the system whose process method was running, so a flame graph
+    splits the time by system first.
+    """
+
+    def __init__(self, rate: float = 99.0, switch_interval: float = 0.0002) -> None:
+        """
+        Create a new sampling profiler.
+
+        A sample can only be taken once the profiler holds the GIL, which a busy thread only gives up every switch
+        interval, 5ms by default. A tick that is shorter than that would always be over by the time the sample is
+        taken, so the switch interval is lowered while sampling. This only costs anything when the profiler asks for
+        the GIL, once per sample.
+
+        :param rate: The number of samples to take per second. A rate that is not a multiple of the tick rate avoids
+            always sampling the same point of the tick.
+        :param switch_interval: The switch interval to use while sampling, in seconds.
+        """
+        self._interval = 1 / rate
+        self._switch_interval = switch_interval
+        self._previous_switch_interval = sys.getswitchinterval()
+        self._stacks: Dict[Tuple[str, str, Tuple[CodeType, ...]], int] = {}
+        self._samples = 0
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._thread_names: Dict[int, str] = {}
+        self._codes = _process_codes()
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start sampling on a background thread.
+        """
+        self._started = time.perf_counter()
+        self._previous_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(self._switch_interval)
+
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Take a sample every interval until stopped, skipping the samples that are overdue rather than catching up.
+        """
+        next_sample = time.perf_counter() + self._interval
+
+        while not self._stopped.wait(max(0.0, next_sample - time.perf_counter())):
+            self._sample()
+            next_sample = max(next_sample + self._interval, time.perf_counter())
+
+    def _sample(self) -> None:
+        """
+        Record the stack of every thread but the profiler's own.
+        """
+        own = threading.get_ident()
+        codes = self._codes
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+
+            thread_name = self._thread_names.get(ident)
+
+            if thread_name is None:
+                self._thread_names = {thread.ident: thread.name for thread in threading.enumerate() if thread.ident is not None}
+                thread_name = self._thread_names.get(ident, str(ident))
+
+            stack: List[CodeType] = []
+            system: Optional[str] = None
+            current: Optional[FrameType] = frame
+
+            while current is not None:
+                code = current.f_code
+                stack.append(code)
+
+                # The innermost system wins, in case one system runs the process method of another
+                if system is None:
+                    system = codes.get(code)
+
+                current = current.f_back
+
+            stack.reverse()
+            key = (thread_name, system or NO_SYSTEM, tuple(stack))
+            self._stacks[key] = self._stacks.get(key, 0) + 1
+
+        self._samples += 1
+
+    def stop(self) -> None:
+        """
+        Stop sampling.
+        """
+        self._stopped.set()
+
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+            self._elapsed = time.perf_counter() - self._started
+            sys.setswitchinterval(self._previous_switch_interval)
+
+    def get_system_shares(self) -> List[Tuple[str, float]]:
+        """
+        Get the share of the wall time each system spent processing, which is the share of the sampling rounds where
+        some thread was running its process method.
+
+        :return: The name of every system and its share of the wall time, largest first.
+        """
+        counts: Dict[str, int] = {}
+
+        for (thread_name, system, stack), count in self._stacks.items():
+            if system != NO_SYSTEM:
+                counts[system] = counts.get(system, 0) + count
+
+        samples = self._samples or 1
+        return sorted(((system, count / samples) for system, count in counts.items()), key=lambda share: share[1], reverse=True)
+
+    def write(self, path: str) -> None:
+        """
+        Write the samples as collapsed stacks.
+
+        :param path: The path of the file to write.
+        """
+        lines: Dict[str, int] = {}
+
+        for (thread_name, system, stack), count in self._stacks.items():
+            line = ";".join([thread_name, f"[{system}]", *(_label(code) for code in stack)])
+            lines[line] = lines.get(line, 0) + count
+
+        with open(path, "w") as file:
+            for line, count in sorted(lines.items()):
+                file.write(f"{line} {count}\n")
+
+    def format(self) -> str:
+        """
+        Format a summary of the samples.
+
+        :return: The number of samples, the rate they were actually taken at and the share of the wall time of each
+            system.
+        """
+        shares = ", ".join(f"{system} {share:.1%}" for system, share in self.get_system_shares())
+        rate = self._samples / self._elapsed if self._elapsed else 0.0
+
+        return f"{self._samples} samples at {rate:.0f}/s of {1 / self._interval:g}/s asked for: {shares or 'none'}"
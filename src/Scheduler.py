@@ -0,0 +1,208 @@
+"""
+This module is responsible for running systems in an order derived from the components and shared state they read and
+write, running systems that do not conflict at the same time, and reporting which systems bound the length of a tick.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import time
+
+from GameObject import GameObject
+from System import System
+
+
+def conflicts(first: System, second: System) -> bool:
+    """
+    Check if two systems must not run at the same time, because either writes something the other reads or writes.
+
+    :param first: The first system.
+    :param second: The second system.
+    :return: True if the systems conflict, otherwise False.
+    """
+    first_writes, second_writes = first.get_writes(), second.get_writes()
+
+    return bool(first_writes & (second.get_reads() | second_writes) or second_writes & first.get_reads())
+
+
+class SystemScheduler:
+    """
+    The system scheduler is responsible for running a list of systems every tick as if they ran one after another, in
+    the order they were given, while running systems that do not conflict with each other at the same time.
+
+    A system depends on every earlier system it conflicts with, so conflicting systems always run in the order they
+    were given and the results do not depend on which thread finishes first.
+    """
+
+    def __init__(self, systems: Sequence[System], workers: int = 1) -> None:
+        """
+        Create a new scheduler and work out the dependencies between its systems.
+
+        :param systems: The systems to run, in the order they would run one after another.
+        :param workers: The number of threads to run systems on, 1 runs every system on the calling thread.
+        """
+        self._systems = list(systems)
+        self._names = [type(system).__name__ for system in self._systems]
+
+        # The earlier systems each system has to wait for
+        self._dependencies: List[List[int]] = [
+            [earlier for earlier in range(index) if conflicts(self._systems[earlier], system)]
+            for index, system in enumerate(self._systems)
+        ]
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="system")
+
+        self._enabled = [True] * len(self._systems)
+        self._durations = [0.0] * len(self._systems)
+        self._critical_path: List[int] = []
+
+        # Over every tick, the time each system spent on the critical path and the number of ticks it was the slowest
+        # system on it
+        self._ticks = 0
+        self._critical_seconds = [0.0] * len(self._systems)
+        self._bounding_ticks = [0] * len(self._systems)
+
+    def set_enabled(self, system: System, enabled: bool) -> None:
+        """
+        Switch a system on or off. A system that is off is skipped, but the systems it conflicts with still run in
+        the same order, so systems can be switched without working out the dependencies again.
+
+        :param system: The system to switch.
+        :param enabled: Whether the system runs.
+        """
+        self._enabled[self._systems.index(system)] = enabled
+
+    def run(self, game_objects: List[GameObject]) -> None:
+        """
+        Run every system once.
+
+        :param game_objects: The game objects to process.
+        """
+        if self._executor is None:
+            for index in range(len(self._systems)):
+                self._run_system(index, game_objects)
+        else:
+            self._run_parallel(self._executor, game_objects)
+
+        self._record_critical_path()
+
+    def _run_system(self, index: int, game_objects: List[GameObject]) -> None:
+        """
+        Run a single system and time it.
+
+        :param index: The index of the system.
+        :param game_objects: The game objects to process.
+        """
+        if not self._enabled[index]:
+            self._durations[index] = 0.0
+            return
+
+        start = time.perf_counter()
+        self._systems[index].process(game_objects)
+        self._durations[index] = time.perf_counter() - start
+
+    def _run_parallel(self, executor: ThreadPoolExecutor, game_objects: List[GameObject]) -> None:
+        """
+        Run every system on the thread pool, starting each one as soon as the systems it depends on have finished.
+
+        :param executor: The thread pool to run on.
+        :param game_objects: The game objects to process.
+        """
+        remaining = [len(dependencies) for dependencies in self._dependencies]
+        running: Dict["Future[None]", int] = {}
+        finished: Set[int] = set()
+
+        for index, count in enumerate(remaining):
+            if count == 0:
+                running[executor.submit(self._run_system, index, game_objects)] = index
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = running.pop(future)
+
+                # Let the systems that are still running finish before handing the error to the caller
+                if future.exception() is not None:
+                    wait(running)
+                    future.result()
+
+                finished.add(index)
+
+            for index, dependencies in enumerate(self._dependencies):
+                if remaining[index] and all(dependency in finished for dependency in dependencies):
+                    remaining[index] = 0
+                    running[executor.submit(self._run_system, index, game_objects)] = index
+
+    def _record_critical_path(self) -> None:
+        """
+        Find the chain of dependent systems that took the longest this tick, which no amount of threads can shorten.
+        """
+        durations = self._durations
+        finish = [0.0] * len(durations)
+        previous: List[Optional[int]] = [None] * len(durations)
+
+        # Systems only depend on earlier systems, so the list order is already a topological order
+        for index, dependencies in enumerate(self._dependencies):
+            for dependency in dependencies:
+                if finish[dependency] > finish[index]:
+                    finish[index] = finish[dependency]
+                    previous[index] = dependency
+
+            finish[index] += durations[index]
+
+        self._critical_path.clear()
+        node: Optional[int] = max(range(len(finish)), key=finish.__getitem__) if finish else None
+
+        while node is not None:
+            self._critical_path.append(node)
+            node = previous[node]
+
+        self._critical_path.reverse()
+        self._ticks += 1
+
+        for index in self._critical_path:
+            self._critical_seconds[index] += durations[index]
+
+        if self._critical_path:
+            self._bounding_ticks[max(self._critical_path, key=durations.__getitem__)] += 1
+
+    def get_dependencies(self) -> List[Tuple[str, List[str]]]:
+        """
+        Get the systems each system waits for.
+
+        :return: The name of every system and the names of the systems it depends on, in the order they were given.
+        """
+        return [(self._names[index], [self._names[dependency] for dependency in dependencies]) for index, dependencies in enumerate(self._dependencies)]
+
+    def get_critical_path(self) -> List[Tuple[str, float]]:
+        """
+        Get the critical path of the last tick.
+
+        :return: The name of every system on the path and how long it took in seconds, in the order they ran.
+        """
+        return [(self._names[index], self._durations[index]) for index in self._critical_path]
+
+    def format(self) -> str:
+        """
+        Format the critical path of the last tick and the share of every system in the critical path over every tick.
+
+        :return: A summary of the critical path.
+        """
+        last = " -> ".join(f"{name} {seconds * 1000:.3f}ms" for name, seconds in self.get_critical_path()) or "none"
+        total = sum(self._critical_seconds)
+        lines = [f"Critical path of the last tick: {last}", f"Critical path over {self._ticks} ticks, {total / max(self._ticks, 1) * 1000:.3f}ms per tick:"]
+
+        for index in sorted(range(len(self._systems)), key=self._critical_seconds.__getitem__, reverse=True):
+            share = self._critical_seconds[index] / total if total else 0.0
+            lines.append(f"  {share:>6.1%} {self._names[index]}, slowest on the path in {self._bounding_ticks[index]} ticks")
+
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """
+        Stop the thread pool, if any.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
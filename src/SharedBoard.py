@@ -0,0 +1,163 @@
+"""
+This module is responsible for publishing board snapshots into shared memory so other processes can read the board
+without pickling the world.
+
+The segment is laid out as a fixed size header, followed by one byte per cell (row-major), followed by the cells of
+the snake as pairs of 32-bit integers. Writes are guarded by a sequence number: the writer makes it odd before
+writing and even once the write is complete, and readers retry until they copy the segment between two identical,
+even sequence numbers.
+"""
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional
+import struct
+import time
+
+from BoardSnapshot import BoardSnapshot, Cell
+
+# seq, cols, rows, tick, score, food_x, food_y, body_length
+HEADER = struct.Struct("<QIIIiiiI")
+SEQUENCE = struct.Struct("<Q")
+BODY_CELL = struct.Struct("<ii")
+
+
+def segment_size(cols: int, rows: int) -> int:
+    """
+    Get the number of bytes needed to hold a board of the given size.
+
+    :param cols: The number of columns on the board.
+    :param rows: The number of rows on the board.
+    :return: The size of the segment in bytes.
+    """
+    return HEADER.size + cols * rows + cols * rows * BODY_CELL.size
+
+
+class SharedBoard:
+    """
+    The shared board is responsible for owning a shared memory segment and publishing snapshots into it.
+    """
+
+    def __init__(self, cols: int, rows: int, name: Optional[str] = None) -> None:
+        """
+        Create a new shared board.
+
+        :param cols: The number of columns on the board.
+        :param rows: The number of rows on the board.
+        :param name: The name of the shared memory segment, or None to let the OS pick one.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._seq = 0
+
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=segment_size(cols, rows))
+        HEADER.pack_into(self._memory.buf, 0, 0, cols, rows, 0, 0, -1, -1, 0)
+
+    def get_name(self) -> str:
+        """
+        Get the name of the shared memory segment readers should attach to.
+
+        :return: The name of the segment.
+        """
+        return self._memory.name
+
+    def publish(self, snapshot: BoardSnapshot) -> None:
+        """
+        Publish a snapshot into the shared memory segment.
+
+        :param snapshot: The snapshot to publish. It must have the same dimensions as the shared board.
+        """
+        if snapshot.get_cols() != self._cols or snapshot.get_rows() != self._rows:
+            raise ValueError("Snapshot dimensions do not match the shared board.")
+
+        buf = self._memory.buf
+        num_cells = self._cols * self._rows
+        body = snapshot.get_body()
+        food = snapshot.get_food() or (-1, -1)
+
+        # Mark the segment as being written
+        self._seq += 1
+        SEQUENCE.pack_into(buf, 0, self._seq)
+
+        HEADER.pack_into(buf, 0, self._seq, self._cols, self._rows, snapshot.get_tick(), snapshot.get_score(), food[0], food[1], len(body))
+        buf[HEADER.size:HEADER.size + num_cells] = snapshot.get_cells()
+
+        body_offset = HEADER.size + num_cells
+        body_bytes = array("i", [coordinate for cell in body for coordinate in cell]).tobytes()
+        buf[body_offset:body_offset + len(body_bytes)] = body_bytes
+
+        # Mark the segment as consistent
+        self._seq += 1
+        SEQUENCE.pack_into(buf, 0, self._seq)
+
+    def close(self) -> None:
+        """
+        Close and remove the shared memory segment.
+        """
+        self._memory.close()
+        self._memory.unlink()
+
+
+class SharedBoardReader:
+    """
+    The shared board reader is responsible for attaching to a shared board from another process and reading
+    consistent snapshots out of it.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Attach to an existing shared board.
+
+        :param name: The name of the shared memory segment.
+        """
+        self._memory = shared_memory.SharedMemory(name=name)
+
+        # Readers never own the segment, but the resource tracker would otherwise unlink it when this process exits.
+        resource_tracker.unregister(self._memory._name, "shared_memory")  # type: ignore[attr-defined]
+
+        _, self._cols, self._rows = struct.unpack_from("<QII", self._memory.buf, 0)
+
+    def get_sequence(self) -> int:
+        """
+        Get the current sequence number of the segment.
+
+        The sequence number is even when the segment is consistent and increases by two with every publish.
+
+        :return: The sequence number.
+        """
+        seq: int = SEQUENCE.unpack_from(self._memory.buf, 0)[0]
+        return seq
+
+    def read(self, timeout: float = 0.1) -> Optional[BoardSnapshot]:
+        """
+        Read a consistent snapshot from the segment.
+
+        :param timeout: The number of seconds to keep retrying while the writer is mid-publish.
+        :return: The snapshot, or None if no consistent snapshot could be read in time.
+        """
+        buf = self._memory.buf
+        num_cells = self._cols * self._rows
+        deadline = time.monotonic() + timeout
+
+        while True:
+            seq_before = self.get_sequence()
+
+            if seq_before % 2 == 0:
+                _, cols, rows, tick, score, food_x, food_y, body_length = HEADER.unpack_from(buf, 0)
+                cells = bytes(buf[HEADER.size:HEADER.size + num_cells])
+
+                body_offset = HEADER.size + num_cells
+                body_array = array("i", bytes(buf[body_offset:body_offset + min(body_length, num_cells) * BODY_CELL.size]))
+
+                if self.get_sequence() == seq_before:
+                    body = tuple((body_array[i], body_array[i + 1]) for i in range(0, len(body_array), 2))
+                    food: Optional[Cell] = (food_x, food_y) if food_x >= 0 else None
+                    return BoardSnapshot(cols, rows, cells, body, food, score, tick)
+
+            if time.monotonic() >= deadline:
+                return None
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory segment.
+        """
+        self._memory.close()
@@ -0,0 +1,363 @@
+"""
+This module is responsible for containing the simulation: the board, the world and the systems that advance them
+every tick, independent of any window or input device.
+"""
+from typing import Callable, List, Optional
+import gc
+import random
+
+from GameStateManager import GameStateManager
+from World import World
+from Level import Level
+from GameObject import GameObject, Snake
+from Grid import Grid
+from ChunkedGrid import ChunkedGrid
+from BoardSnapshot import BoardSnapshot
+from Autopilot import WALL_TABLE, Planner
+from Scheduler import SystemScheduler
+from System import MovementSystem, AiFollowSystem, CollisionSystem, FoodSpawnSystem, GridObjectSystem, PlayerControllerSystem, AutopilotSystem, TickPipelineSystem
+from Component import TransformComponent, PhysicsBodyComponent, PlayerControllerComponent, AiFollowComponent
+
+
+class Simulation:
+    """
+    The simulation is responsible for owning the game state and running every system that changes it.
+    """
+
+    def __init__(self, width: int, height: int, pixels_to_unit: int, planner: Optional[Planner] = None, chunked: bool = False, freeze_gc: bool = False, level: Optional[Level] = None, fused_pipeline: bool = False, scheduler_workers: int = 0, rng: Optional[random.Random] = None) -> None:
+        """
+        Create a new simulation.
+
+        :param width: The width of the board in pixels.
+        :param height: The height of the board in pixels.
+        :param pixels_to_unit: The size of a single cell in pixels.
+        :param planner: The planner the autopilot takes its moves from, if the autopilot can be used.
+        :param chunked: Whether to lay the board out on a sparse, chunked grid instead of a dense one.
+        :param freeze_gc: Whether to move the game objects out of reach of the garbage collector once they are created.
+        :param level: The level to lay the walls out from, defaults to walls around the perimeter of the board.
+        :param fused_pipeline: Whether to move, follow, index the grid and detect collisions in a single pass over the
+            game objects instead of one pass per system.
+        :param scheduler_workers: The number of threads to run the systems on through a scheduler that runs systems
+            without conflicting reads and writes at the same time, 0 to run them in a fixed order without one.
+        :param rng: The random number generator food is placed with, defaults to the one shared by the random module.
+        """
+        self._tick = 0
+        self._freeze_gc = freeze_gc
+
+        self._state = GameStateManager()
+
+        grid_x = int((width - (width // pixels_to_unit) * pixels_to_unit) / 2)
+        grid_y = int((height - (height // pixels_to_unit) * pixels_to_unit) / 2)
+        self._grid: Grid = ChunkedGrid(grid_x, grid_y, width, height, pixels_to_unit) if chunked else Grid(grid_x, grid_y, width, height, pixels_to_unit)
+
+        self._world = World(self._grid, self._state, level)
+
+        # Load the navigation tables along with the level, and build the tables the autopilot searches before it starts
+        # deciding, so neither the first food nor the first decision pays for them
+        nav = self._world.get_level().get_nav()
+        if planner:
+            nav.prepare()
+
+        self._food_spawn_system = FoodSpawnSystem(self._grid, self._world, [], rng)
+        self._grid_object_system = GridObjectSystem(self._grid, [[TransformComponent]])
+        self._player_controller_system = PlayerControllerSystem([[PlayerControllerComponent, PhysicsBodyComponent]])
+        self._movement_system = MovementSystem(grid_x, grid_y, pixels_to_unit, [[TransformComponent, PhysicsBodyComponent]])
+        self._event_bus = self._world.get_event_bus()
+        self._collisions_system = CollisionSystem([[PhysicsBodyComponent, TransformComponent]], self._event_bus)
+        self._follow_system = AiFollowSystem([[AiFollowComponent, TransformComponent]])
+
+        self._tick_pipeline_system: Optional[TickPipelineSystem] = None
+        if fused_pipeline:
+            self._tick_pipeline_system = TickPipelineSystem(self._grid, self._world, grid_x, grid_y, self._collisions_system)
+
+        # Whether the pipeline indexed the grid as it moved the game objects during the last tick
+        self._pipeline_indexed = False
+
+        self._autopilot_enabled = False
+        self._autopilot_system: Optional[AutopilotSystem] = None
+        if planner:
+            self._autopilot_system = AutopilotSystem(planner, self.get_tick, [[PlayerControllerComponent, PhysicsBodyComponent]])
+
+        self._scheduler: Optional[SystemScheduler] = None
+        if scheduler_workers:
+            if fused_pipeline:
+                raise ValueError("The fused pipeline runs its systems in a single pass, it cannot be scheduled.")
+
+            steering = [self._player_controller_system] + ([self._autopilot_system] if self._autopilot_system else [])
+            self._scheduler = SystemScheduler([self._food_spawn_system, *steering, self._movement_system, self._follow_system, self._collisions_system], scheduler_workers)
+            self._update_steering()
+
+        self._snapshot_listeners: List[Callable[[BoardSnapshot], None]] = []
+        self._tick_listeners: List[Callable[[], None]] = []
+
+        # The grid is indexed at the end of every tick, so it is only rebuilt before a tick when game objects were
+        # added or removed in between, such as when the world is reset
+        self._grid_dirty = True
+        self._world.subscribe("added", lambda game_object: self._mark_grid_dirty())
+        self._world.subscribe("removed", self._on_removed)
+
+        # Game objects live for most of a game, so the collector gains little from scanning them again and again.
+        # Snakes reference themselves through their list of segments, so once they are removed they can only be
+        # reclaimed by a collection, which is done the next time the world is frozen
+        self._frozen_garbage = False
+        if freeze_gc:
+            self._freeze()
+
+    def step(self) -> None:
+        """
+        Advance the simulation by a single tick.
+        """
+        objects = self._world.get_game_objects()
+
+        if self._grid_dirty:
+            self._index_grid()
+
+            # Keep game objects created since the last tick, such as new segments, out of the young generation too
+            if self._freeze_gc:
+                self._freeze()
+
+        # Every state change made during the tick is announced once, when the tick is over
+        with self._state.batch():
+            if self._scheduler:
+                self._scheduler.run(objects)
+            else:
+                self._run_systems(objects)
+
+            # Collisions are queued while the systems run, and eat food or defeat the player once every system is done
+            self._event_bus.dispatch()
+
+        # Index the grid with the positions at the end of the tick, which are also the positions at the start of the
+        # next tick, so the grid is current both for rendering and for the next tick's systems. The pipeline indexes
+        # the grid as it goes, which is only out of date if collisions added or removed game objects
+        pipeline = self._tick_pipeline_system
+
+        if self._pipeline_indexed and pipeline and not pipeline.is_stale():
+            self._grid_dirty = False
+        else:
+            self._index_grid()
+
+        self._tick += 1
+
+        for tick_listener in self._tick_listeners:
+            tick_listener()
+
+        if self._snapshot_listeners or self._autopilot_enabled:
+            snapshot = self.snapshot()
+
+            for listener in self._snapshot_listeners:
+                listener(snapshot)
+
+            if self._autopilot_enabled and self._autopilot_system:
+                self._autopilot_system.submit(snapshot)
+
+    def _run_systems(self, objects: List[GameObject]) -> None:
+        """
+        Run every system in a fixed order, or through the fused pipeline if it can take the game objects.
+
+        :param objects: The game objects in the world.
+        """
+        pipeline = self._tick_pipeline_system
+        self._food_spawn_system.process(objects)
+
+        # The pipeline does the work of every system after steering in one pass, so steering only needs to look at the
+        # game objects it steers
+        fused = pipeline is not None and pipeline.prepare(objects)
+        steered = pipeline.get_controlled() if pipeline and fused else objects
+
+        if self._autopilot_enabled and self._autopilot_system:
+            self._autopilot_system.process(steered)
+        else:
+            self._player_controller_system.process(steered)
+
+        if pipeline and fused:
+            pipeline.process(objects)
+        else:
+            self._movement_system.process(objects)
+            self._follow_system.process(objects)
+            self._collisions_system.process(objects)
+
+        self._pipeline_indexed = bool(pipeline and fused)
+
+    def _index_grid(self) -> None:
+        """
+        Rebuild the grid from the current positions of every game object.
+        """
+        self._grid.clear_all()
+        self._grid_object_system.process(self._world.get_game_objects())
+        self._grid_dirty = False
+
+    def _on_removed(self, game_object: GameObject) -> None:
+        """
+        Handle a game object being removed from the world.
+
+        :param game_object: The removed game object.
+        """
+        self._grid_dirty = True
+
+        if isinstance(game_object, Snake):
+            self._frozen_garbage = True
+
+    def _freeze(self) -> None:
+        """
+        Move every object that is alive out of reach of the garbage collector, collecting first if removed game
+        objects may have left cycles behind in the frozen objects.
+        """
+        if self._frozen_garbage or not gc.get_freeze_count():
+            gc.unfreeze()
+            gc.collect()
+            self._frozen_garbage = False
+
+        gc.freeze()
+
+    def _mark_grid_dirty(self) -> None:
+        """
+        Mark the grid as out of date with the game objects in the world.
+        """
+        self._grid_dirty = True
+
+    @classmethod
+    def from_snapshot(cls, snapshot: BoardSnapshot, pixels_to_unit: int = 32, rng: Optional[random.Random] = None, fused_pipeline: bool = False) -> "Simulation":
+        """
+        Create a headless simulation that plays on from the board of a snapshot.
+
+        :param snapshot: The snapshot to start from.
+        :param pixels_to_unit: The size of a single cell in pixels.
+        :param rng: The random number generator food is placed with, defaults to the one shared by the random module.
+        :param fused_pipeline: Whether to run each tick in a single pass over the game objects.
+        :return: The simulation.
+        """
+        cols, rows = snapshot.get_cols(), snapshot.get_rows()
+        body = snapshot.get_body()
+        level = snapshot.get_level() or Level.from_walls(cols, rows, snapshot.get_cells().translate(WALL_TABLE), body[0] if body else (1, 1))
+
+        simulation = cls(cols * pixels_to_unit, rows * pixels_to_unit, pixels_to_unit, level=level, fused_pipeline=fused_pipeline, rng=rng)
+        simulation.restore(snapshot)
+        return simulation
+
+    def restore(self, snapshot: BoardSnapshot) -> None:
+        """
+        Put the board back the way it was in a snapshot, which must be of a board with the same size and walls.
+
+        :param snapshot: The snapshot to restore.
+        """
+        self._world.restore(snapshot.get_body(), snapshot.get_food(), snapshot.get_score())
+        self._tick = snapshot.get_tick()
+
+    def snapshot(self) -> BoardSnapshot:
+        """
+        Take a snapshot of the board as it is now.
+
+        :return: A snapshot of the board.
+        """
+        return BoardSnapshot.capture(self._grid, self._world, self._tick)
+
+    def add_snapshot_listener(self, listener: Callable[[BoardSnapshot], None]) -> None:
+        """
+        Subscribe a listener to the snapshot taken at the end of every tick.
+
+        :param listener: The listener to call with every snapshot.
+        """
+        self._snapshot_listeners.append(listener)
+
+    def add_tick_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Subscribe a listener to the end of every tick.
+
+        Unlike snapshot listeners, tick listeners do not cause a snapshot to be taken.
+
+        :param listener: The listener to call at the end of every tick.
+        """
+        self._tick_listeners.append(listener)
+
+    def set_autopilot_enabled(self, enabled: bool) -> None:
+        """
+        Switch between steering with the player controller and steering with the autopilot.
+
+        :param enabled: Whether the autopilot steers the snake.
+        """
+        self._autopilot_enabled = enabled and self._autopilot_system is not None
+        self._update_steering()
+
+        if self._autopilot_system:
+            self._autopilot_system.reset()
+
+    def _update_steering(self) -> None:
+        """
+        Switch the scheduled steering systems over to the one that currently steers the snake, if scheduling.
+        """
+        if self._scheduler:
+            self._scheduler.set_enabled(self._player_controller_system, not self._autopilot_enabled)
+
+            if self._autopilot_system:
+                self._scheduler.set_enabled(self._autopilot_system, self._autopilot_enabled)
+
+    def is_autopilot_enabled(self) -> bool:
+        """
+        Check if the autopilot steers the snake.
+
+        :return: True if the autopilot steers the snake, otherwise False.
+        """
+        return self._autopilot_enabled
+
+    def get_autopilot_system(self) -> Optional[AutopilotSystem]:
+        """
+        Get the autopilot system, if the simulation was given a planner.
+
+        :return: The autopilot system.
+        """
+        return self._autopilot_system
+
+    def get_player_controller_system(self) -> PlayerControllerSystem:
+        """
+        Get the system that steers the snake with the keyboard.
+
+        :return: The player controller system.
+        """
+        return self._player_controller_system
+
+    def get_scheduler(self) -> Optional[SystemScheduler]:
+        """
+        Get the scheduler the systems run through, if scheduling.
+
+        :return: The scheduler.
+        """
+        return self._scheduler
+
+    def close(self) -> None:
+        """
+        Release any threads held by the simulation.
+        """
+        if self._scheduler:
+            self._scheduler.close()
+
+    def get_tick(self) -> int:
+        """
+        Get the number of ticks the simulation has run for.
+
+        :return: The number of ticks.
+        """
+        return self._tick
+
+    def get_grid(self) -> Grid:
+        """
+        Get the grid of the simulation.
+
+        :return: The grid.
+        """
+        return self._grid
+
+    def get_world(self) -> World:
+        """
+        Get the world of the simulation.
+
+        :return: The world.
+        """
+        return self._world
+
+    def get_state(self) -> GameStateManager:
+        """
+        Get the game state of the simulation.
+
+        :return: The game state.
+        """
+        return self._state
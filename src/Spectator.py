@@ -0,0 +1,628 @@
+"""
+This module is responsible for streaming the game to spectators over a local socket.
+
+Every tick is sent as a small delta frame describing how the snake, food, score and status changed. Keyframes with the
+full board are sent periodically, and a spectator joining mid-game receives the latest keyframe followed by every delta
+since, so it can rebuild the board without waiting for the next keyframe.
+
+Every frame is a little-endian uint32 length followed by the frame itself. A frame starts with a type byte (b"K" for a
+keyframe, b"D" for a delta) and the uint32 tick it describes.
+"""
+from collections import deque
+from queue import SimpleQueue, Empty
+from typing import Deque, Dict, List, Optional, Tuple
+import os
+import selectors
+import socket
+import struct
+import threading
+import zlib
+
+from BoardSnapshot import Cell
+from Component import TransformComponent
+from GameObject import GameObject, Food
+from GameStateManager import SCORE as SCORE_STATE, STATUS as STATUS_STATE
+from Simulation import Simulation
+
+LENGTH = struct.Struct("<I")
+FRAME_HEADER = struct.Struct("<cI")
+
+# cols, rows, score, status, food_x, food_y, body_length, followed by the body cells and the zlib compressed cells
+KEYFRAME = struct.Struct("<HHIBhhI")
+DELTA_FLAGS = struct.Struct("<B")
+CELL = struct.Struct("<hh")
+POP_COUNT = struct.Struct("<H")
+SCORE = struct.Struct("<I")
+STATUS = struct.Struct("<B")
+
+# Delta flags, in the order their fields appear in a delta frame
+PUSH_HEAD = 1
+POP_TAIL = 2
+APPEND_TAIL = 4
+FOOD_CHANGED = 8
+SCORE_CHANGED = 16
+STATUS_CHANGED = 32
+
+STATUS_CODES = {"in-game": 0, "game-over": 1}
+
+
+def unpack_cell(frame: bytes, offset: int) -> Cell:
+    """
+    Read a cell out of a frame.
+
+    :param frame: The frame to read from.
+    :param offset: The offset of the cell in the frame.
+    :return: The cell.
+    """
+    x, y = CELL.unpack_from(frame, offset)
+    return int(x), int(y)
+
+
+def listen(address: str) -> Tuple[socket.socket, Optional[str]]:
+    """
+    Open a non-blocking listening socket.
+
+    :param address: Either "unix:<path>" for a Unix socket or "<host>:<port>" for a TCP socket.
+    :return: The listening socket, and the path of the Unix socket to remove once it is closed, if it is one.
+    """
+    unix_path: Optional[str] = None
+
+    if address.startswith("unix:"):
+        unix_path = address[len("unix:"):]
+
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(unix_path)
+    else:
+        host, port = address.rsplit(":", 1)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((host, int(port)))
+
+    listener.listen()
+    listener.setblocking(False)
+
+    return listener, unix_path
+
+
+class ChangeFeed:
+    """
+    The change feed is responsible for turning every tick of a simulation into a spectator frame.
+
+    The feed mirrors the snake's body and only looks at the head, the tail and the body length each tick, so building
+    a delta costs the same regardless of the size of the board or the length of the snake.
+    """
+
+    def __init__(self, simulation: Simulation, keyframe_interval: int = 100) -> None:
+        """
+        Create a new change feed.
+
+        :param simulation: The simulation to describe.
+        :param keyframe_interval: The number of ticks between keyframes.
+        """
+        self._simulation = simulation
+        self._keyframe_interval = keyframe_interval
+        self._cell_size = simulation.get_grid().get_cell_size()
+
+        self._body: Deque[Cell] = deque()
+        self._food: Optional[Cell] = None
+        self._sent_food: Optional[Cell] = None
+        self._score = 0
+        self._status = 0
+
+        simulation.get_world().subscribe("added", self._on_added)
+        simulation.get_world().subscribe("removed", self._on_removed)
+
+    def _cell_of(self, game_object: GameObject) -> Cell:
+        """
+        Get the cell a game object is in.
+
+        :param game_object: The game object.
+        :return: The cell of the game object.
+        """
+        transform_component = game_object.get_component(TransformComponent)
+
+        if transform_component is None:
+            return (-1, -1)
+
+        return int(transform_component.x // self._cell_size), int(transform_component.y // self._cell_size)
+
+    def _on_added(self, game_object: GameObject) -> None:
+        """
+        Track food being spawned.
+
+        :param game_object: The game object that was added.
+        """
+        if isinstance(game_object, Food):
+            self._food = self._cell_of(game_object)
+
+    def _on_removed(self, game_object: GameObject) -> None:
+        """
+        Track food being eaten.
+
+        :param game_object: The game object that was removed.
+        """
+        if isinstance(game_object, Food):
+            self._food = None
+
+    def next_frame(self) -> Tuple[bytes, bool]:
+        """
+        Build the frame for the tick that just ran.
+
+        :return: The frame and whether it is a keyframe.
+        """
+        if (self._simulation.get_tick() - 1) % self._keyframe_interval == 0:
+            return self.keyframe(), True
+
+        return self.delta(), False
+
+    def keyframe(self) -> bytes:
+        """
+        Build a keyframe describing the whole board, and resynchronise the body mirror with it.
+
+        :return: The keyframe.
+        """
+        snapshot = self._simulation.snapshot()
+        state = self._simulation.get_state()
+
+        self._body = deque(snapshot.get_body())
+        self._food = snapshot.get_food()
+        self._sent_food = self._food
+        self._score = snapshot.get_score()
+        self._status = STATUS_CODES.get(state.get_state(STATUS_STATE), 0)
+
+        food = self._food or (-1, -1)
+        body = b"".join(CELL.pack(x, y) for x, y in self._body)
+
+        return b"".join((
+            FRAME_HEADER.pack(b"K", snapshot.get_tick()),
+            KEYFRAME.pack(snapshot.get_cols(), snapshot.get_rows(), self._score, self._status, food[0], food[1], len(self._body)),
+            body,
+            zlib.compress(snapshot.get_cells(), 1),
+        ))
+
+    def delta(self) -> bytes:
+        """
+        Build a delta describing what changed since the previous frame.
+
+        :return: The delta.
+        """
+        world = self._simulation.get_world()
+        state = self._simulation.get_state()
+        body = self._body
+
+        flags = 0
+        fields: List[bytes] = []
+
+        segments = world.get_player().get_segments() if world.get_game_objects() else []
+        length = len(segments)
+
+        # The head moves into a new cell ...
+        if segments:
+            head = self._cell_of(segments[0])
+
+            if not body or body[0] != head:
+                body.appendleft(head)
+                flags |= PUSH_HEAD
+                fields.append(CELL.pack(*head))
+
+        # ... the tail leaves its old cell, unless the snake grew or the world was emptied ...
+        pops = 0
+        tail = self._cell_of(segments[-1]) if segments else None
+
+        while len(body) > length or (tail is not None and len(body) == length and body[-1] != tail):
+            body.pop()
+            pops += 1
+
+        if pops:
+            flags |= POP_TAIL
+            fields.append(POP_COUNT.pack(pops))
+
+        # ... and a new segment appears on top of the tail after eating.
+        if tail is not None and len(body) < length:
+            body.append(tail)
+            flags |= APPEND_TAIL
+            fields.append(CELL.pack(*tail))
+
+        score = state.get_state(SCORE_STATE)
+        status = STATUS_CODES.get(state.get_state(STATUS_STATE), 0)
+
+        if self._food != self._sent_food:
+            self._sent_food = self._food
+            flags |= FOOD_CHANGED
+            fields.append(CELL.pack(*(self._food or (-1, -1))))
+
+        if score != self._score:
+            self._score = score
+            flags |= SCORE_CHANGED
+            fields.append(SCORE.pack(score))
+
+        if status != self._status:
+            self._status = status
+            flags |= STATUS_CHANGED
+            fields.append(STATUS.pack(status))
+
+        return FRAME_HEADER.pack(b"D", self._simulation.get_tick()) + DELTA_FLAGS.pack(flags) + b"".join(fields)
+
+
+class SpectatorServer:
+    """
+    The spectator server is responsible for fanning frames out to every connected spectator.
+
+    The game loop only pushes each frame onto a queue; accepting spectators, buffering and writing to their sockets all
+    happen on a background thread. Spectators that fall too far behind are disconnected rather than slowing the game.
+    """
+
+    def __init__(self, address: str, max_buffer: int = 1 << 20) -> None:
+        """
+        Create a new spectator server and start listening.
+
+        :param address: Either "unix:<path>" for a Unix socket or "<host>:<port>" for a TCP socket.
+        :param max_buffer: The number of bytes a spectator may fall behind by before it is disconnected.
+        """
+        self._max_buffer = max_buffer
+        self._listener, self._unix_path = listen(address)
+
+        self._frames: 'SimpleQueue[Optional[Tuple[bytes, bool]]]' = SimpleQueue()
+        self._keyframe = b""
+        self._since_keyframe: List[bytes] = []
+        self._clients: Dict[socket.socket, bytearray] = {}
+
+        # Lets the game loop wake the server thread without waiting for its select timeout
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+
+        self._thread = threading.Thread(target=self._run, name="spectator-server", daemon=True)
+        self._thread.start()
+
+    def get_address(self) -> str:
+        """
+        Get the address spectators can connect to.
+
+        :return: The address of the server.
+        """
+        if self._unix_path is not None:
+            return f"unix:{self._unix_path}"
+
+        host, port = self._listener.getsockname()
+        return f"{host}:{port}"
+
+    def get_num_clients(self) -> int:
+        """
+        Get the number of connected spectators.
+
+        :return: The number of connected spectators.
+        """
+        return len(self._clients)
+
+    def publish(self, frame: bytes, keyframe: bool) -> None:
+        """
+        Queue a frame to be sent to every spectator.
+
+        :param frame: The frame to send.
+        :param keyframe: Whether the frame is a keyframe.
+        """
+        self._frames.put((frame, keyframe))
+
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self) -> None:
+        """
+        Disconnect every spectator and stop the server.
+        """
+        self._frames.put(None)
+
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+        self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        """
+        Accept spectators and write queued frames to them until the server is closed.
+        """
+        running = True
+
+        while running:
+            for key, events in self._selector.select(timeout=0.5):
+                connection = key.fileobj
+
+                if connection is self._listener:
+                    self._accept()
+                elif connection is self._wake_reader:
+                    try:
+                        while self._wake_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif isinstance(connection, socket.socket):
+                    if events & selectors.EVENT_READ:
+                        self._read(connection)
+                    if events & selectors.EVENT_WRITE and connection in self._clients:
+                        self._flush(connection)
+
+            running = self._drain_frames()
+
+        for connection in list(self._clients):
+            self._disconnect(connection)
+
+        self._selector.close()
+        self._listener.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.unlink(self._unix_path)
+
+    def _drain_frames(self) -> bool:
+        """
+        Move every queued frame into the buffers of the connected spectators.
+
+        :return: False once the server has been asked to close, otherwise True.
+        """
+        while True:
+            try:
+                item = self._frames.get_nowait()
+            except Empty:
+                return True
+
+            if item is None:
+                return False
+
+            frame, keyframe = item
+            packet = LENGTH.pack(len(frame)) + frame
+
+            if keyframe:
+                self._keyframe = packet
+                self._since_keyframe.clear()
+            else:
+                self._since_keyframe.append(packet)
+
+            for connection in list(self._clients):
+                self._send(connection, packet)
+
+    def _accept(self) -> None:
+        """
+        Accept a new spectator and catch it up with the latest keyframe and every delta since.
+        """
+        try:
+            connection, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+
+        connection.setblocking(False)
+        self._clients[connection] = bytearray()
+        self._selector.register(connection, selectors.EVENT_READ)
+
+        if self._keyframe:
+            self._send(connection, self._keyframe + b"".join(self._since_keyframe))
+
+    def _read(self, connection: socket.socket) -> None:
+        """
+        Discard anything a spectator sends, disconnecting it once it hangs up.
+
+        :param connection: The spectator's socket.
+        """
+        try:
+            if not connection.recv(4096):
+                self._disconnect(connection)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._disconnect(connection)
+
+    def _send(self, connection: socket.socket, packet: bytes) -> None:
+        """
+        Buffer a packet for a spectator and write as much of it as the socket accepts.
+
+        :param connection: The spectator's socket.
+        :param packet: The packet to send.
+        """
+        buffer = self._clients[connection]
+
+        if len(buffer) + len(packet) > self._max_buffer:
+            self._disconnect(connection)
+            return
+
+        buffer += packet
+        self._flush(connection)
+
+    def _flush(self, connection: socket.socket) -> None:
+        """
+        Write a spectator's buffered bytes, waiting for the socket to become writable if it is full.
+
+        :param connection: The spectator's socket.
+        """
+        buffer = self._clients[connection]
+
+        try:
+            sent = connection.send(buffer)
+            del buffer[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._disconnect(connection)
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if buffer else 0)
+        self._selector.modify(connection, events)
+
+    def _disconnect(self, connection: socket.socket) -> None:
+        """
+        Disconnect a spectator.
+
+        :param connection: The spectator's socket.
+        """
+        if connection in self._clients:
+            del self._clients[connection]
+            self._selector.unregister(connection)
+            connection.close()
+
+
+class SpectatorView:
+    """
+    The spectator view is responsible for rebuilding the board on the spectator's side from a stream of frames.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a new, empty spectator view. Deltas are ignored until the first keyframe arrives.
+        """
+        self._tick = -1
+        self._cols = 0
+        self._rows = 0
+        self._cells = b""
+        self._body: Deque[Cell] = deque()
+        self._food: Optional[Cell] = None
+        self._score = 0
+        self._status = 0
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> int:
+        """
+        Apply every complete frame in a chunk of bytes read from the server.
+
+        :param data: The bytes read from the server.
+        :return: The number of frames applied.
+        """
+        self._buffer += data
+        applied = 0
+
+        while len(self._buffer) >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(self._buffer, 0)
+
+            if len(self._buffer) < LENGTH.size + length:
+                break
+
+            frame = bytes(self._buffer[LENGTH.size:LENGTH.size + length])
+            del self._buffer[:LENGTH.size + length]
+
+            self.apply(frame)
+            applied += 1
+
+        return applied
+
+    def apply(self, frame: bytes) -> None:
+        """
+        Apply a single frame.
+
+        :param frame: The frame, without its length prefix.
+        """
+        frame_type, tick = FRAME_HEADER.unpack_from(frame, 0)
+        offset = FRAME_HEADER.size
+
+        if frame_type == b"K":
+            self._cols, self._rows, self._score, self._status, food_x, food_y, body_length = KEYFRAME.unpack_from(frame, offset)
+            offset += KEYFRAME.size
+
+            self._body = deque(unpack_cell(frame, offset + i * CELL.size) for i in range(body_length))
+            offset += body_length * CELL.size
+
+            self._cells = zlib.decompress(frame[offset:])
+            self._food = (food_x, food_y) if food_x >= 0 else None
+            self._tick = tick
+            return
+
+        if self._tick < 0:
+            return
+
+        (flags,) = DELTA_FLAGS.unpack_from(frame, offset)
+        offset += DELTA_FLAGS.size
+
+        if flags & PUSH_HEAD:
+            self._body.appendleft(unpack_cell(frame, offset))
+            offset += CELL.size
+
+        if flags & POP_TAIL:
+            (pops,) = POP_COUNT.unpack_from(frame, offset)
+            offset += POP_COUNT.size
+
+            for _ in range(min(pops, len(self._body))):
+                self._body.pop()
+
+        if flags & APPEND_TAIL:
+            self._body.append(unpack_cell(frame, offset))
+            offset += CELL.size
+
+        if flags & FOOD_CHANGED:
+            food_x, food_y = CELL.unpack_from(frame, offset)
+            offset += CELL.size
+            self._food = (food_x, food_y) if food_x >= 0 else None
+
+        if flags & SCORE_CHANGED:
+            (self._score,) = SCORE.unpack_from(frame, offset)
+            offset += SCORE.size
+
+        if flags & STATUS_CHANGED:
+            (self._status,) = STATUS.unpack_from(frame, offset)
+            offset += STATUS.size
+
+        self._tick = tick
+
+    def get_tick(self) -> int:
+        """
+        Get the tick of the last applied frame.
+
+        :return: The tick, or -1 if no keyframe has arrived yet.
+        """
+        return self._tick
+
+    def get_size(self) -> Tuple[int, int]:
+        """
+        Get the number of columns and rows on the board.
+
+        :return: The number of columns and rows.
+        """
+        return self._cols, self._rows
+
+    def get_cells(self) -> bytes:
+        """
+        Get the cell codes of the board as of the last keyframe, row-major.
+
+        :return: The cell codes.
+        """
+        return self._cells
+
+    def get_body(self) -> Tuple[Cell, ...]:
+        """
+        Get the cells of the snake, starting with the head.
+
+        :return: The cells of the snake.
+        """
+        return tuple(self._body)
+
+    def get_food(self) -> Optional[Cell]:
+        """
+        Get the cell of the food.
+
+        :return: The cell of the food, or None if there is no food.
+        """
+        return self._food
+
+    def get_score(self) -> int:
+        """
+        Get the score.
+
+        :return: The score.
+        """
+        return self._score
+
+    def get_status(self) -> int:
+        """
+        Get the game status code, 0 while in-game and 1 once the game is over.
+
+        :return: The status code.
+        """
+        return self._status
@@ -0,0 +1,54 @@
+"""
+This module is responsible for measuring how long each phase of startup takes, up to the first tick.
+"""
+from typing import List, Tuple
+import time
+
+
+class StartupReport:
+    """
+    The startup report is responsible for recording the moment each startup phase finishes.
+    """
+
+    def __init__(self, origin: float) -> None:
+        """
+        Create a new startup report.
+
+        :param origin: The time.perf_counter() value startup began at.
+        """
+        self._origin = origin
+        self._marks: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        """
+        Record that a startup phase has just finished.
+
+        :param phase: The name of the phase.
+        """
+        self._marks.append((phase, time.perf_counter()))
+
+    def get_total_ms(self) -> float:
+        """
+        Get the time from the origin to the last recorded phase.
+
+        :return: The total startup time in milliseconds.
+        """
+        if not self._marks:
+            return 0.0
+
+        return (self._marks[-1][1] - self._origin) * 1000
+
+    def format(self) -> str:
+        """
+        Format the report as a table of phases, the time each took and the time since the origin.
+
+        :return: The formatted report.
+        """
+        lines = [f"{'phase':<24}{'took (ms)':>12}{'at (ms)':>12}"]
+        last = self._origin
+
+        for phase, at in self._marks:
+            lines.append(f"{phase:<24}{(at - last) * 1000:>12.2f}{(at - self._origin) * 1000:>12.2f}")
+            last = at
+
+        return "\n".join(lines)
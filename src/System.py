@@ -1,17 +1,47 @@
-from typing import List, Type, Dict
+from typing import Any, Callable, ClassVar, FrozenSet, Iterable, List, Type, Dict, Optional, Set, Tuple, TYPE_CHECKING, Union
 from abc import ABC
+from itertools import islice
 import random
+import threading
 
-import pygame
-
-from PygameEventManager import PygameEventManager
-from GameObject import GameObject, Food
+import Keys
+from GameObject import GameObject, Food, Wall, WALL_COLOR
 from Component import Component, BoxSpriteComponent, CircleSpriteComponent, TransformComponent, PhysicsBodyComponent, PlayerControllerComponent, AiFollowComponent
 from Grid import Grid
+from Level import Level
 from World import World
+from BoardSnapshot import BoardSnapshot
+from Autopilot import Planner, safe_fallback_direction
+from Camera import Camera
+from EventBus import EventBus
+from EventSystem import Collision
+
+# pygame is only needed to render and read the keyboard, headless runs never import it.
+if TYPE_CHECKING:
+    import pygame
+    from DrawSnapshot import DrawSnapshot
+    from PygameEventManager import PygameEventManager
+
+
+# Shared state that systems read and write besides components. Every system is handed the game objects of the world,
+# so every system reads the world
+WORLD = "world"
+GRID = "grid"
+STATE = "state"
+SCREEN = "screen"
+PLANNER = "planner"
+KEYBOARD = "keyboard"
+EVENTS = "events"
+
+Resource = Union[Type[Component], str]
 
 
 class System(ABC):
+    # The components and shared state the system reads and writes, so a scheduler can tell which systems may run at
+    # the same time. Two systems conflict if either writes something the other reads or writes
+    READS: ClassVar[FrozenSet[Resource]] = frozenset()
+    WRITES: ClassVar[FrozenSet[Resource]] = frozenset()
+
     def __init__(self, component_lists: List[List[Type[Component]]]):
         """
         Create a new system.
@@ -20,22 +50,56 @@ class System(ABC):
         """
         self._component_lists = component_lists
 
+        # Reused by every call to _filter_objects, so filtering does not allocate a new list every tick. It is
+        # overwritten and then truncated rather than emptied, so it also keeps its storage between ticks
+        self._filtered_entities: List[GameObject] = []
+
     def _filter_objects(self, game_objects: List[GameObject]) -> List[GameObject]:
         """
         Filter a list of game objects by the components they have.
 
+        The returned list is reused by the next call, so it must not be kept past the end of the process call.
+
         :param game_objects: The list of game objects to filter.
         :return: A list of game objects guaranteed to have the required components.
         """
-        filtered_entities = []
+        filtered_entities = self._filtered_entities
+        capacity = len(filtered_entities)
+        count = 0
 
         for entity in game_objects:
             for component_list in self._component_lists:
-                if all(isinstance(entity.get_component(component), component) for component in component_list):
-                    filtered_entities.append(entity)
+                for component in component_list:
+                    if not isinstance(entity.get_component(component), component):
+                        break
+                else:
+                    if count < capacity:
+                        filtered_entities[count] = entity
+                    else:
+                        filtered_entities.append(entity)
+
+                    count += 1
+
+        del filtered_entities[count:]
 
         return filtered_entities
 
+    def get_reads(self) -> FrozenSet[Resource]:
+        """
+        Get the components and shared state the system reads.
+
+        :return: The components and shared state read, including the world.
+        """
+        return self.READS | {WORLD}
+
+    def get_writes(self) -> FrozenSet[Resource]:
+        """
+        Get the components and shared state the system writes.
+
+        :return: The components and shared state written.
+        """
+        return self.WRITES
+
     def process(self, game_objects: List[GameObject]) -> None:
         """
         Process a list of game objects.
@@ -46,18 +110,28 @@ class System(ABC):
 
 
 class RenderingSystem(System):
-    def __init__(self, screen: pygame.Surface, component_lists: List[List[Type[Component]]]):
+    READS = frozenset({TransformComponent, BoxSpriteComponent, CircleSpriteComponent, GRID})
+    WRITES = frozenset({SCREEN})
+
+    def __init__(self, screen: 'pygame.Surface', component_lists: List[List[Type[Component]]], camera: Optional[Camera] = None, grid: Optional[Grid] = None):
         """
         Create a new rendering system.
 
         The rendering system is responsible for rendering all the sprites of game objects based on their
         transform_component and sprite_component.
 
+        When given a camera and a grid, only the game objects in the cells the camera can see are rendered, using the
+        grid as a spatial index, so the cost of rendering depends on the size of the window rather than the board.
+
         :param screen: The screen to render to.
         :param component_lists: A list of lists of components that the system requires before processing occurs.
+        :param camera: The camera to render through, if the board does not fit in the window.
+        :param grid: The grid to look up visible game objects in, required alongside a camera.
         """
         super().__init__(component_lists)
         self._screen = screen
+        self._camera = camera
+        self._grid = grid
 
     def process(self, game_objects: List[GameObject]) -> None:
         """
@@ -65,6 +139,10 @@ class RenderingSystem(System):
 
         :param game_objects: The list of game objects to render.
         """
+        if self._camera and self._grid:
+            self._process_visible()
+            return
+
         for entity in self._filter_objects(game_objects):
             transform_component = entity.get_component(TransformComponent)
             render_component = entity.get_component(BoxSpriteComponent) or entity.get_component(CircleSpriteComponent)
@@ -73,8 +151,214 @@ class RenderingSystem(System):
                 x, y = transform_component.x, transform_component.y
                 render_component.draw(self._screen, x, y)
 
+    def draw_snapshot(self, snapshot: 'DrawSnapshot') -> None:
+        """
+        Render the sprites of a draw snapshot, offset by the position of the camera and limited to the cells it can
+        see if there is one.
+
+        Unlike process, this never touches a game object, so it can run while the simulation changes the world.
+
+        :param snapshot: The snapshot to render.
+        """
+        sprites = snapshot.get_sprites()
+        positions = snapshot.get_positions()
+
+        offset = snapshot.get_offset()
+
+        if not (self._camera and self._grid):
+            for index in range(len(sprites)):
+                sprites[index].draw(self._screen, positions[2 * index], positions[2 * index + 1])
+
+            return
+
+        # A snapshot captured through a camera only holds what it can see, so it is drawn as it is
+        if offset is not None:
+            camera_x, camera_y = offset
+
+            for index in range(len(sprites)):
+                sprites[index].draw(self._screen, positions[2 * index] - camera_x, positions[2 * index + 1] - camera_y)
+
+            return
+
+        head = snapshot.get_head()
+
+        if head:
+            self._camera.follow(*head)
+
+        cell_size = self._grid.get_cell_size()
+        camera_x, camera_y = self._camera.get_offset()
+        min_x, min_y, max_x, max_y = self._camera.get_visible_cells(cell_size, self._grid.get_num_cols(), self._grid.get_num_rows())
+
+        for index in range(len(sprites)):
+            x, y = positions[2 * index], positions[2 * index + 1]
+
+            if min_x <= x // cell_size < max_x and min_y <= y // cell_size < max_y:
+                sprites[index].draw(self._screen, x - camera_x, y - camera_y)
+
+    def _process_visible(self) -> None:
+        """
+        Render the game objects in the cells the camera can see, offset by the position of the camera.
+        """
+        if not (self._camera and self._grid):
+            return
+
+        get_cell = self._grid.get_cell
+        camera_x, camera_y = self._camera.get_offset()
+        min_x, min_y, max_x, max_y = self._camera.get_visible_cells(self._grid.get_cell_size(), self._grid.get_num_cols(), self._grid.get_num_rows())
+
+        for x in range(min_x, max_x):
+            for y in range(min_y, max_y):
+                cell = get_cell(x, y)
+
+                if cell is None:
+                    continue
+
+                for entity in cell:
+                    transform_component = entity.get_component(TransformComponent)
+                    render_component = entity.get_component(BoxSpriteComponent) or entity.get_component(CircleSpriteComponent)
+
+                    if transform_component and render_component:
+                        render_component.draw(self._screen, transform_component.x - camera_x, transform_component.y - camera_y)
+
+
+class PixelRenderingSystem(System):
+    READS = frozenset({TransformComponent, BoxSpriteComponent, CircleSpriteComponent, GRID})
+    WRITES = frozenset({SCREEN})
+
+    # The palette index of empty cells and of walls, every other color gets the next free index when first drawn
+    EMPTY = 0
+    WALL = 1
+
+    def __init__(self, screen: 'pygame.Surface', component_lists: List[List[Type[Component]]], grid: Grid, level: Level):
+        """
+        Create a new pixel rendering system.
+
+        The pixel rendering system is responsible for rendering the whole board with a single pixel per cell, in the
+        color of the sprite of the game object in it, scaled up (or down) to fit the screen.
+
+        Cells are written as bytes into a palettized surface the size of the board, starting from a copy of the walls
+        of the level, and the surface is scaled onto the screen in one go. Other than the game objects drawn, the cost
+        of a frame only depends on the number of cells, which are copied and scaled in bulk, so boards far larger than
+        the screen are drawn at interactive rates.
+
+        :param screen: The screen to render to.
+        :param component_lists: A list of lists of components that the system requires before processing occurs.
+        :param grid: The grid the board is laid out on.
+        :param level: The level the walls of the board are laid out from, drawn once up front.
+        """
+        import pygame
+
+        super().__init__(component_lists)
+        self._screen = screen
+        self._cell_size = grid.get_cell_size()
+        self._cols = cols = grid.get_num_cols()
+        self._rows = rows = grid.get_num_rows()
+
+        # The walls never move, so every frame starts from a copy of them
+        self._background = bytes(level.get_walls()).translate(bytes([self.EMPTY] + [self.WALL] * 255))
+        self._cells = bytearray(self._background)
+
+        # The board surface shares its pixels with the cells, so writing a cell writes the pixel
+        self._palette: List[Tuple[int, int, int]] = [(0, 0, 0)] * 256
+        self._palette[self.WALL] = WALL_COLOR
+        self._color_indices: Dict[Tuple[int, int, int], int] = {(0, 0, 0): self.EMPTY, WALL_COLOR: self.WALL}
+        self._board = pygame.image.frombuffer(self._cells, (cols, rows), "P")
+        self._board.set_palette(self._palette)
+
+        # The largest size that fits the screen without stretching, a whole number of pixels per cell when possible
+        screen_width, screen_height = screen.get_size()
+        scale = min(screen_width / cols, screen_height / rows)
+        scale = float(int(scale)) if scale >= 1 else scale
+        width, height = max(int(cols * scale), 1), max(int(rows * scale), 1)
+        self._offset = ((screen_width - width) // 2, (screen_height - height) // 2)
+
+        # Scaled into the same surface every frame instead of a new one
+        self._scaled = pygame.Surface((width, height), 0, 8)
+        self._scaled.set_palette(self._palette)
+
+    def process(self, game_objects: List[GameObject]) -> None:
+        """
+        Render all game objects that are drawable or renderable to the screen, bar the walls of the level.
+
+        :param game_objects: The list of game objects to render.
+        """
+        cells = self._cells
+        cells[:] = self._background
+
+        cols, rows = self._cols, self._rows
+        cell_size = self._cell_size
+
+        for entity in self._filter_objects(game_objects):
+            if isinstance(entity, Wall):
+                continue
+
+            transform_component = entity.get_component(TransformComponent)
+            render_component = entity.get_component(BoxSpriteComponent) or entity.get_component(CircleSpriteComponent)
+
+            if transform_component and render_component:
+                x, y = transform_component.x // cell_size, transform_component.y // cell_size
+
+                if 0 <= x < cols and 0 <= y < rows:
+                    cells[y * cols + x] = self._get_color_index(render_component.get_color())
+
+        self._present()
+
+    def draw_snapshot(self, snapshot: 'DrawSnapshot') -> None:
+        """
+        Render the sprites of a draw snapshot.
+
+        Unlike process, this never touches a game object, so it can run while the simulation changes the world.
+
+        :param snapshot: The snapshot to render.
+        """
+        cells = self._cells
+        cells[:] = self._background
+
+        cols, rows = self._cols, self._rows
+        cell_size = self._cell_size
+        sprites = snapshot.get_sprites()
+        positions = snapshot.get_positions()
+
+        for index in range(len(sprites)):
+            x, y = positions[2 * index] // cell_size, positions[2 * index + 1] // cell_size
+
+            if 0 <= x < cols and 0 <= y < rows:
+                cells[y * cols + x] = self._get_color_index(sprites[index].get_color())
+
+        self._present()
+
+    def _get_color_index(self, color: Tuple[int, int, int]) -> int:
+        """
+        Get the palette index of a color, adding the color to the palette of both surfaces if it is new.
+
+        :param color: The color.
+        :return: The palette index of the color, or the last one once the palette is full.
+        """
+        index = self._color_indices.get(color)
+
+        if index is None:
+            index = min(len(self._color_indices), len(self._palette) - 1)
+            self._color_indices[color] = index
+            self._palette[index] = color
+            self._board.set_palette_at(index, color)
+            self._scaled.set_palette_at(index, color)
+
+        return index
+
+    def _present(self) -> None:
+        """
+        Scale the board onto the screen, centered.
+        """
+        import pygame
+
+        pygame.transform.scale(self._board, self._scaled.get_size(), self._scaled)
+        self._screen.blit(self._scaled, self._offset)
+
 
 class MovementSystem(System):
+    READS = frozenset({PhysicsBodyComponent, TransformComponent})
+    WRITES = frozenset({TransformComponent})
+
     def __init__(self, x_offset: int, y_offset: int, scale_factor: int, component_lists: List[List[Type[Component]]]):
         """
         Create a new movement system.
@@ -97,6 +381,11 @@ class MovementSystem(System):
         self._y_offset = y_offset
         self._scale_factor = scale_factor
 
+        # Pixel positions of every cell visited so far, so moving does not allocate a new int for every position
+        # beyond the small int cache
+        self._x_positions: Dict[int, int] = {}
+        self._y_positions: Dict[int, int] = {}
+
     def process(self, game_objects: List[GameObject]) -> None:
         """
         Update the position of all game objects that are movable.
@@ -114,11 +403,22 @@ class MovementSystem(System):
                 next_cell_x = current_cell_x + physics_body_component.x_dir
                 next_cell_y = current_cell_y + physics_body_component.y_dir
 
-                transform_component.x = next_cell_x * self._scale_factor + self._x_offset
-                transform_component.y = next_cell_y * self._scale_factor + self._y_offset
+                next_x = self._x_positions.get(next_cell_x)
+                if next_x is None:
+                    next_x = self._x_positions[next_cell_x] = next_cell_x * self._scale_factor + self._x_offset
+
+                next_y = self._y_positions.get(next_cell_y)
+                if next_y is None:
+                    next_y = self._y_positions[next_cell_y] = next_cell_y * self._scale_factor + self._y_offset
+
+                transform_component.x = next_x
+                transform_component.y = next_y
 
 
 class AiFollowSystem(System):
+    READS = frozenset({AiFollowComponent, TransformComponent})
+    WRITES = frozenset({PhysicsBodyComponent})
+
     def process(self, game_objects: List[GameObject]) -> None:
         """
         Update the direction of all game objects that are meant to follow another game object.
@@ -148,6 +448,26 @@ class AiFollowSystem(System):
 
 
 class PlayerControllerSystem(System):
+    READS = frozenset({PlayerControllerComponent, PhysicsBodyComponent})
+    WRITES = frozenset({PhysicsBodyComponent})
+
+    def __init__(self, component_lists: List[List[Type[Component]]]):
+        """
+        Create a new player controller system.
+
+        :param component_lists: A list of lists of components that the system requires before processing occurs.
+        """
+        super().__init__(component_lists)
+        self._apply_listeners: List[Callable[[int], None]] = []
+
+    def add_apply_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        Subscribe a listener to the key of every player controller the system applies.
+
+        :param listener: The listener to call with the key code every time a key is applied.
+        """
+        self._apply_listeners.append(listener)
+
     def process(self, game_objects: List[GameObject]) -> None:
         """
         Update the state of an entity based on keyboard inputs.
@@ -167,16 +487,16 @@ class PlayerControllerSystem(System):
                 last_x_dir, last_y_dir = physics_body_component.x_dir, physics_body_component.y_dir
                 x_dir, y_dir = 0, 0
 
-                if keyCode == pygame.K_w:
+                if keyCode == Keys.K_w:
                     y_dir += -1
 
-                if keyCode == pygame.K_s:
+                if keyCode == Keys.K_s:
                     y_dir += 1
 
-                if keyCode == pygame.K_a:
+                if keyCode == Keys.K_a:
                     x_dir += -1
 
-                if keyCode == pygame.K_d:
+                if keyCode == Keys.K_d:
                     x_dir += 1
 
                 if x_dir == 0 and y_dir == 0:
@@ -188,9 +508,96 @@ class PlayerControllerSystem(System):
                     physics_body_component.x_dir = x_dir
                     physics_body_component.y_dir = y_dir
 
+                for apply_listener in self._apply_listeners:
+                    apply_listener(keyCode)
+
+
+class AutopilotSystem(System):
+    READS = frozenset({PlayerControllerComponent, PhysicsBodyComponent, PLANNER})
+    WRITES = frozenset({PlayerControllerComponent, PhysicsBodyComponent})
+
+    def __init__(self, planner: Planner, clock: Callable[[], int], component_lists: List[List[Type[Component]]]):
+        """
+        Create a new autopilot system.
+
+        The autopilot system is responsible for steering player controlled entities with the moves planned by an
+        autopilot planner. If the planner has not delivered a move by the time the tick starts, a safe fallback move
+        is used instead so the tick never waits on planning.
+
+        :param planner: The planner to take moves from.
+        :param clock: Gets the tick that is about to run, which only the board submitted at the end of the last tick
+            may steer.
+        :param component_lists: A list of lists of components that the system requires before processing occurs.
+        """
+        super().__init__(component_lists)
+        self._planner = planner
+        self._clock = clock
+        self._snapshot: Optional[BoardSnapshot] = None
+        self._missed_deadlines = 0
+
+    def submit(self, snapshot: BoardSnapshot) -> None:
+        """
+        Submit the board at the end of a tick so the next move can be planned before the next tick.
+
+        :param snapshot: The board at the end of the tick.
+        """
+        self._snapshot = snapshot
+        self._planner.submit(snapshot)
+
+    def reset(self) -> None:
+        """
+        Forget the last submitted board and any move planned for it, so switching the autopilot off and on again never
+        steers with a board from before the switch.
+        """
+        self._snapshot = None
+        self._planner.discard()
+
+    def get_missed_deadlines(self) -> int:
+        """
+        Get the number of ticks where the planner did not deliver a move in time.
+
+        :return: The number of missed deadlines.
+        """
+        return self._missed_deadlines
+
+    def process(self, game_objects: List[GameObject]) -> None:
+        """
+        Update the direction of the player with the planned move.
+
+        :param game_objects: The list of game objects to update.
+        """
+        # Until the end of the first tick after a switch or a restore there is no board of the last tick to steer by
+        if self._snapshot is None or self._snapshot.get_tick() != self._clock():
+            return
+
+        move = self._planner.poll(self._snapshot.get_tick())
+
+        for entity in self._filter_objects(game_objects):
+            controller = entity.get_component(PlayerControllerComponent)
+            physics_body_component = entity.get_component(PhysicsBodyComponent)
+
+            if controller and physics_body_component:
+                current = (physics_body_component.x_dir, physics_body_component.y_dir)
+
+                if move is None:
+                    self._missed_deadlines += 1
+
+                # Prevent the player from turning back on itself
+                if move is None or (move[0] == -current[0] and move[1] == -current[1] and move != current):
+                    move = safe_fallback_direction(self._snapshot, current)
+
+                # Hand control back to the keyboard without replaying a stale key press
+                controller.key = -1
+
+                if move:
+                    physics_body_component.x_dir, physics_body_component.y_dir = move
+
 
 class KeyboardInputSystem(System):
-    def __init__(self, event_manager: PygameEventManager, component_lists: List[List[Type[Component]]]):
+    READS = frozenset({PlayerControllerComponent, KEYBOARD})
+    WRITES = frozenset({PlayerControllerComponent})
+
+    def __init__(self, event_manager: 'PygameEventManager', component_lists: List[List[Type[Component]]]):
         """
         Create a new keyboard input system.
 
@@ -202,27 +609,48 @@ class KeyboardInputSystem(System):
         """
         super().__init__(component_lists)
 
-        # Tracks all keys that are currently pressed
+        import pygame
+
+        # Tracks all keys that are currently pressed. With a render thread, the window thread presses and releases keys
+        # while the simulation thread reads them, so the map is only touched under the lock.
         self._keyMap: Dict[int, bool] = {}
+        self._keyLock = threading.Lock()
+
+        # The keys pressed at the start of the tick, copied out of the map so the lock is not held while steering
+        self._pressedKeys: List[int] = []
+        self._key_listeners: List[Callable[[int], None]] = []
 
         event_manager.subscribe(pygame.KEYDOWN, self.on_keydown)
         event_manager.subscribe(pygame.KEYUP, self.on_keyup)
 
-    def on_keydown(self, event: pygame.event.Event) -> None:
+    def on_keydown(self, event: 'pygame.event.Event') -> None:
         """
         Handle keydown events.
         """
         keyCode = event.key
 
-        self._keyMap[keyCode] = True
+        with self._keyLock:
+            self._keyMap[keyCode] = True
+
+        for key_listener in self._key_listeners:
+            key_listener(keyCode)
+
+    def add_key_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        Subscribe a listener to every key press the system receives.
 
-    def on_keyup(self, event: pygame.event.Event) -> None:
+        :param listener: The listener to call with the key code of every key press.
+        """
+        self._key_listeners.append(listener)
+
+    def on_keyup(self, event: 'pygame.event.Event') -> None:
         """
         Handle keyup events.
         """
         keyCode = event.key
 
-        del self._keyMap[keyCode]
+        with self._keyLock:
+            self._keyMap.pop(keyCode, None)
 
     def process(self, game_objects: List[GameObject]) -> None:
         """
@@ -230,7 +658,13 @@ class KeyboardInputSystem(System):
 
         :param game_objects: The list of game objects to update.
         """
-        for keyCode in self._keyMap.keys():
+        keyCodes = self._pressedKeys
+
+        with self._keyLock:
+            keyCodes.clear()
+            keyCodes.extend(self._keyMap)
+
+        for keyCode in keyCodes:
             for entity in self._filter_objects(game_objects):
                 controller = entity.get_component(PlayerControllerComponent)
 
@@ -239,7 +673,16 @@ class KeyboardInputSystem(System):
 
 
 class FoodSpawnSystem(System):
-    def __init__(self, grid: Grid, world: World, component_lists: List[List[Type[Component]]]):
+    READS = frozenset({GRID})
+    WRITES = frozenset({WORLD})
+
+    # The largest board, in cells, that is scanned for every empty cell when spawning food.
+    SCAN_LIMIT = 250_000
+
+    # The number of random cells tried on larger boards before falling back to a scan.
+    SAMPLE_ATTEMPTS = 64
+
+    def __init__(self, grid: Grid, world: World, component_lists: List[List[Type[Component]]], rng: Optional[random.Random] = None):
         """
         Create a new food spawn system.
 
@@ -248,10 +691,13 @@ class FoodSpawnSystem(System):
         :param grid: The grid to spawn food on.
         :param world: The world to spawn food in.
         :param component_lists: A list of lists of components that the system requires before processing occurs.
+        :param rng: The random number generator to pick cells with, defaults to the one shared by the random module.
         """
         super().__init__(component_lists)
         self._grid = grid
         self._world = world
+        # Either a Random instance or the random module itself, which share randrange and choice
+        self._random: Any = rng or random
 
     def process(self, game_objects: List[GameObject]) -> None:
         """
@@ -267,28 +713,74 @@ class FoodSpawnSystem(System):
                 break
 
         if not still_has_food:
-            rows = self._grid.get_num_rows()
-            columns = self._grid.get_num_cols()
             cell_size = self._grid.get_cell_size()
             grid_x, grid_y = self._grid.get_x_offset(), self._grid.get_y_offset()
-            grid = self._grid.get_grid()
 
-            empty_cells = [
-                (x, y)
-                for x in range(columns)
-                for y in range(rows)
-                if grid[x][y] is None
-            ]
+            cell = self._pick_empty_cell()
 
-            # Pick a random empty cell
-            x, y = random.choice(empty_cells)
+            # The snake fills the whole board, there is nowhere left to spawn food
+            if cell is None:
+                return
+
+            x, y = cell
 
             # Spawn food
             food = Food(x * cell_size + grid_x, y * cell_size + grid_y)
             self._world.add_game_object(food)
 
+    def _pick_empty_cell(self) -> Optional[Tuple[int, int]]:
+        """
+        Pick a random empty cell.
+
+        Boards up to SCAN_LIMIT cells are scanned for every empty cell, going through the open cells of the level so
+        walls are skipped without being looked at. Larger boards are sampled at random instead, since scanning them
+        every time food is eaten would take longer than a tick; the scan is only used as a last resort when sampling
+        keeps landing on occupied cells, and counts the empty cells instead of listing them, so a sparse board never
+        holds a list as large as the board.
+
+        :return: The x, y position of the cell, or None if there are no empty cells.
+        """
+        columns, rows = self._grid.get_num_cols(), self._grid.get_num_rows()
+        level = self._world.get_level()
+        get_cell = self._grid.get_cell
+        open_cells = level.get_nav().get_open_cells()
+
+        if columns * rows > self.SCAN_LIMIT:
+            for _ in range(self.SAMPLE_ATTEMPTS):
+                x, y = self._random.randrange(columns), self._random.randrange(rows)
+
+                if not level.is_wall(x, y) and get_cell(x, y) is None:
+                    return x, y
+
+            num_empty = sum(1 for index in open_cells if get_cell(index % columns, index // columns) is None)
+
+            if not num_empty:
+                return None
+
+            # Walk the open cells again up to the empty cell that was picked
+            remaining = self._random.randrange(num_empty)
+
+            for index in open_cells:
+                if get_cell(index % columns, index // columns) is None:
+                    if not remaining:
+                        return index % columns, index // columns
+
+                    remaining -= 1
+
+        empty_cells = [index for index in open_cells if get_cell(index % columns, index // columns) is None]
+
+        if not empty_cells:
+            return None
+
+        # Pick a random empty cell
+        index = self._random.choice(empty_cells)
+        return index % columns, index // columns
+
 
 class GridObjectSystem(System):
+    READS = frozenset({TransformComponent})
+    WRITES = frozenset({GRID})
+
     def __init__(self, grid: Grid, component_lists: List[List[Type[Component]]]):
         """
         Create a new grid object system.
@@ -320,12 +812,52 @@ class GridObjectSystem(System):
                 self._grid.add_cell(cell_x, cell_y, entity)
 
 
+def _transform_x(entity: GameObject) -> int:
+    """
+    Get the x position of a game object, for sorting game objects by it.
+
+    :param entity: The game object, which must have a transform component.
+    :return: The x position of the game object.
+    """
+    return entity.get_component(TransformComponent).x  # type: ignore[union-attr]
+
+
 class CollisionSystem(System):
     """
-    The collision system is responsible for detecting collisions between game objects and triggering
-    the on_collision methods on their physics body components.
+    The collision system is responsible for detecting collisions between game objects and either queueing them on
+    an event bus, or triggering the on_collision methods on their physics body components straight away.
     """
 
+    # Collision handlers eat food and defeat the player, which changes the world and the score
+    READS = frozenset({PhysicsBodyComponent, TransformComponent})
+    WRITES = frozenset({WORLD, STATE})
+
+    def __init__(self, component_lists: List[List[Type[Component]]], event_bus: Optional[EventBus] = None):
+        """
+        Create a new collision system.
+
+        :param component_lists: A list of lists of components that the system requires before processing occurs.
+        :param event_bus: The event bus to queue collisions on, which leaves the world alone until the bus is
+            dispatched. Without one, collision handlers run as soon as each collision is detected.
+        """
+        super().__init__(component_lists)
+        self._event_bus = event_bus
+
+        # The collision groups of the last partition, and the group lists kept for reuse by the next one
+        self._collision_groups: List[List[GameObject]] = []
+        self._group_pool: List[List[GameObject]] = []
+
+        # The indices of the game objects in a group that handle collisions, refilled for every group
+        self._handling: List[int] = []
+
+    def get_writes(self) -> FrozenSet[Resource]:
+        """
+        Get the components and shared state the system writes.
+
+        :return: The event bus if collisions are queued, otherwise what the collision handlers write.
+        """
+        return frozenset({EVENTS}) if self._event_bus else self.WRITES
+
     def detect_x_collision(self, entTransform: TransformComponent, otherTransform: TransformComponent) -> bool:
         """
         Determine if two entities are intersecting on the x axis.
@@ -377,15 +909,35 @@ class CollisionSystem(System):
         This partitioning algorithm simply partitions all game objects into groups where every element is intersecting
         on the x-axis with the game object before or after it.
 
+        The returned groups are reused by the next partition, so they must not be kept past the end of the process
+        call.
+
         :param game_objects: The list of game objects to partition.
         :return: A list of lists of game objects that are potentially colliding.
         """
-        filtered_entities = self._filter_objects(game_objects)
-        filtered_entities.sort(key=lambda entity: entity.get_component(TransformComponent).x)
+        return self.partition_filtered(self._filter_objects(game_objects))
+
+    def partition_filtered(self, filtered_entities: List[GameObject]) -> List[List[GameObject]]:
+        """
+        Partition game objects that are already known to have the required components, see partition.
+
+        :param filtered_entities: The game objects to partition, which are sorted in place by their x position.
+        :return: A list of lists of game objects that are potentially colliding.
+        """
+        filtered_entities.sort(key=_transform_x)
+
+        # Return the groups of the last partition to the pool
+        collision_groups = self._collision_groups
+        group_pool = self._group_pool
+
+        for group in collision_groups:
+            group.clear()
+            group_pool.append(group)
+
+        collision_groups.clear()
 
         # Partition all possible collisions into their own groups
-        collision_groups: List[List[GameObject]] = []
-        current_group: List[GameObject] = []
+        current_group: List[GameObject] = group_pool.pop() if group_pool else []
 
         for entity in filtered_entities:
             if len(current_group) > 0:
@@ -397,7 +949,7 @@ class CollisionSystem(System):
                 if entTransform and otherTransform:
                     if not self.detect_x_collision(entTransform, otherTransform):
                         collision_groups.append(current_group)
-                        current_group = []
+                        current_group = group_pool.pop() if group_pool else []
 
             current_group.append(entity)
 
@@ -439,11 +991,43 @@ class CollisionSystem(System):
 
         :param game_objects: The list of game objects to check for collisions.
         """
-        possible_collisions = self.partition(game_objects)
+        self.resolve(self.partition(game_objects))
+
+    def resolve(self, possible_collisions: List[List[GameObject]]) -> None:
+        """
+        Check every pair of game objects within each group of a partition for a collision on the y axis, and queue
+        or handle the pairs that collide.
+
+        :param possible_collisions: The groups of game objects that are colliding on the x axis.
+        """
+        emit = self._event_bus.emit if self._event_bus else None
+        handling = self._handling
 
         for x_group in possible_collisions:
+            # Pairs where neither body has a collision handler would have no effect, which is most pairs as only the
+            # player handles collisions, so they are skipped. The remaining pairs are still visited in the same order
+            handling.clear()
+
+            for index, entity in enumerate(x_group):
+                body = entity.get_component(PhysicsBodyComponent)
+
+                if body and body.has_collision_handlers():
+                    handling.append(index)
+
+            # The first handling game object that is not yet behind the base index
+            cursor = 0
+
             for base_index in range(len(x_group) - 1):
-                for sub_index in range(base_index + 1, len(x_group)):
+                if cursor == len(handling):
+                    break
+
+                if handling[cursor] == base_index:
+                    cursor += 1
+                    sub_indices: Iterable[int] = range(base_index + 1, len(x_group))
+                else:
+                    sub_indices = islice(handling, cursor, None)
+
+                for sub_index in sub_indices:
                     # Select a unique pair of entities.
                     ent = x_group[base_index]
                     other = x_group[sub_index]
@@ -457,7 +1041,204 @@ class CollisionSystem(System):
                     if ent_transform_component and other_transform_component and ent_phys_body_component and other_phys_body_component:
                         # Check if the pair of entities are colliding on the y axis ...
                         if self.detect_y_collision(ent_transform_component, other_transform_component):
-                            # ... and if they are, trigger their on_collision methods and pass the entity
-                            # they collided with.
+                            # ... and if they are, queue the collision ...
+                            if emit:
+                                emit(Collision, ent, other)
+                                continue
+
+                            # ... or trigger their on_collision methods and pass the entity they collided with.
                             ent_phys_body_component.on_collision(other)
                             other_phys_body_component.on_collision(ent)
+
+
+class TickPipelineSystem(System):
+    READS = frozenset({TransformComponent, PhysicsBodyComponent, AiFollowComponent})
+    WRITES = frozenset({TransformComponent, PhysicsBodyComponent, GRID, WORLD, STATE})
+
+    def __init__(self, grid: Grid, world: World, x_offset: int, y_offset: int, collision_system: CollisionSystem):
+        """
+        Create a new tick pipeline system.
+
+        The tick pipeline system is responsible for doing the work of the movement, follow and grid object systems
+        and the collision broadphase in a single pass over the game objects, so each game object is visited once per
+        tick and its components are fetched once per plan instead of once per system.
+
+        The components of every game object are looked up when the plan is built, which happens again whenever game
+        objects are added to or removed from the world. Components are expected to stay put while a game object is
+        in the world, as they do for every game object in this game.
+
+        The pass only gives the same results as running the systems one after another if every follower comes after
+        the game object it follows, so the target has already moved when the follower reads its position. The world
+        keeps snakes in that order; when a plan does not, prepare reports it and the systems must be run instead.
+
+        :param grid: The grid to add game objects to, whose cells are the cells game objects move along.
+        :param world: The world whose game objects are processed.
+        :param x_offset: The x offset of the grid.
+        :param y_offset: The y offset of the grid.
+        :param collision_system: The collision system to hand the moved game objects to.
+        """
+        super().__init__([])
+        self._grid = grid
+        self._x_offset = x_offset
+        self._y_offset = y_offset
+        self._cell_size = grid.get_cell_size()
+        self._collision_system = collision_system
+
+        self._stale = True
+        self._fusable = False
+        world.subscribe("added", self._invalidate)
+        world.subscribe("removed", self._invalidate)
+
+        # The plan, one entry per game object with a transform component, in the order of the world
+        self._entities: List[GameObject] = []
+        self._transforms: List[TransformComponent] = []
+        self._bodies: List[Optional[PhysicsBodyComponent]] = []
+        self._targets: List[Optional[TransformComponent]] = []
+
+        # The game objects the player or the autopilot steers, and the game objects that move and collide
+        self._controlled: List[GameObject] = []
+        self._colliders: List[GameObject] = []
+
+        # Reused by the collision broadphase, which sorts the game objects it is given in place
+        self._broadphase: List[GameObject] = []
+
+        # Pixel positions of every cell visited so far, as in the movement system
+        self._x_positions: Dict[int, int] = {}
+        self._y_positions: Dict[int, int] = {}
+
+    def _invalidate(self, game_object: GameObject) -> None:
+        """
+        Mark the plan as out of date with the game objects in the world.
+
+        :param game_object: The game object that was added or removed.
+        """
+        self._stale = True
+
+    def is_stale(self) -> bool:
+        """
+        Check if game objects were added to or removed from the world since the plan was built.
+
+        :return: True if the plan must be rebuilt before the next pass, otherwise False.
+        """
+        return self._stale
+
+    def prepare(self, game_objects: List[GameObject]) -> bool:
+        """
+        Build the plan for the game objects if it is out of date.
+
+        :param game_objects: The game objects in the world.
+        :return: True if the game objects can be processed in a single pass, otherwise False.
+        """
+        if not self._stale:
+            return self._fusable
+
+        self._stale = False
+        self._fusable = True
+
+        entities, transforms, bodies, targets = self._entities, self._transforms, self._bodies, self._targets
+        entities.clear()
+        transforms.clear()
+        bodies.clear()
+        targets.clear()
+        self._controlled.clear()
+        self._colliders.clear()
+
+        # The game objects planned so far, and every game object in the world
+        planned: Set[GameObject] = set()
+        in_world = set(game_objects)
+
+        for entity in game_objects:
+            transform = entity.get_component(TransformComponent)
+            body = entity.get_component(PhysicsBodyComponent)
+
+            if body and entity.get_component(PlayerControllerComponent):
+                self._controlled.append(entity)
+
+            if not transform:
+                continue
+
+            target: Optional[TransformComponent] = None
+
+            if body:
+                self._colliders.append(entity)
+
+                follow = entity.get_component(AiFollowComponent)
+
+                if follow and follow._target:
+                    followed = follow._target
+                    target = followed.get_component(TransformComponent)
+
+                    # A target that has yet to move would be read at its old position
+                    if target is not None and followed not in planned and followed in in_world:
+                        self._fusable = False
+
+            planned.add(entity)
+            entities.append(entity)
+            transforms.append(transform)
+            bodies.append(body)
+            targets.append(target)
+
+        return self._fusable
+
+    def get_controlled(self) -> List[GameObject]:
+        """
+        Get the game objects that are steered by the player or the autopilot, as of the last plan.
+
+        :return: The game objects with a player controller and a physics body, in the order of the world.
+        """
+        return self._controlled
+
+    def process(self, game_objects: List[GameObject]) -> None:
+        """
+        Move every movable game object, point every follower at its target, index the grid and detect collisions.
+
+        The grid is cleared and refilled as game objects move, so it holds the positions at the end of the tick
+        unless game objects were added or removed while collisions were handled, see is_stale.
+
+        :param game_objects: The game objects in the world, which must have been prepared.
+        """
+        grid = self._grid
+        cell_size = self._cell_size
+        x_offset, y_offset = self._x_offset, self._y_offset
+        x_positions, y_positions = self._x_positions, self._y_positions
+        entities, transforms, bodies, targets = self._entities, self._transforms, self._bodies, self._targets
+
+        grid.clear_all()
+
+        for index in range(len(entities)):
+            transform = transforms[index]
+            body = bodies[index]
+
+            if body is None:
+                grid.add_cell(int(transform.x // cell_size), int(transform.y // cell_size), entities[index])
+                continue
+
+            # Movement
+            cell_x = int(transform.x // cell_size) + body.x_dir
+            cell_y = int(transform.y // cell_size) + body.y_dir
+
+            x = x_positions.get(cell_x)
+            if x is None:
+                x = x_positions[cell_x] = cell_x * cell_size + x_offset
+
+            y = y_positions.get(cell_y)
+            if y is None:
+                y = y_positions[cell_y] = cell_y * cell_size + y_offset
+
+            transform.x = x
+            transform.y = y
+
+            # Follow, the target has already moved
+            target = targets[index]
+
+            if target is not None:
+                body.x_dir = max(min(target.x - x, 1), -1)
+                body.y_dir = max(min(target.y - y, 1), -1)
+
+            # Grid insertion, the offsets are smaller than a cell so the new position lies in the cell moved to
+            grid.add_cell(cell_x, cell_y, entities[index])
+
+        # Collision broadphase and narrowphase over the moved game objects, in the order of the world
+        broadphase = self._broadphase
+        broadphase[:] = self._colliders
+        self._collision_system.resolve(self._collision_system.partition_filtered(broadphase))
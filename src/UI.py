@@ -1,3 +1,5 @@
+from typing import Optional
+
 import pygame
 
 
@@ -6,25 +8,60 @@ class UI:
         """
         Create a new UI.
 
-        The UI is responsible for rendering text on the screen.
+        The UI is responsible for rendering text on the screen. Fonts are loaded the first time they are needed, so
+        the font subsystem is never started before the first frame. Text is only rendered again when it changes.
+        """
+        self._font_header: Optional[pygame.font.Font] = None
+        self._font_regular: Optional[pygame.font.Font] = None
+
+        self._score = 0
+        self._score_text: Optional[pygame.Surface] = None
+        self._game_over_text: Optional[pygame.Surface] = None
+
+        self._font_small: Optional[pygame.font.Font] = None
+        self._overlay = ""
+        self._overlay_text: Optional[pygame.Surface] = None
+
+    def _get_font(self, size: int) -> pygame.font.Font:
+        """
+        Load a font, starting the font subsystem if it has not been started yet.
+
+        :param size: The size of the font.
+        :return: The font.
+        """
+        if not pygame.font.get_init():
+            pygame.font.init()
+
+        return pygame.font.Font('freesansbold.ttf', size)
+
+    def set_score(self, score: int) -> None:
+        """
+        Set the score shown on the screen.
+
+        :param score: The score to show.
         """
-        self._font_header = pygame.font.Font('freesansbold.ttf', 26)
-        self._font_regular = pygame.font.Font('freesansbold.ttf', 20)
+        if score != self._score:
+            self._score = score
+            self._score_text = None
 
-    def render_score(self, surface: pygame.Surface, x: int, y: int, score: int) -> None:
+    def render_score(self, surface: pygame.Surface, x: int, y: int) -> None:
         """
         Render the score on the screen.
 
         :param surface: The surface to render the score on.
         :param x: The x position of the score.
         :param y: The y position of the score.
-        :param score: The score to render.
         """
-        text = self._font_regular.render(f'Score: {score}', True, (255, 255, 255))
-        textRect = text.get_rect()
+        if self._score_text is None:
+            if self._font_regular is None:
+                self._font_regular = self._get_font(20)
+
+            self._score_text = self._font_regular.render(f'Score: {self._score}', True, (255, 255, 255))
+
+        textRect = self._score_text.get_rect()
         textRect.x = x
         textRect.y = y
-        surface.blit(text, textRect)
+        surface.blit(self._score_text, textRect)
 
     def render_game_over(self, surface: pygame.Surface, x: int, y: int) -> None:
         """
@@ -34,7 +71,33 @@ class UI:
         :param x: The x position of the game over text.
         :param y: The y position of the game over text.
         """
-        text = self._font_header.render('Game Over | Press [R] to retry', True, (255, 255, 255))
-        textRect = text.get_rect()
+        if self._game_over_text is None:
+            if self._font_header is None:
+                self._font_header = self._get_font(26)
+
+            self._game_over_text = self._font_header.render('Game Over | Press [R] to retry', True, (255, 255, 255))
+
+        textRect = self._game_over_text.get_rect()
         textRect.center = (x, y)
-        surface.blit(text, textRect)
+        surface.blit(self._game_over_text, textRect)
+
+    def render_overlay(self, surface: pygame.Surface, text: str, x: int, y: int) -> None:
+        """
+        Render a line of diagnostics on the screen.
+
+        :param surface: The surface to render the overlay on.
+        :param text: The text to show.
+        :param x: The x position of the overlay.
+        :param y: The y position of the bottom of the overlay.
+        """
+        if self._overlay_text is None or text != self._overlay:
+            if self._font_small is None:
+                self._font_small = self._get_font(14)
+
+            self._overlay = text
+            self._overlay_text = self._font_small.render(text, True, (200, 200, 200), (0, 0, 0))
+
+        textRect = self._overlay_text.get_rect()
+        textRect.x = x
+        textRect.bottom = y
+        surface.blit(self._overlay_text, textRect)
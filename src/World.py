@@ -1,14 +1,16 @@
-from typing import List
+from typing import Callable, Dict, List, Optional, Sequence
 
-from Component import PlayerControllerComponent, PhysicsBodyComponent
+from Component import PlayerControllerComponent, PhysicsBodyComponent, TransformComponent
 from GameObject import GameObject, Snake, Food, Wall
-from EventSystem import EventSystem
-from GameStateManager import GameStateManager
+from EventBus import EventBus
+from EventSystem import EVENT_TYPES, Collision, EventSystem, FoodEaten, PlayerDefeated
+from GameStateManager import GameStateManager, SCORE, STATUS
 from Grid import Grid
+from Level import Cell, Level
 
 
 class World:
-    def __init__(self, grid: Grid, state: GameStateManager) -> None:
+    def __init__(self, grid: Grid, state: GameStateManager, level: Optional[Level] = None, event_bus: Optional[EventBus] = None) -> None:
         """
         Create a new world.
 
@@ -16,10 +18,29 @@ class World:
 
         :param grid: The grid to use for the world.
         :param state: The game state to use for the world.
+        :param level: The level to lay the walls out from, defaults to walls around the perimeter of the grid.
+        :param event_bus: The event bus collisions and game events are queued on, defaults to a new one. Queued events
+            take effect when the owner of the world dispatches them.
         """
         self._game_objects: List[GameObject] = []
+        self._has_player = False
+        self._handlers: Dict[str, List[Callable[[GameObject], None]]] = {}
         self._state = state
         self._grid = grid
+        self._level = level or Level.perimeter(grid.get_num_cols(), grid.get_num_rows())
+
+        if (self._level.get_cols(), self._level.get_rows()) != (grid.get_num_cols(), grid.get_num_rows()):
+            raise ValueError(f"The level is {self._level.get_cols()}x{self._level.get_rows()} but the grid is {grid.get_num_cols()}x{grid.get_num_rows()}.")
+
+        self._event_bus = event_bus or EventBus()
+        event_system = EventSystem(self, self._grid, self._state)
+
+        for event_type in EVENT_TYPES:
+            self._event_bus.register(event_type)
+
+        self._event_bus.subscribe(Collision, event_system.on_collisions)
+        self._event_bus.subscribe(FoodEaten, event_system.on_food_eaten)
+        self._event_bus.subscribe(PlayerDefeated, event_system.on_player_defeated)
 
         self.start()
 
@@ -28,63 +49,130 @@ class World:
         Initialize all default game objects and game state.
         """
         self.reset_state()
-        event_system = EventSystem(self, self._grid, self._state)
 
+        # Spawn a player
+        spawn_x, spawn_y = self._level.get_spawn()
+        player = self._spawn_player(spawn_x, spawn_y)
+        self._spawn_walls()
+
+        self._notify("started", player)
+
+    def restore(self, body: Sequence[Cell], food: Optional[Cell], score: int) -> None:
+        """
+        Replace every game object with a snake lying on the given cells, and the food, walls and score given, such
+        as the board of a snapshot.
+
+        The head keeps moving away from the cell behind it, and every other segment keeps following the one ahead.
+        The walls already in the world are kept rather than created again, as they never move.
+
+        :param body: The cells of the snake, starting with the head.
+        :param food: The cell of the food, if there is any.
+        :param score: The score.
+        """
+        walls = [game_object for game_object in self._game_objects if isinstance(game_object, Wall)]
+        self.clear_game_objects()
+        self.reset_state()
+        self._state.set_state(SCORE, score)
+
+        if body:
+            player = self._spawn_player(*body[0])
+            self._spawn_walls(walls)
+            cell_size = self._grid.get_cell_size()
+
+            for x, y in body[1:]:
+                segment = player.add_segment()
+                segment_transform = segment.get_component(TransformComponent)
+
+                if segment_transform:
+                    segment_transform.x, segment_transform.y = x * cell_size, y * cell_size
+
+                self.add_game_object(segment)
+
+            # The head keeps going the way it came, and every other segment heads for the segment ahead of it, as the
+            # follow system would have pointed it
+            for index, segment in enumerate(player.get_segments()):
+                if index == 0 and len(body) == 1:
+                    break
+
+                (x, y), (ahead_x, ahead_y) = (body[1], body[0]) if index == 0 else (body[index], body[index - 1])
+                segment_body = segment.get_component(PhysicsBodyComponent)
+
+                if segment_body:
+                    segment_body.x_dir = max(min(ahead_x - x, 1), -1)
+                    segment_body.y_dir = max(min(ahead_y - y, 1), -1)
+        else:
+            self._spawn_walls(walls)
+
+        if food is not None:
+            cell_size = self._grid.get_cell_size()
+            self.add_game_object(Food(food[0] * cell_size, food[1] * cell_size))
+
+        if body:
+            self._notify("started", self._player)
+
+    def _spawn_player(self, x: int, y: int) -> Snake:
+        """
+        Spawn a player with no segments, and make it eat food and lose when it runs into anything else.
+
+        :param x: The x index of the cell to spawn on.
+        :param y: The y index of the cell to spawn on.
+        :return: The player.
+        """
+        emit = self._event_bus.emit
         cell_size = self._grid.get_cell_size()
 
-        # Spawn a player
-        self._player = Snake(cell_size, cell_size, length=0)
-        self._player.add_component(PlayerControllerComponent())
-        self.add_game_object(self._player)
+        player = self._player = Snake(x * cell_size, y * cell_size, length=0)
+        player.add_component(PlayerControllerComponent())
+        self.add_game_object(player)
+        self._has_player = True
 
-        player_phys_body = self._player.get_component(PhysicsBodyComponent)
+        player_phys_body = player.get_component(PhysicsBodyComponent)
 
         if player_phys_body:
-            player_phys_body.add_collision_handler(Food, lambda food: event_system.on_eat_food(self._player, food))
-            player_phys_body.add_collision_handler(Snake, lambda snake: self.defeat())
-            player_phys_body.add_collision_handler(Wall, lambda wall: self.defeat())
+            player_phys_body.add_collision_handler(Food, lambda food: emit(FoodEaten, player, food))
+            player_phys_body.add_collision_handler(Snake, lambda snake: emit(PlayerDefeated, player))
+            player_phys_body.add_collision_handler(Wall, lambda wall: emit(PlayerDefeated, player))
 
-        # Spawn walls around the perimeter of the grid
-        for x in range(self._grid.get_num_cols()):
-            min_y = 0
-            max_y = self._grid.get_num_rows() - 1
+        return player
 
-            top_wall = Wall(x * cell_size, min_y, cell_size, cell_size)
-            bottom_wall = Wall(x * cell_size, max_y * cell_size, cell_size, cell_size)
+    def _spawn_walls(self, walls: Optional[List[Wall]] = None) -> None:
+        """
+        Spawn the walls and obstacles of the level.
 
-            self.add_game_object(top_wall)
-            self.add_game_object(bottom_wall)
+        :param walls: The walls of the level to add back to the world, if they were already created.
+        """
+        if walls:
+            for wall in walls:
+                self.add_game_object(wall)
 
-        for y in range(1, self._grid.get_num_rows() - 1):
-            min_x = 0
-            max_x = self._grid.get_num_cols() - 1
+            return
 
-            left_wall = Wall(min_x, y * cell_size, cell_size, cell_size)
-            right_wall = Wall(max_x * cell_size, y * cell_size, cell_size, cell_size)
+        cell_size = self._grid.get_cell_size()
 
-            self.add_game_object(left_wall)
-            self.add_game_object(right_wall)
+        for x, y in self._level.get_wall_cells():
+            self.add_game_object(Wall(x * cell_size, y * cell_size, cell_size, cell_size))
 
     def defeat(self) -> None:
         """
         Trigger the defeated game state.
         """
-        self._game_objects.clear()
-        self._state.set_state("status", "game-over")
+        self.clear_game_objects()
+        self._state.set_state(STATUS, "game-over")
 
     def reset(self) -> None:
         """
         Reset the game.
         """
-        self._game_objects.clear()
+        self.clear_game_objects()
         self.start()
 
     def reset_state(self) -> None:
         """
         Reset the game state.
         """
-        self._state.set_state("score", 0)
-        self._state.set_state("status", "in-game")
+        with self._state.batch():
+            self._state.set_state(SCORE, 0)
+            self._state.set_state(STATUS, "in-game")
 
     def add_game_object(self, game_object: GameObject) -> None:
         """
@@ -93,6 +181,7 @@ class World:
         :param game_object: The game object to add.
         """
         self._game_objects.append(game_object)
+        self._notify("added", game_object)
 
     def remove_game_object(self, game_object: GameObject) -> None:
         """
@@ -102,6 +191,84 @@ class World:
         """
         if game_object in self._game_objects:
             self._game_objects.remove(game_object)
+            self._notify("removed", game_object)
+
+            if game_object is self._player:
+                self._has_player = False
+
+    def clear_game_objects(self) -> None:
+        """
+        Remove every game object from the world.
+        """
+        if "removed" in self._handlers:
+            for game_object in self._game_objects:
+                self._notify("removed", game_object)
+
+        self._game_objects.clear()
+        self._has_player = False
+
+    def subscribe(self, event_type: str, handler: Callable[[GameObject], None]) -> None:
+        """
+        Subscribe a handler to game objects being added to or removed from the world, or to a game being started.
+
+        :param event_type: The type of event to subscribe to, either "added", "removed" or "started", which is
+            notified with the player once every game object of a new or restored board is in place.
+        :param handler: The handler to call with the game object.
+        """
+        if event_type not in self._handlers:
+            self._handlers[event_type] = []
+        self._handlers[event_type].append(handler)
+
+    def _notify(self, event_type: str, game_object: GameObject) -> None:
+        """
+        Notify all handlers subscribed to an event type.
+
+        :param event_type: The type of event that occurred.
+        :param game_object: The game object the event occurred for.
+        """
+        if event_type in self._handlers:
+            for handler in self._handlers[event_type]:
+                handler(game_object)
+
+    def get_player(self) -> Snake:
+        """
+        Get the player controlled snake.
+
+        :return: The head of the player controlled snake.
+        """
+        return self._player
+
+    def has_player(self) -> bool:
+        """
+        Check if the player is in the world, which it is not once it has been defeated until the world is reset.
+
+        :return: True if the player is in the world, otherwise False.
+        """
+        return self._has_player
+
+    def get_level(self) -> Level:
+        """
+        Get the level the walls of the world are laid out from.
+
+        :return: The level.
+        """
+        return self._level
+
+    def get_state(self) -> GameStateManager:
+        """
+        Get the game state of the world.
+
+        :return: The game state of the world.
+        """
+        return self._state
+
+    def get_event_bus(self) -> EventBus:
+        """
+        Get the event bus collisions and game events are queued on.
+
+        :return: The event bus of the world.
+        """
+        return self._event_bus
 
     def get_game_objects(self) -> List[GameObject]:
         """
@@ -1,9 +1,24 @@
 """
 This entrypoint module is responsible for parsing command line arguments and applying setting overrides.
 """
+import time
 
-import argparse
-from Game import Game
+STARTUP_ORIGIN = time.perf_counter()
+
+import argparse  # noqa: E402
+import sys  # noqa: E402
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple  # noqa: E402
+
+from Autopilot import create_policy, get_policy_names  # noqa: E402
+from FrameRecorder import get_encoder_names  # noqa: E402
+from Level import Level  # noqa: E402
+from StartupReport import StartupReport  # noqa: E402
+
+if TYPE_CHECKING:
+    from AllocationProfiler import AllocationProfiler
+    from Dataset import DatasetWriter
+    from Metrics import Metrics, MetricsExporter
+    from Profiler import SamplingProfiler
 
 CLI_DESC = "Initialize the snake game."
 
@@ -16,11 +31,186 @@ def parse() -> argparse.Namespace:
     parser.add_argument("--width", type=str, default="900", help="The width of the game window.")
     parser.add_argument("--height", type=str, default="600", help="The height of the game window.")
     parser.add_argument("--tickrate", type=str, default="7", help="The number of times to update the game per second.")
+    parser.add_argument("--render-thread", action="store_true", help="Run the simulation on its own thread and draw it at the display rate, so slow frames do not hold up ticks.")
+    parser.add_argument("--fps", type=str, default="60", help="The number of frames to draw per second with --render-thread.")
+    parser.add_argument("--renderer", type=str, default="sprites", choices=["sprites", "pixels"], help="How the board is drawn, pixels draws the whole board with a pixel per cell scaled to fit the window, for boards far larger than it.")
+    parser.add_argument("--board-cols", type=str, default=None, help="The number of columns on the board, the view follows the snake if they do not fit in the window.")
+    parser.add_argument("--board-rows", type=str, default=None, help="The number of rows on the board, the view follows the snake if they do not fit in the window.")
+    parser.add_argument("--level", type=str, default=None, help="A level file (or .txt level) with the walls and obstacles of the board, which also sets the board size.")
+    parser.add_argument("--grid", type=str, default="dense", choices=["dense", "chunked"], help="The grid layout, chunked grids only allocate the parts of the board in use.")
+    parser.add_argument("--pipeline", type=str, default="systems", choices=["systems", "fused"], help="How each tick is run, fused runs movement, following, grid indexing and collisions in a single pass.")
+    parser.add_argument("--scheduler", type=str, default=None, help="Schedule the systems by the components they read and write on this many threads, and report the critical path of the tick.")
+    parser.add_argument("--autopilot", action="store_true", help="Start with the snake steered by the autopilot. Press [P] to toggle it in-game.")
+    parser.add_argument("--policy", type=str, nargs="+", default=[get_policy_names()[0]], choices=get_policy_names(), help="The strategy the autopilot steers with. Press [O] to switch strategy in-game. Headless runs play every strategy given, to compare them.")
+    parser.add_argument("--decision-budget", type=float, default=None, help="The number of milliseconds each autopilot decision may take before it is discarded, 0 for no limit. Defaults to the budget of the strategy.")
+    parser.add_argument("--shared-board", type=str, default=None, help="Publish the board every tick into a shared memory segment with this name.")
+    parser.add_argument("--spectate", type=str, default=None, help="Stream the game to spectators on \"unix:<path>\" or \"<host>:<port>\".")
+    parser.add_argument("--agents", type=str, default=None, help="Serve games to bots outside of the game on \"unix:<path>\" or \"<host>:<port>\" until interrupted, instead of playing.")
+    parser.add_argument("--headless", action="store_true", help="Play with the autopilot as fast as possible, without a window or pygame.")
+    parser.add_argument("--games", type=str, default="1", help="The number of games to play in a headless run.")
+    parser.add_argument("--dataset", type=str, default=None, help="Export every tick of a headless run into this directory, as (observation, action, reward) steps in shards of .npy files.")
+    parser.add_argument("--dataset-shard-steps", type=str, default=None, help="The most steps in a shard of --dataset, defaults to about 256MB of observations.")
+    parser.add_argument("--ticks", type=str, default="10000", help="The maximum number of ticks per game in a headless run.")
+    parser.add_argument("--metrics", type=str, default=None, help="Serve Prometheus metrics over HTTP on \"<host>:<port>\".")
+    parser.add_argument("--metrics-file", type=str, default=None, help="Periodically rewrite Prometheus metrics into this file.")
+    parser.add_argument("--freeze-gc", action="store_true", help="Keep game objects out of reach of the garbage collector, to avoid collection pauses.")
+    parser.add_argument("--alloc-report", type=str, default=None, help="Print the lines that allocate the most memory every tick, profiled over this many ticks.")
+    parser.add_argument("--latency-trace", type=str, default=None, help="Write the latency of every key press, from input to display, as a Chrome trace to this file when the game ends. Press [L] for the overlay.")
+    parser.add_argument("--profile", type=str, default=None, help="Sample the stacks of every thread while the game runs and write them to this file as collapsed stacks, for flame graphs.")
+    parser.add_argument("--profile-rate", type=str, default="99", help="The number of stack samples to take per second with --profile.")
+    parser.add_argument("--record", type=str, default=None, help="Record the frames shown in the window to this file (or directory for png), dropping frames rather than slowing the game down if the disk falls behind.")
+    parser.add_argument("--record-format", type=str, default=get_encoder_names()[0], choices=get_encoder_names(), help="The format to record frames in with --record, raw writes a single zlib compressed stream.")
+    parser.add_argument("--record-every", type=str, default="1", help="Record one in this many frames with --record.")
+    parser.add_argument("--startup-report", action="store_true", help="Print how long each startup phase took once the first tick has run.")
 
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse()
-    game = Game(width=int(args.width), height=int(args.height), tickrate=int(args.tickrate))
-    game.start()
+
+    if args.scheduler and args.pipeline == "fused":
+        sys.exit("The fused pipeline runs its systems in a single pass, it cannot be combined with --scheduler.")
+    startup_report = StartupReport(STARTUP_ORIGIN) if args.startup_report else None
+
+    if startup_report:
+        startup_report.mark("imports")
+
+    allocation_profiler: Optional["AllocationProfiler"] = None
+    if args.alloc_report:
+        from AllocationProfiler import AllocationProfiler
+
+        allocation_profiler = AllocationProfiler(int(args.alloc_report), on_done=lambda report: print(report, file=sys.stderr))
+
+    profiler: Optional["SamplingProfiler"] = None
+    if args.profile:
+        from Profiler import SamplingProfiler
+
+        profiler = SamplingProfiler(float(args.profile_rate))
+        profiler.start()
+
+    metrics: Optional["Metrics"] = None
+    exporters: List["MetricsExporter"] = []
+    if args.metrics or args.metrics_file:
+        from Metrics import Metrics, start_exporters
+
+        metrics = Metrics()
+        exporters = start_exporters(metrics, args.metrics, args.metrics_file)
+
+    level: Optional[Level] = None
+    if args.level:
+        level = Level.load(args.level)
+        args.board_cols, args.board_rows = level.get_cols(), level.get_rows()
+
+    if args.agents:
+        from AgentServer import AgentServer
+
+        agent_server = AgentServer(args.agents, level)
+        print(f"Serving games to bots on {agent_server.get_address()}")
+
+        try:
+            agent_server.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            agent_server.close()
+
+        print(f"Played {agent_server.get_steps()} steps")
+    elif args.headless:
+        from Headless import HeadlessGame
+
+        results: Dict[str, List[Tuple[int, int]]] = {}
+        board_width = int(args.board_cols) * 32 if args.board_cols else int(args.width)
+        board_height = int(args.board_rows) * 32 if args.board_rows else int(args.height)
+
+        dataset: Optional["DatasetWriter"] = None
+        if args.dataset:
+            from Dataset import DatasetWriter
+
+            dataset = DatasetWriter(args.dataset, board_width // 32, board_height // 32, int(args.dataset_shard_steps) if args.dataset_shard_steps else None)
+
+        # The dataset is finished with whatever was played, even if a game crashes
+        try:
+            for policy_name in args.policy:
+                for game_number in range(int(args.games)):
+                    first_game = not results and game_number == 0
+
+                    policy = create_policy(policy_name, args.decision_budget)
+                    headless_game = HeadlessGame(
+                        board_width,
+                        board_height,
+                        policy,
+                        startup_report=startup_report if first_game else None,
+                        chunked_grid=args.grid == "chunked",
+                        metrics=metrics,
+                        freeze_gc=args.freeze_gc,
+                        allocation_profiler=allocation_profiler if first_game else None,
+                        level=level,
+                        fused_pipeline=args.pipeline == "fused",
+                        scheduler_workers=int(args.scheduler or 0),
+                        dataset=dataset,
+                    )
+
+                    try:
+                        score, ticks = headless_game.run(int(args.ticks))
+                    finally:
+                        headless_game.close()
+
+                    results.setdefault(policy_name, []).append((score, ticks))
+
+                    print(f"Game {game_number + 1}: score {score} after {ticks} ticks, {policy.format()}")
+
+                    scheduler = headless_game.get_simulation().get_scheduler()
+                    if scheduler:
+                        print(scheduler.format())
+
+            if len(results) > 1:
+                for policy_name, games in results.items():
+                    print(f"{policy_name}: mean score {sum(score for score, ticks in games) / len(games):.1f} over {len(games)} games")
+        finally:
+            if dataset:
+                dataset.close()
+                print(dataset.format())
+    else:
+        from Game import Game, GameOptions
+
+        options = GameOptions(
+            shared_board=args.shared_board,
+            autopilot=args.autopilot,
+            autopilot_policy=create_policy(args.policy[0], args.decision_budget),
+            startup_report=startup_report,
+            spectate=args.spectate,
+            board_cols=int(args.board_cols) if args.board_cols else None,
+            board_rows=int(args.board_rows) if args.board_rows else None,
+            chunked_grid=args.grid == "chunked",
+            metrics=metrics,
+            freeze_gc=args.freeze_gc,
+            allocation_profiler=allocation_profiler,
+            level=level,
+            fused_pipeline=args.pipeline == "fused",
+            scheduler_workers=int(args.scheduler or 0),
+            render_thread=args.render_thread,
+            fps=int(args.fps),
+            latency_trace=args.latency_trace,
+            pixel_renderer=args.renderer == "pixels",
+            record=args.record,
+            record_format=args.record_format,
+            record_every=int(args.record_every),
+        )
+        game = Game(int(args.width), int(args.height), int(args.tickrate), options)
+        game.start()
+
+    if profiler:
+        profiler.stop()
+        profiler.write(args.profile)
+        print(f"Wrote {args.profile}, {profiler.format()}", file=sys.stderr)
+
+    # Report on the ticks that were profiled, if the game ended before the report was ready
+    if allocation_profiler:
+        allocation_profiler.stop()
+
+    for exporter in exporters:
+        exporter.close()
+
+    if metrics:
+        metrics.close()